@@ -0,0 +1,121 @@
+// Clientside per-gene bar charts, see backend/clientside.py
+(function () {
+    const TYPED_ARRAYS = {
+        u1: Uint8Array, u2: Uint16Array, u4: Uint32Array,
+        i1: Int8Array, i2: Int16Array, i4: Int32Array,
+        f4: Float32Array, f8: Float64Array,
+    };
+    const matrices = {};
+
+    function decode(array) {
+        const binary = atob(array.bdata);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new TYPED_ARRAYS[array.dtype](bytes.buffer);
+    }
+
+    function load(url) {
+        if (!matrices[url]) {
+            matrices[url] = fetch(url)
+                .then(function (response) {
+                    if (!response.ok) {
+                        throw new Error(url + ': ' + response.status);
+                    }
+                    return response.json();
+                })
+                .then(function (matrix) {
+                    matrix.values = decode(matrix.values);
+                    matrix.rows = new Map();
+                    matrix.genes.forEach(function (gene, row) {
+                        if (!matrix.rows.has(gene)) {
+                            matrix.rows.set(gene, []);
+                        }
+                        matrix.rows.get(gene).push(row);
+                    });
+                    return matrix;
+                });
+            // retry on the next selection after a failed download
+            matrices[url].catch(function () {
+                delete matrices[url];
+            });
+        }
+        return matrices[url];
+    }
+
+    // same figure as backend.figures.EntityBarChart.figure
+    function figure(matrix, gene) {
+        const rows = matrix.rows.get(gene) || [];
+        if (!rows.length) {
+            return matrix.empty;
+        }
+        const nEntities = matrix.shape[1];
+        const data = matrix.figure.data.map(function (trace, i) {
+            const x = [];
+            const y = [];
+            matrix.positions[i].forEach(function (position) {
+                rows.forEach(function (row) {
+                    x.push(matrix.entities[position]);
+                    y.push(matrix.values[row * nEntities + position]);
+                });
+            });
+            return Object.assign({}, trace, {x: x, y: y});
+        });
+        return {data: data, layout: matrix.figure.layout};
+    }
+
+    // same figure as backend.figures.EntityBarChart.comparison
+    function comparison(matrix, selected) {
+        const templates = matrix.comparison;
+        const nEntities = matrix.shape[1];
+        const positions = [].concat.apply([], matrix.positions);
+        const genes = [];
+        selected.slice(0, templates.max_genes).forEach(function (gene) {
+            if (matrix.rows.has(gene) && genes.indexOf(gene) < 0) {
+                genes.push(gene);
+            }
+        });
+        const values = genes.map(function (gene) {
+            const row = matrix.rows.get(gene)[0];
+            return positions.map(function (position) {
+                return matrix.values[row * nEntities + position];
+            });
+        });
+        let fig;
+        if (genes.length > templates.max_grouped) {
+            const trace = Object.assign({}, templates.heatmap.data[0], {y: genes, z: values});
+            fig = {data: [trace], layout: Object.assign({}, templates.heatmap.layout)};
+        } else {
+            const x = positions.map(function (position) {
+                return matrix.entities[position];
+            });
+            fig = {
+                data: genes.map(function (gene, i) {
+                    return Object.assign({}, templates.bars.data[0], {name: gene, x: x, y: values[i]});
+                }),
+                layout: Object.assign({}, templates.bars.layout),
+            };
+        }
+        if (selected.length > templates.max_genes) {
+            fig.layout.title = {
+                text: 'First ' + templates.max_genes + ' of the ' + selected.length + ' selected genes',
+            };
+        }
+        return fig;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        mll: {
+            // `gene` is a list of genes for the multi-select dropdowns
+            entityBarChart: function (url, gene) {
+                return load(url).then(function (matrix) {
+                    if (Array.isArray(gene) && gene.length > 1) {
+                        return comparison(matrix, gene);
+                    }
+                    return figure(matrix, Array.isArray(gene) ? gene[0] : gene);
+                });
+            },
+        },
+    });
+})();
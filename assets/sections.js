@@ -0,0 +1,34 @@
+// Loads the lazy page sections when they scroll into view, see backend/sections.py
+(function () {
+    const observed = new WeakSet();
+
+    function load(element) {
+        window.dash_clientside.set_props(
+            {type: 'mll-section-visible', index: element.dataset.section}, {data: true});
+    }
+
+    // without IntersectionObserver, every section is loaded right away
+    const visibility = !('IntersectionObserver' in window) ? {observe: load} : new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                visibility.unobserve(entry.target);
+                load(entry.target);
+            }
+        });
+    }, {rootMargin: '100% 0px'});
+
+    function observe(root) {
+        root.querySelectorAll('.mll-lazy-section').forEach(function (element) {
+            if (!observed.has(element)) {
+                observed.add(element);
+                visibility.observe(element);
+            }
+        });
+    }
+
+    // the pages are rendered by Dash after this script runs
+    new MutationObserver(function () {
+        observe(document);
+    }).observe(document.documentElement, {childList: true, subtree: true});
+    observe(document);
+})();
@@ -0,0 +1,193 @@
+"""Binary columnar cache of the CSV tables.
+
+`python -m backend.binary_cache` converts every table registered in `backend.registry` once into a
+directory of `.npy` files, one per column, next to a `meta.json` describing the columns and the
+source file the cache was built from. The tables are stored as the registry serves them, transformed
+and with the compact dtypes of `backend.schema`, so that loading them converts nothing:
+
+- numeric and boolean columns are stored with their explicit dtype, one 2-D array per dtype with one
+  contiguous row per column, and memory-mapped at load time so columns that are never touched are
+  never paged in,
+- categorical columns are stored as their categories, NUL separated UTF-8, and one integer code per
+  row (-1 for missing values),
+- the other text columns are dictionary encoded the same way and decoded back into strings.
+
+`load` returns None when the cache of a table is missing or stale (size/mtime differ from the source
+and so does the sha256 of its content), in which case the registry falls back to parsing the CSV. The
+cache does not follow changes to the transformations of the registry or to `backend.schema`: rebuild it
+with `--force` after changing them.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+CACHE_DIR_NAME = '.cache'
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_stat(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _table_dir(cache_dir, rel_path):
+    return os.path.join(cache_dir, os.path.splitext(rel_path)[0])
+
+
+def _codes_dtype(n):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _write_dictionary(directory, i, codes, uniques):
+    dictionary = '\0'.join(str(value) for value in uniques).encode('utf-8')
+    np.save(os.path.join(directory, f'c{i}.codes.npy'), np.asarray(codes).astype(_codes_dtype(len(uniques))))
+    np.save(os.path.join(directory, f'c{i}.dict.npy'), np.frombuffer(dictionary, dtype=np.uint8))
+
+
+def write(df, source_path, cache_dir, rel_path):
+    """Write `df`, the registry table parsed from `source_path`, to the cache directory of `rel_path`."""
+    target = _table_dir(cache_dir, rel_path)
+    tmp = f'{target}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = []
+    blocks = {}
+    for i, name in enumerate(df.columns):
+        values = df[name]
+        if values.dtype.kind in 'biuf':
+            block = blocks.setdefault(values.dtype.str, [])
+            columns.append({'name': name, 'kind': 'numeric', 'dtype': values.dtype.str,
+                            'block': list(blocks).index(values.dtype.str), 'row': len(block)})
+            block.append(values.to_numpy())
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            _write_dictionary(tmp, i, values.cat.codes, values.cat.categories)
+            columns.append({'name': name, 'kind': 'category', 'size': len(values.cat.categories)})
+        else:
+            codes, uniques = pd.factorize(values, sort=True, use_na_sentinel=True)
+            _write_dictionary(tmp, i, codes, uniques)
+            columns.append({'name': name, 'kind': 'string', 'size': len(uniques)})
+    for j, block in enumerate(blocks.values()):
+        # one row per column: every column is a contiguous slice of the memory map
+        np.save(os.path.join(tmp, f'block{j}.npy'), np.stack(block))
+
+    meta = {'version': FORMAT_VERSION, 'rows': len(df), 'columns': columns,
+            'source': dict(_source_stat(source_path), sha256=_sha256(source_path))}
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_fresh(meta, source_path, directory):
+    if meta.get('version') != FORMAT_VERSION:
+        return False
+    source = meta['source']
+    try:
+        stat = _source_stat(source_path)
+    except OSError:
+        return False
+    if stat['size'] != source['size']:
+        return False
+    if stat['mtime_ns'] == source['mtime_ns']:
+        return True
+    # a fresh checkout changes the mtime but not the content
+    if _sha256(source_path) != source['sha256']:
+        return False
+    # the next check is an mtime comparison again instead of another hash
+    source['mtime_ns'] = stat['mtime_ns']
+    tmp = os.path.join(directory, f'meta.json.tmp-{os.getpid()}')
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, os.path.join(directory, 'meta.json'))
+    except OSError:
+        # e.g. a read-only cache, checked by hash every time
+        logger.warning("Cannot update the metadata of the binary cache in %s", directory)
+    return True
+
+
+def is_fresh(source_path, cache_dir, rel_path):
+    """Whether the cache of `rel_path` exists and was built from the current content of `source_path`."""
+    directory = _table_dir(cache_dir, rel_path)
+    meta = _read_meta(directory)
+    return meta is not None and _is_fresh(meta, source_path, directory)
+
+
+def load(source_path, cache_dir, rel_path):
+    """Return the cached table of `rel_path` as a DataFrame, or None if it is missing or stale."""
+    directory = _table_dir(cache_dir, rel_path)
+    meta = _read_meta(directory)
+    if meta is None:
+        return None
+    if not _is_fresh(meta, source_path, directory):
+        logger.warning("Binary cache of %s is stale, parsing the CSV instead", rel_path)
+        return None
+
+    blocks = {}
+    data = {}
+    for i, column in enumerate(meta['columns']):
+        if column['kind'] == 'numeric':
+            j = column['block']
+            if j not in blocks:
+                blocks[j] = np.load(os.path.join(directory, f'block{j}.npy'), mmap_mode='r')
+            data[column['name']] = blocks[j][column['row']]
+        else:
+            codes = np.load(os.path.join(directory, f'c{i}.codes.npy'), mmap_mode='r')
+            dictionary = np.load(os.path.join(directory, f'c{i}.dict.npy'), mmap_mode='r')
+            uniques = np.array(dictionary.tobytes().decode('utf-8').split('\0') if column['size'] else [], dtype=object)
+            if column['kind'] == 'category':
+                data[column['name']] = pd.Categorical.from_codes(np.asarray(codes), uniques)
+            else:
+                # code -1 takes the missing value appended last
+                data[column['name']] = np.append(uniques, np.nan)[codes]
+    return pd.DataFrame(data, copy=False)
+
+
+def build(force=False):
+    """Build the binary cache of every table of the registry, skipping the ones that are up to date."""
+    from backend import registry
+
+    for name, (rel_path, _) in registry.SOURCES.items():
+        source_path = os.path.join(registry.DATA_DIR, rel_path)
+        if not os.path.exists(source_path):
+            logger.warning("Skipping %s: %s does not exist", name, source_path)
+            continue
+        if not force and is_fresh(source_path, registry.CACHE_DIR, rel_path):
+            logger.info("%s is up to date", name)
+            continue
+        write(registry.parse(name), source_path, registry.CACHE_DIR, rel_path)
+        logger.info("Built %s", name)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    build(force='--force' in sys.argv[1:])
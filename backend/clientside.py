@@ -0,0 +1,149 @@
+"""Per-gene bar charts drawn in the browser from a matrix downloaded once.
+
+With MLL_CLIENTSIDE_CHARTS=1, the bar charts of the small aggregated tables (CLIENTSIDE_TABLES) are
+updated by a clientside callback (`assets/clientside.js`) instead of a server callback. The first time
+such a chart is shown, the browser downloads from `/_mll/matrix/<table>`:
+
+- the values of the table as a typed array (smallest integer dtype holding them, base64-encoded),
+- the gene symbol of every row, from which the browser builds its gene -> rows index,
+- the figure of `backend.figures.EntityBarChart` without values and the entity positions of its traces,
+- the grouped bar chart and heatmap comparing several genes without values, for multi-select dropdowns,
+
+and then builds the figure of every selected gene itself. The URL contains the data version and the
+response carries an ETag, so the matrix is downloaded again only when the data changes.
+
+Without MLL_CLIENTSIDE_CHARTS, the same charts are built by a server callback.
+"""
+import base64
+import json
+import os
+import threading
+
+import numpy as np
+from dash import callback, clientside_callback
+from dash.dependencies import Input, Output
+from flask import Response, abort, request
+from plotly.utils import PlotlyJSONEncoder
+
+from backend import figure_cache, figures, initial, matrix, registry
+
+ENABLED = os.environ.get('MLL_CLIENTSIDE_CHARTS', '0') == '1'
+ROUTE = '/_mll/matrix/'
+CLIENTSIDE_TABLES = ('or_up_agg_tab', 'or_dn_agg_tab', 'activation_agg_tab', 'fraser_agg_tab')
+
+# table -> (value name, barmode) of its chart
+_charts = {}
+_payloads = {}
+_lock = threading.Lock()
+
+
+def _typed_array(values):
+    # smallest dtype holding all the values, as the {dtype, bdata} arrays of plotly.js
+    if np.issubdtype(values.dtype, np.integer) and len(values):
+        low, high = values.min(), values.max()
+        for dtype in (np.uint8, np.uint16, np.uint32) if low >= 0 else (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                values = values.astype(dtype)
+                break
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    return {'dtype': values.dtype.str[1:], 'bdata': base64.b64encode(values.tobytes()).decode()}
+
+
+class MatrixPayload:
+    """Serialized matrix of a table for the clientside bar charts, with its ETag."""
+
+    def __init__(self, table_name, value_name, barmode):
+        entity_matrix = matrix.entity_matrix(table_name)
+        chart = figures.entity_bar_chart(entity_matrix.entities)
+        n_entities = len(entity_matrix.entities)
+        figure = chart.figure(np.zeros((1, n_entities)), value_name, barmode=barmode)
+        for trace in figure['data']:
+            del trace['x'], trace['y']
+        bars = chart.comparison(np.zeros((2, n_entities)), ['', ''], value_name)
+        bars['data'] = bars['data'][:1]
+        del bars['data'][0]['name'], bars['data'][0]['x'], bars['data'][0]['y']
+        n_heatmap = figures.MAX_GROUPED_GENES + 1
+        heatmap = chart.comparison(np.zeros((n_heatmap, n_entities)), [''] * n_heatmap, value_name)
+        del heatmap['data'][0]['y'], heatmap['data'][0]['z']
+        payload = {
+            'version': registry.data_version(),
+            'shape': list(entity_matrix.values.shape),
+            'values': _typed_array(entity_matrix.values),
+            'genes': entity_matrix.ids['GeneSymbol'].tolist(),
+            'entities': list(entity_matrix.entities),
+            'positions': [positions for _, _, positions, _ in chart.traces],
+            'figure': figure,
+            'empty': chart.figure(np.zeros((0, n_entities)), value_name, barmode=barmode),
+            'comparison': {'bars': bars, 'heatmap': heatmap, 'max_grouped': figures.MAX_GROUPED_GENES,
+                           'max_genes': figures.MAX_COMPARED_GENES},
+        }
+        self.data = json.dumps(payload, cls=PlotlyJSONEncoder, separators=(',', ':')).encode()
+        self.etag = f'{table_name}-{registry.data_version()}'
+
+
+def payload(table_name):
+    """The shared MatrixPayload of the clientside table `table_name`."""
+    with _lock:
+        if table_name not in _payloads:
+            value_name, barmode = _charts[table_name]
+            _payloads[table_name] = MatrixPayload(table_name, value_name, barmode)
+        return _payloads[table_name]
+
+
+def matrix_url(table_name):
+    return f'{ROUTE}{table_name}?v={registry.data_version()}'
+
+
+def _serve_matrix(table_name):
+    # nothing downloads the matrices without the clientside mode, and the Dash pages would answer the URL
+    if not ENABLED or table_name not in _charts:
+        abort(404)
+    matrix_payload = payload(table_name)
+    response = Response(matrix_payload.data, mimetype='application/json')
+    response.set_etag(matrix_payload.etag)
+    # the URL changes with the data version, the ETag covers clients holding an old URL
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+
+def init_app(server):
+    """Serve the matrices of the clientside charts from the Flask `server`."""
+    server.add_url_rule(ROUTE + '<table_name>', 'mll_entity_matrix', _serve_matrix)
+
+
+def load_all():
+    """Serialize the matrix of every clientside chart, when the clientside mode is enabled."""
+    if ENABLED:
+        for table_name in list(_charts):
+            payload(table_name)
+
+
+def entity_bar_callback(graph_id, dropdown_id, page, table_name, value_name, barmode='relative', layout=None):
+    """Draw in `graph_id` the bar chart of the gene selected in `dropdown_id`, in the browser when enabled.
+
+    The chart of the initial gene is embedded in `layout` (see `backend.initial`).
+    """
+    if table_name in CLIENTSIDE_TABLES:
+        _charts[table_name] = (value_name, barmode)
+    entity_matrix = matrix.entity_matrix(table_name)
+    chart = figures.entity_bar_chart(entity_matrix.entities)
+
+    @figure_cache.cached(page, table_name)
+    def update_histogram(selected_gene):
+        return chart.selection_figure(entity_matrix, selected_gene, value_name, barmode=barmode)
+
+    if ENABLED and table_name in CLIENTSIDE_TABLES:
+        clientside_callback(
+            f"function(gene) {{ return window.dash_clientside.mll.entityBarChart('{matrix_url(table_name)}', gene); }}",
+            Output(graph_id, 'figure'),
+            [Input(dropdown_id, 'value')],
+            prevent_initial_call=layout is not None
+        )
+        if layout is not None:
+            initial.prefill(layout, update_histogram, [Output(graph_id, 'figure')], [Input(dropdown_id, 'value')])
+        return None
+    if layout is None:
+        return callback(Output(graph_id, 'figure'), [Input(dropdown_id, 'value')])(update_histogram)
+    return initial.callback(Output(graph_id, 'figure'), [Input(dropdown_id, 'value')], layout=layout)(update_histogram)
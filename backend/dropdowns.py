@@ -0,0 +1,45 @@
+"""Search-as-you-type gene dropdowns.
+
+Instead of one option per gene of the table, the layout only contains the first options of the
+table and the selected gene. Typing in the dropdown sends its `search_value` to the server, which
+answers with the best matches of the shared `backend.gene_search` index of the table.
+"""
+import threading
+
+from dash import callback, dcc
+from dash.dependencies import Input, Output, State
+
+from backend import gene_search
+
+_registered = {}
+_lock = threading.Lock()
+
+
+def _register(dropdown_id, table_name, value_column):
+    with _lock:
+        if dropdown_id in _registered:
+            if _registered[dropdown_id] != (table_name, value_column):
+                raise ValueError(f"Dropdown id '{dropdown_id}' is already used for table '{table_name}'")
+            return
+        _registered[dropdown_id] = (table_name, value_column)
+
+    # the layout already holds the options of the initial value
+    @callback(
+        Output(dropdown_id, 'options'),
+        [Input(dropdown_id, 'search_value')],
+        [State(dropdown_id, 'value')],
+        prevent_initial_call=True
+    )
+    def update_options(search_value, value):
+        return gene_search.index(table_name, value_column).options(search_value, selected=value)
+
+
+def gene_dropdown(dropdown_id, table_name, value, value_column='GeneSymbol', **kwargs):
+    """Dropdown `dropdown_id` selecting one `value_column` value of the registry table `table_name`."""
+    _register(dropdown_id, table_name, value_column)
+    return dcc.Dropdown(
+        id=dropdown_id,
+        options=gene_search.index(table_name, value_column).options('', selected=value),
+        value=value,
+        **kwargs
+    )
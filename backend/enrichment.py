@@ -0,0 +1,136 @@
+"""Enrichment of the outliers of every gene in each disease entity, computed for all genes at once.
+
+For every count method of `backend.outliers`, gene and disease entity, the outlier samples of the gene
+in the entity are tested against the rest of the cohort. With N samples in total and n in the entity
+(`sample_summary_tab`), K outlier samples of the gene over all entities and k of them in the entity:
+
+- the p-value is the one-sided Fisher exact test of enrichment, the hypergeometric tail P(X >= k),
+- the odds ratio is k (N - n - K + k) / ((n - k) (K - k)), with 0.5 added to every cell of the 2 × 2
+  table so that it stays finite,
+- the FDR is the Benjamini-Hochberg adjusted p-value over all the tests of the method.
+
+Everything is computed with NumPy over the (genes × entities) matrix of a method: the hypergeometric tail
+is summed from its largest term, one vectorized step per term, using the ratio of consecutive
+probabilities, so it neither underflows nor loops over genes. The result, one row per gene, method and
+entity with at least one outlier, sorted by p-value, is the registry table 'outlier_enrichment', computed
+once per process (in the gunicorn master when preloading).
+"""
+import numpy as np
+import pandas as pd
+
+from backend import outliers, registry, schema
+
+TABLE = 'outlier_enrichment'
+ENTITY_SIZES_TABLE = 'sample_summary_tab'
+# relative size of the last term summed in a hypergeometric tail
+TAIL_TOLERANCE = 1e-17
+
+
+def _log_factorials(n):
+    return np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, n + 1)))])
+
+
+def _log_pmf(log_factorials, x, N, K, n):
+    def log_binomial(a, b):
+        return log_factorials[a] - log_factorials[b] - log_factorials[a - b]
+    return log_binomial(K, x) + log_binomial(N - K, n - x) - log_binomial(N, n)
+
+
+def _tail_sum(x, last, N, K, n, step):
+    # sum of the probabilities from x to `last` (step 1 or -1) in units of the probability of x, each term
+    # computed from the previous one; the terms decrease, so the sum stops once they are negligible
+    total = np.ones(len(x))
+    term = np.ones(len(x))
+    active = x != last
+    while active.any():
+        xa, Ka, na = x[active], K[active], n[active]
+        if step > 0:
+            ratio = (Ka - xa) * (na - xa) / ((xa + 1) * (N - Ka - na + xa + 1))
+        else:
+            ratio = xa * (N - Ka - na + xa) / ((Ka - xa + 1) * (na - xa + 1))
+        term[active] *= ratio
+        total[active] += term[active]
+        x = np.where(active, x + step, x)
+        active &= (x != last) & (term > TAIL_TOLERANCE * total)
+    return total
+
+
+def hypergeometric_sf(k, N, K, n):
+    """P(X >= k) for X hypergeometric with N items, K successes and n draws, for integer arrays."""
+    k, K, n = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in (k, K, n)))
+    shape = k.shape
+    k, K, n = k.ravel(), K.ravel(), n.ravel()
+    log_factorials = _log_factorials(int(N))
+    p = np.ones(len(k))
+    low, high = np.maximum(0, n - (N - K)), np.minimum(K, n)
+    mode = (n + 1) * (K + 1) // (N + 2)
+
+    # beyond the mode: the terms of the upper tail decrease from P(X = k)
+    upper = (k > mode) & (k <= high)
+    x, Ku, nu = k[upper], K[upper], n[upper]
+    p[upper] = np.exp(_log_pmf(log_factorials, x, N, Ku, nu)) * _tail_sum(x, high[upper], N, Ku, nu, 1)
+    p[k > high] = 0.0
+
+    # up to the mode: 1 - P(X <= k - 1), the terms of the lower tail decreasing from P(X = k - 1)
+    lower = (k <= mode) & (k - 1 >= low)
+    x, Kl, nl = k[lower] - 1, K[lower], n[lower]
+    p[lower] = 1.0 - np.exp(_log_pmf(log_factorials, x, N, Kl, nl)) * _tail_sum(x, low[lower], N, Kl, nl, -1)
+    return np.clip(p, 0.0, 1.0).reshape(shape)
+
+
+def benjamini_hochberg(p):
+    """False discovery rates of the p-values `p` (1-D), adjusted with the Benjamini-Hochberg procedure."""
+    order = np.argsort(p, kind='stable')
+    m = len(p)
+    adjusted = p[order] * m / np.arange(1, m + 1)
+    adjusted = np.minimum.accumulate(adjusted[::-1])[::-1]
+    fdr = np.empty(m)
+    fdr[order] = np.minimum(adjusted, 1.0)
+    return fdr
+
+
+def _method_rows(method, counts, genes, entities, sizes):
+    # counts: (genes × entities) outlier samples of one method, NaN for the genes it does not report
+    N = int(sizes.sum())
+    reported = ~np.isnan(counts).any(axis=1)
+    k = counts[reported].astype(np.int64)
+    K = np.broadcast_to(k.sum(axis=1, keepdims=True), k.shape)
+    n = np.broadcast_to(sizes, k.shape)
+    tested = K > 0
+    p = np.ones(k.shape)
+    p[tested] = hypergeometric_sf(k[tested], N, K[tested], n[tested])
+    fdr = np.ones(k.shape)
+    fdr[tested] = benjamini_hochberg(p[tested])
+    odds_ratio = (k + 0.5) * (N - n - K + k + 0.5) / ((n - k + 0.5) * (K - k + 0.5))
+
+    rows, columns = np.nonzero(k > 0)
+    gene_rows = np.flatnonzero(reported)[rows]
+    return pd.DataFrame({
+        'GeneSymbol': genes['GeneSymbol'].to_numpy()[gene_rows],
+        'GeneID': genes['GeneID'].to_numpy()[gene_rows],
+        'Method': method,
+        'Disease entity': np.asarray(entities, dtype=object)[columns],
+        'Outlier samples in entity': k[rows, columns],
+        'Samples in entity': n[rows, columns],
+        'Outlier samples': K[rows, columns],
+        'Expected': np.round(K[rows, columns] * n[rows, columns] / N, 3),
+        'Odds ratio': np.round(odds_ratio[rows, columns], 3),
+        'P-value': p[rows, columns],
+        'FDR': fdr[rows, columns],
+    })
+
+
+def _enrichment_table(summary, *_):
+    outlier_tensor = outliers.tensor()
+    sizes_by_entity = summary.set_index('DiseaseEntity')['Number_of_individual']
+    columns = [i for i, entity in enumerate(outlier_tensor.entities) if entity in sizes_by_entity.index]
+    entities = [outlier_tensor.entities[i] for i in columns]
+    sizes = sizes_by_entity.loc[entities].to_numpy(dtype=np.int64)
+    frames = [_method_rows(method, outlier_tensor.values[:, j][:, columns], outlier_tensor.genes, entities, sizes)
+              for j, (method, _, value_name) in enumerate(outliers.METHODS) if value_name == 'Number of samples']
+    df = pd.concat(frames, ignore_index=True)
+    df = df.sort_values(['P-value', 'Odds ratio'], ascending=[True, False], kind='stable', ignore_index=True)
+    return schema.compact(df, TABLE)
+
+
+registry.register(TABLE, (ENTITY_SIZES_TABLE,) + tuple(table for _, table, _ in outliers.METHODS), _enrichment_table)
@@ -0,0 +1,163 @@
+"""Streamed downloads of the tables in server-side mode.
+
+The DataTables in server-side mode (see `backend.tables`) only hold the visible page, so the export
+button of the DataTable would only export that page. Instead, `/_mll/export/<table>.csv` (and `.parquet`
+when `pyarrow` is installed) streams the whole table, filtered and sorted like the DataTable by the
+`filter_query` and `sort_by` (JSON) query parameters, in chunks of CHUNK_ROWS rows: the server only holds
+the row order and one chunk at a time, whatever the size of the table. CSV downloads are compressed on
+the fly with gzip when the browser accepts it; Parquet files are compressed by their row groups. A `sort_by` that is not valid is
+answered with 400 before anything is streamed.
+
+The export links next to a table follow its sort and filter through a clientside callback.
+"""
+import json
+import threading
+import zlib
+from urllib.parse import quote
+
+from dash import clientside_callback, html
+from dash.dependencies import Input, Output
+from flask import Response, abort, request
+
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+ROUTE = '/_mll/export/'
+CHUNK_ROWS = 5000
+FORMATS = ('csv', 'parquet') if pyarrow is not None else ('csv',)
+
+# table name -> its shared TableQuery
+_queries = {}
+_lock = threading.Lock()
+
+
+def url(table_name, fmt):
+    return f'{ROUTE}{quote(table_name)}.{fmt}'
+
+
+class _Sink:
+    """Writable file object keeping what is written until it is drained."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def _csv(table_query, sort_by, filter_query, compress):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def encoded(text):
+        data = text.encode()
+        return compressor.compress(data) if compressor is not None else data
+
+    yield encoded(table_query.df.iloc[:0].to_csv(index=False))
+    for chunk in table_query.chunks(sort_by, filter_query, CHUNK_ROWS):
+        data = encoded(chunk.to_csv(index=False, header=False))
+        if data:
+            yield data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _parquet(table_query, sort_by, filter_query):
+    schema = pyarrow.Schema.from_pandas(table_query.df, preserve_index=False)
+    sink = _Sink()
+    with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+        for chunk in table_query.chunks(sort_by, filter_query, CHUNK_ROWS):
+            # one row group per chunk
+            writer.write_table(pyarrow.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _serve_export(table_name, fmt):
+    if fmt not in FORMATS:
+        abort(404)
+    with _lock:
+        table_query = _queries.get(table_name)
+    if table_query is None:
+        abort(404)
+    # checked before the response starts: a streamed response can no longer change its status
+    try:
+        sort_by = json.loads(request.args.get('sort_by') or '[]')
+    except ValueError:
+        abort(400)
+    if not isinstance(sort_by, list) or not all(isinstance(s, dict) for s in sort_by):
+        abort(400)
+    columns = set(table_query.df.columns)
+    if not all(isinstance(s.get('column_id'), str) and s['column_id'] in columns
+               and s.get('direction') in ('asc', 'desc') for s in sort_by):
+        abort(400)
+    sort_by = [{'column_id': s['column_id'], 'direction': s['direction']} for s in sort_by]
+    filter_query = request.args.get('filter_query', '')
+    # computed (and cached) now rather than in the middle of the stream; like in the DataTable, a filter
+    # that cannot be parsed does not filter anything
+    table_query.mask(filter_query)
+    headers = {'Content-Disposition': f"attachment; filename*=UTF-8''{quote(table_name)}.{fmt}",
+               'Cache-Control': 'no-store'}
+    if fmt == 'parquet':
+        return Response(_parquet(table_query, sort_by, filter_query), mimetype='application/vnd.apache.parquet',
+                        headers=headers)
+    compress = bool(request.accept_encodings['gzip'])
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    response = Response(_csv(table_query, sort_by, filter_query, compress), mimetype='text/csv', headers=headers)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(server):
+    """Serve the exports of the tables from the Flask `server`."""
+    server.add_url_rule(ROUTE + '<table_name>.<fmt>', 'mll_export', _serve_export)
+
+
+def _link_id(table_id, fmt):
+    return f'{table_id}-export-{fmt}'
+
+
+def register(table_id, table_name, table_query):
+    """Serve the exports of `table_query` and update the export links of the DataTable `table_id`."""
+    with _lock:
+        _queries[table_name] = table_query
+    clientside_callback(
+        f"""function(sortBy, filterQuery) {{
+            const query = '?sort_by=' + encodeURIComponent(JSON.stringify(sortBy || []))
+                + '&filter_query=' + encodeURIComponent(filterQuery || '');
+            return {json.dumps([url(table_name, fmt) for fmt in FORMATS])}.map(function (url) {{ return url + query; }});
+        }}""",
+        [Output(_link_id(table_id, fmt), 'href') for fmt in FORMATS],
+        [Input(table_id, 'sort_by'),
+         Input(table_id, 'filter_query')],
+        # the layout already holds the links of the unsorted, unfiltered table
+        prevent_initial_call=True
+    )
+
+
+def links(table_id, table_name):
+    """Export links of the DataTable `table_id`, registered with `register`."""
+    return html.Div([html.A(f'Export {fmt.upper()}', id=_link_id(table_id, fmt), href=url(table_name, fmt), download='')
+                     for fmt in FORMATS], className='mll-export')
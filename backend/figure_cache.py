@@ -0,0 +1,278 @@
+"""Bounded LRU cache of the serialized figures returned by the per-gene callbacks.
+
+Figures are cached as their final JSON, keyed by (page, table, callback arguments, data version), in
+an in-process LRU bounded in bytes. When MLL_FIGURE_CACHE_DIR is set (e.g. a directory under
+/dev/shm), figures are also written there so that all gunicorn workers share them: a worker that
+misses in memory looks the figure up on disk before building it, and the directory is pruned back
+under its own byte bound, oldest accessed first.
+
+Identical figures requested at the same time are built once: threads of a worker wait for the thread
+already building the figure (`backend.singleflight`), and with MLL_FIGURE_CACHE_DIR the workers take a
+lock file per figure, so that a worker finding the lock of another one waits for that worker's figure
+to appear on disk. Set MLL_COALESCE=0 to build every missed figure independently.
+
+    @callback(Output('or_dn_histogram', 'figure'), [Input('or_dn_dropdown', 'value')])
+    @figure_cache.cached('transcriptomics', 'or_dn_agg_tab')
+    def update_or_dn_histogram(selected_gene):
+        ...
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import plotly.io as pio
+
+from backend import registry, singleflight
+
+MAX_BYTES = int(os.environ.get('MLL_FIGURE_CACHE_BYTES', 64 << 20))
+DISK_DIR = os.environ.get('MLL_FIGURE_CACHE_DIR')
+DISK_MAX_BYTES = int(os.environ.get('MLL_FIGURE_CACHE_DISK_BYTES', 256 << 20))
+COALESCE = os.environ.get('MLL_COALESCE', '1') == '1'
+# a lock file older than this is left by a worker that died while building the figure
+LOCK_TIMEOUT = float(os.environ.get('MLL_FIGURE_CACHE_LOCK_TIMEOUT', 30))
+LOCK_POLL_INTERVAL = 0.02
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+class DiskStore:
+    """Directory of serialized figures shared between processes, one file per key."""
+
+    PRUNE_EVERY = 64
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, extension='.json'):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + extension)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def lock(self, key):
+        """Take the lock of the figure `key` for this worker, False if another worker holds it."""
+        try:
+            os.close(os.open(self._path(key, '.lock'), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        except OSError:
+            # building the figure without a lock is always possible
+            return True
+        return True
+
+    def unlock(self, key):
+        try:
+            os.remove(self._path(key, '.lock'))
+        except OSError:
+            pass
+
+    def wait(self, key, timeout=LOCK_TIMEOUT):
+        """Wait for the worker holding the lock of `key` to store its figure, None if it gave up."""
+        lock = self._path(key, '.lock')
+        while True:
+            data = self.get(key)
+            if data is not None:
+                return data
+            try:
+                stale = time.time() - os.stat(lock).st_mtime > timeout
+            except OSError:
+                # unlocked without storing the figure, e.g. the callback raised
+                return self.get(key)
+            if stale:
+                self.unlock(key)
+                return None
+            time.sleep(LOCK_POLL_INTERVAL)
+
+    def prune(self):
+        """Delete the least recently accessed files until the directory is under 90% of its bound."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.lock'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+class FigureCache:
+    """In-process LRU of serialized figures bounded by their total size, with an optional DiskStore."""
+
+    def __init__(self, max_bytes=MAX_BYTES, disk=None):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        # figures built by this process, and misses answered by a build of another thread or worker
+        self.builds = self.coalesced_threads = self.coalesced_workers = 0
+        self.flights = singleflight.Group()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                self._put_memory(key, data)
+                with self._lock:
+                    self.disk_hits += 1
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put_memory(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def put(self, key, data):
+        self._put_memory(key, data)
+        if self.disk is not None:
+            self.disk.put(key, data)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'builds': self.builds,
+                    'coalesced_threads': self.coalesced_threads, 'coalesced_workers': self.coalesced_workers,
+                    'in_flight': self.flights.in_flight()}
+
+
+cache = FigureCache(disk=DiskStore(DISK_DIR, DISK_MAX_BYTES) if DISK_DIR else None)
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _build(key, function, args):
+    figure = function(*args)
+    data = pio.to_json(figure, validate=False)
+    if isinstance(data, str):
+        data = data.encode()
+    cache.put(key, data)
+    cache.count('builds')
+    return figure, data
+
+
+def _build_once(key, function, args):
+    # (figure, data) built by this worker, or (None, data) built by the worker holding the lock
+    disk = cache.disk
+    if disk is None:
+        return _build(key, function, args)
+    locked = disk.lock(key)
+    if not locked:
+        data = disk.wait(key)
+        if data is not None:
+            cache._put_memory(key, data)
+            cache.count('coalesced_workers')
+            return None, data
+        locked = disk.lock(key)
+    try:
+        # the figure may have been stored between the lookup and the lock
+        data = disk.get(key)
+        if data is not None:
+            cache._put_memory(key, data)
+            cache.count('coalesced_workers')
+            return None, data
+        return _build(key, function, args)
+    finally:
+        if locked:
+            disk.unlock(key)
+
+
+def cached(page, table):
+    """Decorator caching the figure returned by a callback for each combination of its arguments."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args):
+            key = (page, table, _freeze(args), registry.data_version())
+            data = cache.get(key)
+            if data is not None:
+                return _loads(data)
+            if not COALESCE:
+                return _build(key, function, args)[0]
+            (figure, data), shared = cache.flights.do(key, lambda: _build_once(key, function, args))
+            if shared:
+                cache.count('coalesced_threads')
+                return _loads(data)
+            return figure if figure is not None else _loads(data)
+        return wrapper
+    return decorator
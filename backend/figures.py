@@ -0,0 +1,181 @@
+"""Per-entity bar chart of one gene and heatmaps, built directly as figure dicts.
+
+`EntityBarChart.figure` returns the same figure as
+
+    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
+    fig = px.bar(melted_df, x='Disease entity', y=value_name, color='Study group', barmode=barmode)
+    fig.update_traces(width=1).update_layout(template="plotly_white")
+
+without the long-format DataFrame, the groupby of plotly express and the validation of the figure:
+the study group, color and entity positions of each trace are computed once per list of entities, and
+a call only slices the values of the gene into one bar trace per study group.
+
+`EntityBarChart.selection_figure` draws the selection of a multi-select gene dropdown: the chart above
+for a single gene, a comparison of several genes otherwise, from one gather of their rows
+(`backend.matrix.EntityMatrix.gather`): grouped bars up to MAX_GROUPED_GENES genes, a heatmap (drawn as
+one image by plotly.js) up to MAX_COMPARED_GENES genes, the first ones of larger selections.
+"""
+import threading
+
+import numpy as np
+import plotly.express as px
+import plotly.io as pio
+
+from backend import registry
+
+MAX_GROUPED_GENES = 8
+MAX_COMPARED_GENES = 50
+HEATMAP_HEIGHT = 700
+
+_template = None
+_lock = threading.Lock()
+
+
+def _plotly_white():
+    global _template
+    if _template is None:
+        _template = pio.templates['plotly_white'].to_plotly_json()
+    return _template
+
+
+def _colorway():
+    # the color sequence plotly express uses when none is given
+    template = px.defaults.template or pio.templates.default
+    if isinstance(template, str):
+        template = pio.templates[template]
+    return list(template.layout.colorway or px.colors.qualitative.D3)
+
+
+class EntityBarChart:
+    """Bar chart of values per disease entity, one trace (and color) per study group."""
+
+    def __init__(self, entities, study_groups, x_title='Disease entity', color_title='Study group'):
+        self.entities = np.asarray(entities, dtype=object)
+        self.x_title = x_title
+        self.color_title = color_title
+        # study groups in order of first appearance, as plotly express assigns the colors; entities
+        # without a study group are left out of the chart like px leaves out missing colors
+        groups = [study_groups.get(entity) for entity in entities]
+        names = list(dict.fromkeys(group for group in groups if isinstance(group, str)))
+        colors = _colorway()
+        self.traces = []
+        for i, name in enumerate(names):
+            positions = np.flatnonzero([group == name for group in groups])
+            self.traces.append((name, colors[i % len(colors)], positions, self.entities[positions]))
+        # the entities of the chart, in its order
+        self.positions = np.concatenate([positions for _, _, positions, _ in self.traces]
+                                        or [np.empty(0, dtype=np.intp)])
+
+    def figure(self, values, value_name, barmode='relative'):
+        """Figure of `values`, the (rows × entities) values of a gene, or one row of them."""
+        values = np.asarray(values)
+        if values.ndim == 1:
+            values = values[None, :]
+        n_rows = len(values)
+        data = []
+        if n_rows:
+            for name, color, positions, x in self.traces:
+                trace = {
+                    'hovertemplate': f'{self.color_title}={name}<br>{self.x_title}=%{{x}}<br>'
+                                     f'{value_name}=%{{y}}<extra></extra>',
+                    'legendgroup': name,
+                    'marker': {'color': color, 'pattern': {'shape': ''}},
+                    'name': name,
+                    'orientation': 'v',
+                    'showlegend': True,
+                    'textposition': 'auto',
+                    # the rows of a gene follow each other within an entity, as in pd.melt
+                    'x': x if n_rows == 1 else np.repeat(x, n_rows),
+                    'xaxis': 'x',
+                    'y': values[:, positions].T.ravel(),
+                    'yaxis': 'y',
+                    'type': 'bar',
+                    'width': 1,
+                }
+                if barmode == 'group':
+                    trace['alignmentgroup'] = 'True'
+                    trace['offsetgroup'] = name
+                data.append(trace)
+        legend = {'title': {'text': self.color_title}, 'tracegroupgap': 0} if data else {'tracegroupgap': 0}
+        layout = {
+            'template': _plotly_white(),
+            'xaxis': {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': self.x_title}},
+            'yaxis': {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': value_name}},
+            'legend': legend,
+            'margin': {'t': 60},
+            'barmode': barmode,
+        }
+        return {'data': data, 'layout': layout}
+
+    def comparison(self, values, genes, value_name, n_selected=None):
+        """Figure comparing the (genes × entities) `values` of several `genes`, out of `n_selected` selected."""
+        entities = self.entities[self.positions]
+        values = np.asarray(values)[:, self.positions]
+        if len(genes) > MAX_GROUPED_GENES:
+            fig = heatmap(values, genes, entities, value_name, self.x_title, cell_text=False)
+            fig['layout']['height'] = HEATMAP_HEIGHT
+        else:
+            data = [{
+                'type': 'bar',
+                'name': gene,
+                'x': entities,
+                'y': row,
+                'hovertemplate': f'Gene=%{{fullData.name}}<br>{self.x_title}=%{{x}}<br>{value_name}=%{{y}}'
+                                 '<extra></extra>',
+            } for gene, row in zip(genes, values)]
+            fig = {'data': data, 'layout': {
+                'template': _plotly_white(),
+                'xaxis': {'title': {'text': self.x_title}},
+                'yaxis': {'title': {'text': value_name}},
+                'legend': {'title': {'text': 'Gene'}},
+                'margin': {'t': 60},
+                'barmode': 'group',
+            }}
+        if n_selected is not None and n_selected > MAX_COMPARED_GENES:
+            fig['layout']['title'] = {'text': f'First {MAX_COMPARED_GENES} of the {n_selected} selected genes'}
+        return fig
+
+    def selection_figure(self, entity_matrix, selected, value_name, barmode='relative', by='GeneSymbol'):
+        """Figure of the gene, or list of genes, `selected` in a dropdown, with their values in `entity_matrix`."""
+        if isinstance(selected, list) and len(selected) > 1:
+            genes, values = entity_matrix.gather(selected[:MAX_COMPARED_GENES], by)
+            return self.comparison(values, genes, value_name, n_selected=len(selected))
+        if isinstance(selected, list):
+            selected = selected[0] if selected else None
+        return self.figure(entity_matrix.get(selected, by), value_name, barmode=barmode)
+
+
+def heatmap(values, rows, columns, value_name, x_title='Disease entity', cell_text=True):
+    """Heatmap of the (rows × columns) `values`, with the value in every cell if `cell_text`, NaN cells blank."""
+    data = [{
+        'type': 'heatmap',
+        'z': values,
+        'x': list(columns),
+        'y': list(rows),
+        'colorscale': 'Blues',
+        'colorbar': {'title': {'text': value_name}},
+        'hovertemplate': f'{x_title}=%{{x}}<br>%{{y}}<br>{value_name}=%{{z}}<extra></extra>',
+        'xgap': 1,
+        'ygap': 1,
+    }]
+    if cell_text:
+        data[0]['texttemplate'] = '%{z}'
+    layout = {
+        'template': _plotly_white(),
+        'xaxis': {'title': {'text': x_title}, 'type': 'category'},
+        'yaxis': {'type': 'category', 'autorange': 'reversed'},
+        'margin': {'t': 60},
+    }
+    return {'data': data, 'layout': layout}
+
+
+_charts = {}
+
+
+def entity_bar_chart(entities):
+    """The shared EntityBarChart of the disease entities `entities`, colored by study group."""
+    key = tuple(entities)
+    with _lock:
+        if key not in _charts:
+            _charts[key] = EntityBarChart(key, registry.study_group_mapping())
+        return _charts[key]
@@ -0,0 +1,131 @@
+"""Gene search service behind the search-as-you-type gene dropdowns.
+
+A `GeneIndex` is built once per table over the gene symbols and gene IDs (ENSG) of its rows, or over
+the gene pairs and both partners of the fusion table. Queries are answered from a sorted array of
+lowercased terms (prefix matches, found with two binary searches) and, for longer queries that do not
+fill the result list with prefix matches, from a sorted trigram index of the same terms (substring
+matches).
+"""
+import threading
+
+import numpy as np
+
+from backend import registry
+
+DEFAULT_LIMIT = 50
+
+# value column -> columns searched for it
+SEARCH_COLUMNS = {
+    'GeneSymbol': ['GeneSymbol', 'GeneID'],
+    'Gene_pair': ['Gene_pair', 'GeneSymbol_1', 'GeneSymbol_2', 'GeneID_1', 'GeneID_2'],
+}
+
+
+def _trigram_codes(chars):
+    """Trigrams of rows of code points (0-padded) packed into uint64, with the mask of the complete ones."""
+    chars = chars.astype(np.uint64)
+    codes = (chars[:, :-2] << np.uint64(42)) | (chars[:, 1:-1] << np.uint64(21)) | chars[:, 2:]
+    return codes, chars[:, 2:] != 0
+
+
+class GeneIndex:
+    """Prefix and trigram index of the search terms of the unique values of a table column."""
+
+    def __init__(self, df, value_column, term_columns):
+        values = df[value_column]
+        first = ~values.duplicated().to_numpy()
+        df = df[first]
+        self.values = df[value_column].to_numpy(dtype=object)
+        # text matched by the dropdown itself when filtering the options in the browser
+        search_text = df[term_columns[0]].astype(str)
+        for column in term_columns[1:]:
+            search_text = search_text + ' ' + df[column].astype(str)
+        self.search_text = search_text.to_numpy(dtype=object)
+
+        terms = np.concatenate([df[column].astype(str).str.lower().to_numpy(dtype=str) for column in term_columns])
+        value_ids = np.tile(np.arange(len(self.values), dtype=np.int32), len(term_columns))
+        order = np.argsort(terms, kind='stable')
+        self.terms = terms[order]
+        self.term_values = value_ids[order]
+        self.term_lengths = np.char.str_len(self.terms)
+        self._positions = {value: i for i, value in enumerate(self.values)}
+        self._build_trigram_index()
+
+    def _build_trigram_index(self):
+        # sorted (trigram, term) pairs: the terms containing a trigram are one contiguous sorted slice
+        chars = self.terms.view(np.uint32).reshape(len(self.terms), -1)
+        if chars.shape[1] < 3:
+            self.trigrams = np.empty(0, dtype=np.uint64)
+            self.trigram_terms = np.empty(0, dtype=np.int32)
+            return
+        codes, complete = _trigram_codes(chars)
+        term_ids = np.broadcast_to(np.arange(len(self.terms), dtype=np.int32)[:, None], codes.shape)[complete]
+        codes = codes[complete]
+        order = np.lexsort((term_ids, codes))
+        codes, term_ids = codes[order], term_ids[order]
+        unique = np.ones(len(codes), dtype=bool)
+        unique[1:] = (codes[1:] != codes[:-1]) | (term_ids[1:] != term_ids[:-1])
+        self.trigrams = codes[unique]
+        self.trigram_terms = term_ids[unique]
+
+    def _prefix_matches(self, query):
+        lo = np.searchsorted(self.terms, query, side='left')
+        hi = np.searchsorted(self.terms, query + '\uffff', side='left')
+        # exact and short terms first, then the table order
+        candidates = np.lexsort((self.term_values[lo:hi], self.term_lengths[lo:hi])) + lo
+        return self.term_values[candidates]
+
+    def _substring_matches(self, query):
+        codes, _ = _trigram_codes(np.array([query]).view(np.uint32).reshape(1, -1))
+        codes = np.unique(codes)
+        starts = np.searchsorted(self.trigrams, codes, side='left')
+        ends = np.searchsorted(self.trigrams, codes, side='right')
+        # intersect the shortest posting lists first
+        candidates = None
+        for i in np.argsort(ends - starts):
+            ids = self.trigram_terms[starts[i]:ends[i]]
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                break
+        # sharing all trigrams does not guarantee the trigrams are in the right order
+        matches = [term_id for term_id in candidates.tolist() if query in self.terms[term_id]]
+        return np.sort(self.term_values[matches])
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Positions of the values matching `query`, best matches first, at most `limit`."""
+        query = query.strip().lower()
+        if not query:
+            return np.arange(min(limit, len(self.values)))
+        matches = self._prefix_matches(query)
+        exact = len(matches) and self.terms[np.searchsorted(self.terms, query)] == query
+        if not exact and len(np.unique(matches)) < limit and len(query) >= 3:
+            matches = np.concatenate([matches, self._substring_matches(query)])
+        _, first = np.unique(matches, return_index=True)
+        return matches[np.sort(first)][:limit]
+
+    def option(self, position):
+        return {'label': self.values[position], 'value': self.values[position],
+                'search': self.search_text[position]}
+
+    def options(self, search_value, selected=None, limit=DEFAULT_LIMIT):
+        """Dropdown options of the values matching `search_value`, always including the `selected` value(s)."""
+        positions = self.search(search_value or '', limit).tolist()
+        selected = selected if isinstance(selected, list) else [selected]
+        missing = [self._positions[value] for value in selected if value in self._positions]
+        missing = [position for position in dict.fromkeys(missing) if position not in positions]
+        return [self.option(position) for position in missing + positions]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def index(table_name, value_column='GeneSymbol'):
+    """The shared GeneIndex of the values in `value_column` of the registry table `table_name`."""
+    key = (table_name, value_column)
+    with _lock:
+        if key not in _indexes:
+            df = registry.get(table_name)
+            term_columns = [column for column in SEARCH_COLUMNS[value_column] if column in df.columns]
+            _indexes[key] = GeneIndex(df, value_column, term_columns)
+        return _indexes[key]
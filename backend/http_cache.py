@@ -0,0 +1,166 @@
+"""Compression, ETags and Cache-Control headers of the responses of the Flask server.
+
+- Every GET response gets a strong ETag (the SHA-1 of its body unless the view set one) and conditional
+  requests are answered with 304 Not Modified: the layout, the callback graph, the Dash component suites
+  and the assets are only downloaded again when they change, i.e. for the layout when the data changes.
+- Cache-Control: fingerprinted component suites and assets are immutable, assets without a fingerprint
+  (the images) can be reused for a day, everything else is revalidated with its ETag.
+- Text responses are compressed with brotli (when the `brotli` package is installed) or gzip, depending
+  on the Accept-Encoding of the request. The compressed bodies of GET responses are computed once, at
+  the highest level, and kept in memory by ETag; `warm` compresses the page and the bundles it loads
+  ahead of the first request. Callback responses and the index page, which differs for every request,
+  are compressed on the fly at a faster level.
+
+Set MLL_COMPRESS=0 when the reverse proxy compresses the responses itself.
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENABLED = os.environ.get('MLL_COMPRESS', '1') == '1'
+MIN_SIZE = 512
+CACHE_MAX_BYTES = int(os.environ.get('MLL_COMPRESS_CACHE_BYTES', 64 << 20))
+COMPRESSIBLE = {'application/json', 'application/javascript', 'text/javascript', 'text/css', 'text/html',
+                'text/plain', 'text/csv', 'image/svg+xml'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+ASSET_MAX_AGE = 86400
+
+_compressed = OrderedDict()
+_compressed_size = 0
+_lock = threading.Lock()
+
+
+def _compress(data, encoding, best):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+def _compressed_body(etag, data, encoding):
+    # compressed bodies of the GET responses, by ETag, bounded in bytes
+    global _compressed_size
+    key = (etag, encoding)
+    with _lock:
+        body = _compressed.get(key)
+        if body is not None:
+            _compressed.move_to_end(key)
+            return body
+    body = _compress(data, encoding, best=True)
+    with _lock:
+        if key not in _compressed and len(body) <= CACHE_MAX_BYTES:
+            _compressed[key] = body
+            _compressed_size += len(body)
+            while _compressed_size > CACHE_MAX_BYTES:
+                _, evicted = _compressed.popitem(last=False)
+                _compressed_size -= len(evicted)
+    return body
+
+
+def cache_size():
+    """Total size of the compressed bodies kept in memory."""
+    return _compressed_size
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _cache_control(response, path):
+    if path.startswith('/_dash-component-suites/'):
+        # Dash sets a max-age of a year on the fingerprinted bundles
+        if response.cache_control.max_age:
+            response.headers['Cache-Control'] = IMMUTABLE
+            return
+    elif path.startswith('/assets/'):
+        if 'm' in request.args:
+            response.headers['Cache-Control'] = IMMUTABLE
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}'
+        return
+    if 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = 'no-cache'
+
+
+def _not_modified(response, etag):
+    not_modified = Response(status=304)
+    for header in ('Cache-Control', 'Vary'):
+        if header in response.headers:
+            not_modified.headers[header] = response.headers[header]
+    not_modified.set_etag(etag)
+    return not_modified
+
+
+def _after_request(response):
+    get = request.method in ('GET', 'HEAD')
+    if get and response.status_code in (200, 304):
+        _cache_control(response, request.path)
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.is_streamed and not response.direct_passthrough:
+        # generated while being sent, e.g. exports
+        return response
+    compressible = response.mimetype in COMPRESSIBLE
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    if not get:
+        encoding = _encoding() if ENABLED and compressible else None
+        if encoding and response.content_length and response.content_length >= MIN_SIZE:
+            response.set_data(_compress(response.get_data(), encoding, best=False))
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    if response.direct_passthrough:
+        if not compressible:
+            # files served by Flask, which already sent their ETag and honored conditional requests
+            return response
+        response.direct_passthrough = False
+    data = response.get_data()
+    etag = response.get_etag()[0] or hashlib.sha1(data).hexdigest()
+    encoding = _encoding() if ENABLED and compressible and len(data) >= MIN_SIZE else None
+    # the compressed representations have their own strong ETag
+    for variant in (etag, f'{etag}-br', f'{etag}-gzip'):
+        if request.if_none_match.contains(variant):
+            return _not_modified(response, variant)
+    if encoding:
+        if response.mimetype == 'text/html':
+            # the index page of Dash embeds a token changing with every request
+            response.set_data(_compress(data, encoding, best=False))
+        else:
+            response.set_data(_compressed_body(etag, data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag = f'{etag}-{encoding}'
+    response.set_etag(etag)
+    return response
+
+
+def init_app(server):
+    """Compress the responses of the Flask `server` and add their caching headers."""
+    server.after_request(_after_request)
+
+
+def warm(server):
+    """Compress the layout, the callback graph and the bundles of the index page, e.g. before forking."""
+    if not ENABLED:
+        return
+    client = server.test_client()
+    page = client.get('/', headers={'Accept-Encoding': 'identity'}).get_data(as_text=True)
+    urls = ['/_dash-layout', '/_dash-dependencies']
+    urls += re.findall(r'(?:src|href)="(/(?:_dash-component-suites|assets)/[^"]+)"', page)
+    for encoding in ('br', 'gzip') if brotli is not None else ('gzip',):
+        for url in urls:
+            client.get(url, headers={'Accept-Encoding': encoding})
@@ -0,0 +1,68 @@
+"""Initial outputs of the callbacks, computed once and embedded in the layouts.
+
+Without them, the browser fires every callback of a page (or of a lazy section) as soon as its
+components appear, one request and one figure build per graph, before the first chart shows. A callback
+registered with `callback` instead of `dash.callback` is computed once for the initial values of its
+inputs in the layout given as `layout`, its outputs are set in that layout, and the callback is registered
+with prevent_initial_call: the layout (or the section) arrives with its charts, and the callback only runs
+when the user changes an input. Callbacks computing the inputs of another one, like the consequences of
+the selected gene, must be registered first.
+
+    @initial.callback(
+        Output('n_var_gene_histogram', 'figure'),
+        [Input('drop_down_n_var_gene', 'value')],
+        layout=sections.content(n_var_gene_section)
+    )
+    def update_n_var_gene_histogram(selected_gene):
+        ...
+
+Run at import, i.e. once in the gunicorn master when preloading; figures of cached callbacks also
+land in the figure cache.
+"""
+import dash
+from dash.dependencies import Input, Output, State
+from dash.development.base_component import Component
+from plotly.basedatatypes import BaseFigure
+
+
+def _components(tree, found):
+    if isinstance(tree, (list, tuple)):
+        for child in tree:
+            _components(child, found)
+    elif isinstance(tree, Component):
+        component_id = getattr(tree, 'id', None)
+        if isinstance(component_id, str):
+            found[component_id] = tree
+        _components(getattr(tree, 'children', None), found)
+    return found
+
+
+def _dependencies(args):
+    dependencies = []
+    for arg in args:
+        dependencies.extend(arg if isinstance(arg, (list, tuple)) else [arg])
+    return ([d for d in dependencies if isinstance(d, Output)], [d for d in dependencies if isinstance(d, Input)],
+            [d for d in dependencies if isinstance(d, State)])
+
+
+def prefill(layout, function, outputs, inputs, states=()):
+    """Set the `outputs` of the components of `layout` to `function` of the values of `inputs` and `states`."""
+    components = _components(layout, {})
+    values = [getattr(components[d.component_id], d.component_property, None) for d in list(inputs) + list(states)]
+    results = function(*values)
+    if len(outputs) == 1:
+        results = [results]
+    for output, value in zip(outputs, results):
+        if isinstance(value, BaseFigure):
+            # serialized with every response of the layout
+            value = value.to_plotly_json()
+        setattr(components[output.component_id], output.component_property, value)
+
+
+def callback(*args, layout, **kwargs):
+    """`dash.callback` whose outputs for the initial inputs are computed now and embedded in `layout`."""
+    def decorator(function):
+        registered = dash.callback(*args, prevent_initial_call=True, **kwargs)(function)
+        prefill(layout, function, *_dependencies(args))
+        return registered
+    return decorator
@@ -0,0 +1,93 @@
+"""Gene × disease entity matrices of the per-gene tables, indexed by gene at load time.
+
+An `EntityMatrix` keeps the per-entity columns of a table as one contiguous 2-D NumPy array and
+dictionaries from gene symbol, gene ID and fusion pair (and, for the VEP table, gene symbol plus
+consequence) to row positions, so the figure callbacks look a gene up and slice its row instead of
+scanning the whole table.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend import registry
+
+KEY_COLUMNS = ('GeneSymbol', 'GeneID', 'Gene_pair')
+
+# table -> (number of leading identifier columns, composite keys indexed on top of KEY_COLUMNS)
+TABLES = {
+    'or_dn_agg_tab': (2, []),
+    'or_up_agg_tab': (2, []),
+    'outrider_agg_tab': (2, []),
+    'fraser_agg_tab': (2, []),
+    'activation_agg_tab': (2, []),
+    'absplice_agg_tab': (2, []),
+    'absplice_ratio_tab': (2, []),
+    'fusion_agg_tab': (5, []),
+    'n_var_gene_tab': (2, []),
+    'n_var_vep_tab': (4, [('GeneSymbol', 'Consequence')]),
+    'fpkm_agg_tab': (2, []),
+}
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+
+class EntityMatrix:
+    """Per-entity values of a table as a (genes × entities) array with gene-keyed row indexes."""
+
+    def __init__(self, df, n_id_columns, composite_keys=()):
+        self.ids = df.iloc[:, :n_id_columns]
+        self.entities = list(df.columns[n_id_columns:])
+        self.values = np.ascontiguousarray(df.iloc[:, n_id_columns:].to_numpy())
+        # shared by every request thread
+        self.values.flags.writeable = False
+        self._indexes = {}
+        for column in KEY_COLUMNS:
+            if column in self.ids.columns:
+                self._indexes[column] = self._build_index([column])
+        for columns in composite_keys:
+            self._indexes[tuple(columns)] = self._build_index(list(columns))
+
+    def _build_index(self, columns):
+        key = columns[0] if len(columns) == 1 else columns
+        return self.ids.groupby(key, sort=False, observed=True).indices
+
+    def rows(self, key, by='GeneSymbol'):
+        """Positions of the rows whose `by` column (or tuple of columns) equals `key`, usually one."""
+        return self._indexes[by].get(key, _EMPTY)
+
+    def get(self, key, by='GeneSymbol'):
+        """The (rows × entities) values of `key`."""
+        return self.values[self.rows(key, by)]
+
+    def gather(self, keys, by='GeneSymbol'):
+        """The `keys` found in the table, without repeats, and their first rows as one (keys × entities) array."""
+        index = self._indexes[by]
+        found = [key for key in dict.fromkeys(keys) if key in index]
+        rows = np.fromiter((index[key][0] for key in found), dtype=np.intp, count=len(found))
+        return found, self.values[rows]
+
+    def melt(self, key, value_name, by='GeneSymbol', var_name='Disease entity'):
+        """Long format of the values of `key`, in the row order of `pd.melt` over the entity columns."""
+        values = self.get(key, by)
+        return pd.DataFrame({var_name: np.repeat(self.entities, len(values)),
+                             value_name: values.T.ravel()})
+
+
+_matrices = {}
+_lock = threading.Lock()
+
+
+def entity_matrix(table_name):
+    """The shared EntityMatrix of the registry table `table_name`."""
+    with _lock:
+        if table_name not in _matrices:
+            n_id_columns, composite_keys = TABLES[table_name]
+            _matrices[table_name] = EntityMatrix(registry.get(table_name), n_id_columns, composite_keys)
+        return _matrices[table_name]
+
+
+def load_all():
+    """Build the matrix and indexes of every per-gene table."""
+    for table_name in TABLES:
+        entity_matrix(table_name)
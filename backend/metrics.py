@@ -0,0 +1,274 @@
+"""Prometheus metrics of the callbacks, caches and data of every worker, served on `/metrics`.
+
+Every callback request (POST /_dash-update-component) is timed from the start of the request until
+its response is ready, and counted by callback (its output property) and status, with the size of its
+uncompressed response; failed callbacks are also counted separately. The metrics of the caches, the
+time spent loading each table and the memory usage of the process are read when /metrics is scraped.
+All samples carry the pid of the worker as `worker` label.
+
+Each gunicorn worker keeps its own metrics. With MLL_METRICS_DIR set, workers write a snapshot of
+theirs into that directory at most every SNAPSHOT_INTERVAL seconds, and /metrics answers with the
+metrics of all live workers, whichever worker serves it. The text format is written by hand to avoid
+depending on prometheus_client.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+from flask import Response, g, request
+
+from backend import figure_cache, http_cache, procstats, registry
+
+ENABLED = os.environ.get('MLL_METRICS', '1') == '1'
+METRICS_DIR = os.environ.get('MLL_METRICS_DIR')
+SNAPSHOT_INTERVAL = 5
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# requests for outputs beyond this number of distinct ones are counted as callback="other"
+MAX_CALLBACKS = 256
+
+_started = time.time()
+_callbacks = set()
+_lock = threading.Lock()
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def family(self):
+        with self._lock:
+            samples = [(self.name, dict(labels), value) for labels, value in self._values.items()]
+        return self.name, 'counter', self.documentation, samples
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # labels -> [count per bucket (non-cumulative, the last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def family(self):
+        samples = []
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        for labels, counts in values:
+            labels = dict(labels)
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                samples.append((f'{self.name}_bucket', {**labels, 'le': str(bound)}, total))
+            samples.append((f'{self.name}_count', labels, total))
+            samples.append((f'{self.name}_sum', labels, counts[-1]))
+        return self.name, 'histogram', self.documentation, samples
+
+
+CALLBACK_SECONDS = Histogram('mll_callback_duration_seconds',
+                             'Time from the start of a callback request until its response is ready.',
+                             LATENCY_BUCKETS)
+CALLBACK_BYTES = Histogram('mll_callback_response_bytes', 'Uncompressed size of the callback responses.',
+                           SIZE_BUCKETS)
+CALLBACK_REQUESTS = Counter('mll_callback_requests_total', 'Callback requests by callback and HTTP status.')
+CALLBACK_ERRORS = Counter('mll_callback_errors_total', 'Callback requests that raised an error.')
+_metrics = [CALLBACK_SECONDS, CALLBACK_BYTES, CALLBACK_REQUESTS, CALLBACK_ERRORS]
+
+
+def _gauge(name, documentation, samples, kind='gauge'):
+    return name, kind, documentation, [(name, labels, value) for labels, value in samples]
+
+
+def _collect():
+    families = [metric.family() for metric in _metrics]
+
+    stats = figure_cache.cache.stats()
+    lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+    families += [
+        _gauge('mll_figure_cache_lookups_total', 'Figure cache lookups by result.',
+               [({'result': 'memory_hit'}, stats['hits']), ({'result': 'disk_hit'}, stats['disk_hits']),
+                ({'result': 'miss'}, stats['misses'])], kind='counter'),
+        _gauge('mll_figure_builds_total', 'Figures built by the callbacks after a figure cache miss.',
+               [({}, stats['builds'])], kind='counter'),
+        _gauge('mll_coalesced_requests_total',
+               'Figure cache misses answered by the build of another thread or worker instead of building it.',
+               [({'scope': 'threads'}, stats['coalesced_threads']),
+                ({'scope': 'workers'}, stats['coalesced_workers'])], kind='counter'),
+        _gauge('mll_figure_builds_in_flight', 'Figures being built right now.', [({}, stats['in_flight'])]),
+        _gauge('mll_figure_cache_evictions_total', 'Figures evicted from the in-memory figure cache.',
+               [({}, stats['evictions'])], kind='counter'),
+        _gauge('mll_figure_cache_hit_ratio', 'Share of the figure cache lookups answered from a cache.',
+               [({}, (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0)]),
+        _gauge('mll_figure_cache_bytes', 'Size of the figures in the in-memory figure cache.',
+               [({}, stats['bytes'])]),
+        _gauge('mll_figure_cache_entries', 'Figures in the in-memory figure cache.', [({}, stats['entries'])]),
+        _gauge('mll_compressed_cache_bytes', 'Size of the compressed response bodies kept in memory.',
+               [({}, http_cache.cache_size())]),
+    ]
+
+    usage = procstats.memory_usage()
+    families += [
+        _gauge('mll_process_memory_bytes', 'Memory usage of the worker by kind (rss, pss, private).',
+               [({'kind': 'rss'}, usage.get('rss', 0)), ({'kind': 'pss'}, usage.get('pss', 0)),
+                ({'kind': 'private'}, usage.get('private_clean', 0) + usage.get('private_dirty', 0))]),
+        _gauge('mll_process_start_time_seconds', 'Start time of the worker since the epoch.', [({}, _started)]),
+        _gauge('mll_table_load_seconds', 'Time spent loading each table, in the master when preloading.',
+               [({'table': name}, seconds) for name, seconds in sorted(registry.load_seconds.items())]),
+        _gauge('mll_table_bytes', 'Memory used by each table, with the compact dtypes of backend.schema.',
+               [({'table': name}, size) for name, size in sorted(registry.table_bytes.items())]),
+    ]
+    worker = str(os.getpid())
+    return [(name, kind, documentation, [(sample, {'worker': worker, **labels}, value)
+                                         for sample, labels, value in samples])
+            for name, kind, documentation, samples in families]
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def render(families):
+    """Prometheus text format of the metric `families`, merging the families of the same name."""
+    merged = {}
+    for name, kind, documentation, samples in families:
+        if name in merged:
+            merged[name][2].extend(samples)
+        else:
+            merged[name] = (kind, documentation, list(samples))
+    lines = []
+    for name, (kind, documentation, samples) in merged.items():
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        for sample, labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f'{sample}{{{label_text}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+_last_snapshot = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def _write_snapshot():
+    global _last_snapshot
+    now = time.monotonic()
+    # one thread of the worker writes the snapshot, the others go on
+    if now - _last_snapshot < SNAPSHOT_INTERVAL or not _snapshot_lock.acquire(blocking=False):
+        return
+    try:
+        _last_snapshot = now
+        path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(_collect(), f)
+        os.replace(f'{path}.tmp', path)
+    except OSError:
+        pass
+    finally:
+        _snapshot_lock.release()
+
+
+def _other_workers():
+    families = []
+    for entry in os.scandir(METRICS_DIR):
+        pid, _, extension = entry.name.partition('.')
+        if extension != 'json' or not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            # the worker exited (e.g. recycled by max_requests), its snapshot with it
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            continue
+        except PermissionError:
+            pass
+        try:
+            with open(entry.path) as f:
+                families += json.load(f)
+        except (OSError, ValueError):
+            continue
+    return families
+
+
+def _serve_metrics():
+    families = _collect()
+    if METRICS_DIR:
+        families += _other_workers()
+    return Response(render(families), mimetype='text/plain', headers={'Cache-Control': 'no-store'})
+
+
+def _before_request():
+    if ENABLED and request.method == 'POST' and request.path.endswith('/_dash-update-component'):
+        # [start, status, response size], filled in by the other hooks
+        g.mll_callback = [time.perf_counter(), 500, None]
+
+
+def _after_request(response):
+    state = g.get('mll_callback')
+    if state is not None:
+        state[1] = response.status_code
+        state[2] = response.content_length
+    return response
+
+
+def _callback_label():
+    try:
+        # parsed and cached by Dash already
+        callback = str(request.get_json().get('output', ''))
+    except Exception:
+        callback = ''
+    if callback not in _callbacks:
+        with _lock:
+            if callback not in _callbacks:
+                if len(_callbacks) >= MAX_CALLBACKS:
+                    return 'other'
+                _callbacks.add(callback)
+    return callback
+
+
+def _teardown_request(exc):
+    state = g.pop('mll_callback', None)
+    if state is None:
+        return
+    started, status, response_bytes = state
+    elapsed = time.perf_counter() - started
+    labels = (('callback', _callback_label()),)
+    CALLBACK_SECONDS.observe(labels, elapsed)
+    CALLBACK_REQUESTS.inc(labels + (('status', str(status)),))
+    if exc is not None or status >= 500:
+        CALLBACK_ERRORS.inc(labels)
+    elif response_bytes is not None:
+        CALLBACK_BYTES.observe(labels, response_bytes)
+    if METRICS_DIR:
+        _write_snapshot()
+
+
+def init_app(server):
+    """Instrument the callbacks of the Flask `server` and serve the metrics on /metrics."""
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+    server.before_request(_before_request)
+    server.after_request(_after_request)
+    server.teardown_request(_teardown_request)
+    server.add_url_rule('/metrics', 'mll_metrics', _serve_metrics)
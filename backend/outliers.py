@@ -0,0 +1,121 @@
+"""Gene × method × disease entity tensor of the aggregated outlier tables.
+
+The aggregated tables of the outlier methods (METHODS) share their gene identifier columns and their
+disease entity columns. `OutlierTensor` aligns them once, on the genes of the registry table
+'outlier_genes' (the union of their genes, sorted by symbol) and on the entities of the first table, into
+one dense (genes × methods × entities) array: the profile of a gene across every method is a single row
+gather instead of one lookup per table. Genes not reported by a method are NaN for that method. The array
+is float32 when it holds every value exactly, float64 otherwise (the AbSplice ratios).
+
+The profile of a gene is also served as JSON from `/_mll/profile/<gene symbol or ID>`.
+"""
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+from flask import Response, abort, request
+
+from backend import registry
+
+ROUTE = '/_mll/profile/'
+GENES_TABLE = 'outlier_genes'
+ID_COLUMNS = 2
+# entity columns named differently in some tables
+ENTITY_ALIASES = {'All_samples': 'Total'}
+
+# (method, table, value name)
+METHODS = (
+    ('OUTRIDER', 'outrider_agg_tab', 'Number of samples'),
+    ('OUTRIDER up', 'or_up_agg_tab', 'Number of samples'),
+    ('OUTRIDER down', 'or_dn_agg_tab', 'Number of samples'),
+    ('NB-act', 'activation_agg_tab', 'Number of samples'),
+    ('FRASER', 'fraser_agg_tab', 'Number of samples'),
+    ('AbSplice', 'absplice_agg_tab', 'Number of samples'),
+    ('AbSplice ratio', 'absplice_ratio_tab', 'Ratio of samples'),
+)
+
+
+class OutlierTensor:
+    """Values of every method and disease entity of a gene, as a (genes × methods × entities) array."""
+
+    def __init__(self, genes, tables):
+        self.genes = genes
+        self.methods = [method for method, _, _ in METHODS]
+        self.entities = [ENTITY_ALIASES.get(column, column) for column in tables[0].columns[ID_COLUMNS:]]
+        gene_index = pd.Index(genes['GeneSymbol'])
+        entity_index = pd.Index(self.entities)
+        values = np.full((len(genes), len(tables), len(self.entities)), np.nan)
+        for j, df in enumerate(tables):
+            rows = gene_index.get_indexer(df['GeneSymbol'])
+            columns = entity_index.get_indexer([ENTITY_ALIASES.get(c, c) for c in df.columns[ID_COLUMNS:]])
+            present = columns >= 0
+            values[rows[:, None], j, columns[present][None, :]] = df.iloc[:, ID_COLUMNS:].to_numpy(float)[:, present]
+        if np.array_equal(values.astype(np.float32), values, equal_nan=True):
+            values = values.astype(np.float32)
+        # shared by every request thread
+        values.flags.writeable = False
+        self.values = values
+        self._positions = {}
+        for column in ('GeneID', 'GeneSymbol'):
+            self._positions.update((key, i) for i, key in enumerate(genes[column]) if key not in self._positions)
+
+    def position(self, gene):
+        """Row of the gene symbol or ID `gene`, None if no method reports it."""
+        return self._positions.get(gene)
+
+    def profile(self, gene):
+        """The (methods × entities) values of `gene`, None if no method reports it."""
+        position = self.position(gene)
+        return None if position is None else self.values[position]
+
+    def top_gene(self):
+        """Symbol of the gene reported by the most methods, with the most outlier samples among them."""
+        total = self.values[:, :, self.entities.index('Total')]
+        reported = (~np.isnan(total)).sum(axis=1)
+        order = np.lexsort((-np.nan_to_num(total).sum(axis=1), -reported))
+        return self.genes['GeneSymbol'].iloc[order[0]]
+
+
+_tensor = None
+_lock = threading.Lock()
+
+
+def tensor():
+    """The shared OutlierTensor of the registry tables."""
+    global _tensor
+    with _lock:
+        if _tensor is None:
+            _tensor = OutlierTensor(registry.get(GENES_TABLE), [registry.get(table) for _, table, _ in METHODS])
+        return _tensor
+
+
+def profile_payload(gene):
+    """JSON-serializable profile of the gene symbol or ID `gene`, None if no method reports it."""
+    outlier_tensor = tensor()
+    position = outlier_tensor.position(gene)
+    if position is None:
+        return None
+    values = outlier_tensor.values[position]
+    return {
+        'gene': outlier_tensor.genes['GeneSymbol'].iloc[position],
+        'gene_id': outlier_tensor.genes['GeneID'].iloc[position],
+        'entities': outlier_tensor.entities,
+        'methods': [{'method': method, 'table': table, 'value_name': value_name,
+                     'values': [None if np.isnan(value) else value.item() for value in row]}
+                    for (method, table, value_name), row in zip(METHODS, values)],
+    }
+
+
+def _serve_profile(gene):
+    payload = profile_payload(gene)
+    if payload is None:
+        abort(404)
+    response = Response(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+    response.set_etag(f"{payload['gene']}-{registry.data_version()}")
+    return response.make_conditional(request)
+
+
+def init_app(server):
+    """Serve the gene profiles from the Flask `server`."""
+    server.add_url_rule(ROUTE + '<path:gene>', 'mll_gene_profile', _serve_profile)
@@ -0,0 +1,22 @@
+"""Memory statistics of the current process, read from /proc (Linux only)."""
+
+_FIELDS = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared_clean', 'Shared_Dirty': 'shared_dirty',
+           'Private_Clean': 'private_clean', 'Private_Dirty': 'private_dirty'}
+
+
+def memory_usage():
+    """Return rss/pss/shared/private sizes of this process in bytes, or an empty dict if unavailable.
+
+    Pss (proportional set size) is what matters for forked workers: pages shared with the master are
+    split between all processes mapping them, while rss counts them in full for every worker.
+    """
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in _FIELDS:
+                    usage[_FIELDS[key]] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return usage
@@ -0,0 +1,170 @@
+"""Opt-in profiles of the slow callbacks, written to a spool directory for flame graphs or pstats.
+
+Profiling is off by default. It is turned on for every callback request with MLL_PROFILE=1, or for single
+requests carrying the header `X-MLL-Profile: <MLL_PROFILE_TOKEN>` when MLL_PROFILE_TOKEN is set, e.g. a
+callback request copied from the browser and replayed with curl against the production server. Only the
+profiles of the requests taking at least MLL_PROFILE_THRESHOLD_MS are kept.
+
+Two formats (MLL_PROFILE_FORMAT):
+- `collapsed` (default): the stack of the request thread is sampled every MLL_PROFILE_INTERVAL_MS by a
+  helper thread and written as collapsed stacks (`frame;frame;frame count` lines), to be read by
+  flamegraph.pl or speedscope. Requests are profiled concurrently.
+- `prof`: deterministic cProfile statistics, to be read by pstats or snakeviz. They show the exact number
+  of calls but slow the request down noticeably, and only one request per worker is profiled at a time.
+
+The profiles are written to MLL_PROFILE_DIR, which keeps only the MLL_PROFILE_MAX_FILES most recent ones.
+"""
+import cProfile
+import collections
+import hmac
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+from flask import current_app, g, request
+
+ALWAYS = os.environ.get('MLL_PROFILE', '0') == '1'
+TOKEN = os.environ.get('MLL_PROFILE_TOKEN')
+HEADER = 'X-MLL-Profile'
+THRESHOLD = float(os.environ.get('MLL_PROFILE_THRESHOLD_MS', 200)) / 1000
+FORMAT = os.environ.get('MLL_PROFILE_FORMAT', 'collapsed')
+# the sampler needs the GIL to take a sample, which a busy request thread only releases every
+# sys.getswitchinterval() (5 ms by default)
+INTERVAL = float(os.environ.get('MLL_PROFILE_INTERVAL_MS', 5)) / 1000
+PROFILE_DIR = os.environ.get('MLL_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'mll-profiles'))
+MAX_FILES = int(os.environ.get('MLL_PROFILE_MAX_FILES', 50))
+EXTENSIONS = ('.collapsed', '.prof')
+
+if FORMAT not in ('collapsed', 'prof'):
+    raise ValueError(f"MLL_PROFILE_FORMAT must be 'collapsed' or 'prof', not '{FORMAT}'")
+
+# a single cProfile profiler can be active at a time
+_cprofile_lock = threading.Lock()
+_spool_lock = threading.Lock()
+
+
+class Sampler:
+    """Samples the stack of the thread `thread_id` every `interval` seconds from a helper thread."""
+
+    def __init__(self, thread_id, interval=INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='mll-profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{getattr(code, "co_qualname", code.co_name)} '
+                             f'({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            del frame
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """The samples as collapsed stacks, the most frequent first."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _requested():
+    if ALWAYS:
+        return True
+    if TOKEN is None:
+        return False
+    value = request.headers.get(HEADER)
+    return value is not None and hmac.compare_digest(value.encode(), TOKEN.encode())
+
+
+def _callback_name():
+    try:
+        output = str(request.get_json().get('output', ''))
+    except Exception:
+        output = ''
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', output).strip('_')[:80] or 'callback'
+
+
+def _prune():
+    profiles = [entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(EXTENSIONS)]
+    if len(profiles) <= MAX_FILES:
+        return
+    profiles.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in profiles[:len(profiles) - MAX_FILES]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _write(profiler, elapsed):
+    name = (f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{_callback_name()}'
+            f'-{round(elapsed * 1000)}ms.{FORMAT}')
+    path = os.path.join(PROFILE_DIR, name)
+    with _spool_lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if isinstance(profiler, Sampler):
+            with open(path, 'w') as f:
+                f.write(profiler.collapsed())
+        else:
+            profiler.dump_stats(path)
+        _prune()
+    return path
+
+
+def _before_request():
+    if not (request.method == 'POST' and request.path.endswith('/_dash-update-component') and _requested()):
+        return
+    if FORMAT == 'prof':
+        if not _cprofile_lock.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+    else:
+        profiler = Sampler(threading.get_ident())
+    g.mll_profile = (time.perf_counter(), profiler)
+    # started last so that the profile holds as little of this hook as possible
+    if isinstance(profiler, Sampler):
+        profiler.start()
+    else:
+        profiler.enable()
+
+
+def _teardown_request(exc):
+    state = g.pop('mll_profile', None)
+    if state is None:
+        return
+    started, profiler = state
+    elapsed = time.perf_counter() - started
+    if isinstance(profiler, Sampler):
+        profiler.stop()
+    else:
+        profiler.disable()
+        _cprofile_lock.release()
+    if elapsed >= THRESHOLD:
+        try:
+            path = _write(profiler, elapsed)
+        except OSError as e:
+            current_app.logger.warning("Could not write the profile of a callback: %s", e)
+        else:
+            current_app.logger.info("Profile of a %.3f s callback written to %s", elapsed, path)
+
+
+def init_app(server):
+    """Profile the slow callbacks of the Flask `server` when asked to, see the module docstring."""
+    if not ALWAYS and TOKEN is None:
+        return
+    server.before_request(_before_request)
+    server.teardown_request(_teardown_request)
@@ -0,0 +1,314 @@
+"""Server-side paging, sorting and filtering of DataTables.
+
+`TableQuery` answers the `page_current`/`page_size`/`sort_by`/`filter_query` props of a DataTable
+running with `page_action`, `sort_action` and `filter_action` set to 'custom': the filter query is
+parsed into a vectorized boolean mask over the whole table, the sort uses a sorted index computed once
+per column and direction, and only the rows of the requested page are turned into records.
+"""
+import math
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        \{(?P<column>(?:[^}\\]|\\.)*)\}
+      | (?P<quoted>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`)
+      | (?P<symbol>&&|\|\||[is]?(?:>=|<=|!=|=|<|>)|!|\(|\))
+      | (?P<word>[^\s(){}"'`!=<>&|]+)
+    )''', re.VERBOSE)
+
+_RELATIONAL = {'=': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge',
+               'eq': 'eq', 'ne': 'ne', 'lt': 'lt', 'le': 'le', 'gt': 'gt', 'ge': 'ge',
+               'contains': 'contains', 'datestartswith': 'datestartswith'}
+_UNARY = {'blank', 'bool', 'even', 'nil', 'num', 'object', 'odd', 'str'}
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+def _tokenize(query):
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = _TOKEN.match(query, position)
+        if match is None or match.end() == position:
+            raise FilterSyntaxError(f"Unexpected input at {position}: {query[position:]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def _relational(token):
+    """Split a relational operator token into (operator, case insensitive) or return None."""
+    kind, text = token
+    if kind not in ('symbol', 'word'):
+        return None
+    if text in _RELATIONAL:
+        return _RELATIONAL[text], False
+    if text[:1] in ('i', 's') and text[1:] in _RELATIONAL:
+        return _RELATIONAL[text[1:]], text[0] == 'i'
+    return None
+
+
+def _value(token):
+    kind, text = token
+    if kind == 'quoted':
+        quote = text[0]
+        return text[1:-1].replace('\\' + quote, quote), None
+    if kind != 'word':
+        raise FilterSyntaxError(f"Expected a value, got {text!r}")
+    try:
+        return text, float(text)
+    except ValueError:
+        return text, None
+
+
+class _Parser:
+    """Recursive descent parser of the DataTable filter syntax, producing a nested tuple tree."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        if token[0] is None:
+            raise FilterSyntaxError("Unexpected end of the filter query")
+        self.position += 1
+        return token
+
+    def parse(self):
+        tree = self.parse_or()
+        if self.position != len(self.tokens):
+            raise FilterSyntaxError(f"Unexpected {self.peek()[1]!r}")
+        return tree
+
+    def parse_or(self):
+        tree = self.parse_and()
+        while self.peek()[1] in ('||', 'or'):
+            self.take()
+            tree = ('or', tree, self.parse_and())
+        return tree
+
+    def parse_and(self):
+        tree = self.parse_not()
+        while self.peek()[1] in ('&&', 'and'):
+            self.take()
+            tree = ('and', tree, self.parse_not())
+        return tree
+
+    def parse_not(self):
+        if self.peek()[1] in ('!', 'not'):
+            self.take()
+            return ('not', self.parse_not())
+        if self.peek()[1] == '(':
+            self.take()
+            tree = self.parse_or()
+            if self.take()[1] != ')':
+                raise FilterSyntaxError("Missing closing parenthesis")
+            return tree
+        return self.parse_term()
+
+    def parse_term(self):
+        kind, column = self.take()
+        if kind != 'column':
+            raise FilterSyntaxError(f"Expected a {{column}}, got {column!r}")
+        column = column.replace('\\}', '}')
+        if self.peek()[1] == 'is':
+            self.take()
+            _, operand = self.take()
+            if operand not in _UNARY:
+                raise FilterSyntaxError(f"Unsupported 'is {operand}'")
+            return ('is', column, operand)
+        operator = _relational(self.take())
+        if operator is None:
+            raise FilterSyntaxError(f"Expected an operator after {{{column}}}")
+        text, number = _value(self.take())
+        return ('compare', column, operator[0], operator[1], text, number)
+
+
+def parse_filter(query):
+    """Parse a DataTable filter query into an expression tree, None for an empty query."""
+    if not query or not query.strip():
+        return None
+    return _Parser(_tokenize(query)).parse()
+
+
+def _is_numeric(series):
+    return series.dtype.kind in 'biuf'
+
+
+def _as_text(series, insensitive):
+    text = series if pd.api.types.is_string_dtype(series.dtype) else series.astype(str)
+    return text.str.lower() if insensitive else text
+
+
+def _compare(series, operator, insensitive, text, number):
+    missing = series.isna().to_numpy()
+    if operator in ('contains', 'datestartswith'):
+        values = _as_text(series, insensitive)
+        needle = text.lower() if insensitive else text
+        if operator == 'contains':
+            result = values.str.contains(needle, regex=False)
+        else:
+            result = values.str.startswith(needle)
+        return result.fillna(False).to_numpy(dtype=bool) & ~missing
+
+    if _is_numeric(series):
+        if number is None:
+            return np.full(len(series), operator == 'ne') & ~missing
+        values, operand = series.to_numpy(), number
+    else:
+        values, operand = _as_text(series, insensitive).to_numpy(dtype=object), text
+        if insensitive:
+            operand = operand.lower()
+        values = np.where(missing, '', values)
+    with np.errstate(invalid='ignore'):
+        if operator == 'eq':
+            result = values == operand
+        elif operator == 'ne':
+            result = values != operand
+        elif operator == 'lt':
+            result = values < operand
+        elif operator == 'le':
+            result = values <= operand
+        elif operator == 'gt':
+            result = values > operand
+        else:
+            result = values >= operand
+    return np.asarray(result, dtype=bool) & ~missing
+
+
+def _is(series, operand):
+    missing = series.isna().to_numpy()
+    numeric = _is_numeric(series)
+    if operand == 'nil':
+        return missing
+    if operand == 'blank':
+        if numeric:
+            return missing
+        return missing | (series.astype(str).str.len() == 0).to_numpy(dtype=bool)
+    if operand == 'num':
+        return ~missing if numeric and series.dtype.kind != 'b' else np.zeros(len(series), dtype=bool)
+    if operand == 'bool':
+        return ~missing if series.dtype.kind == 'b' else np.zeros(len(series), dtype=bool)
+    if operand == 'str':
+        return ~missing if not numeric else np.zeros(len(series), dtype=bool)
+    if operand in ('even', 'odd'):
+        if not numeric:
+            return np.zeros(len(series), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            remainder = np.mod(series.to_numpy(dtype=float), 2)
+        return (remainder == (0 if operand == 'even' else 1)) & ~missing
+    return np.zeros(len(series), dtype=bool)
+
+
+def _evaluate(df, tree):
+    kind = tree[0]
+    if kind == 'and':
+        return _evaluate(df, tree[1]) & _evaluate(df, tree[2])
+    if kind == 'or':
+        return _evaluate(df, tree[1]) | _evaluate(df, tree[2])
+    if kind == 'not':
+        return ~_evaluate(df, tree[1])
+    column = tree[1]
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    if kind == 'is':
+        return _is(df[column], tree[2])
+    return _compare(df[column], *tree[2:])
+
+
+class TableQuery:
+    """Pages, sorts and filters one immutable DataFrame."""
+
+    MASK_CACHE_SIZE = 32
+
+    def __init__(self, df):
+        self.df = df
+        self._orders = {}
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sort_key(self, column, descending):
+        # dense ranks of the values, equal values share a rank and missing values rank last
+        codes, uniques = pd.factorize(self.df[column], sort=True, use_na_sentinel=True)
+        if descending:
+            codes = np.where(codes < 0, -1, len(uniques) - 1 - codes)
+        return np.where(codes < 0, len(uniques), codes)
+
+    def sorted_index(self, column, descending=False):
+        """Row positions of the table sorted by `column`, missing values last in both directions."""
+        key = (column, descending)
+        with self._lock:
+            order = self._orders.get(key)
+        if order is None:
+            order = np.argsort(self._sort_key(column, descending), kind='stable')
+            order.flags.writeable = False
+            with self._lock:
+                order = self._orders.setdefault(key, order)
+        return order
+
+    def mask(self, filter_query):
+        """Boolean mask of the rows matching `filter_query`, None when nothing is filtered.
+
+        Like the native DataTable filtering, a query that cannot be parsed does not filter anything.
+        """
+        with self._lock:
+            if filter_query in self._masks:
+                self._masks.move_to_end(filter_query)
+                return self._masks[filter_query]
+        try:
+            tree = parse_filter(filter_query)
+        except FilterSyntaxError:
+            tree = None
+        mask = None if tree is None else _evaluate(self.df, tree)
+        with self._lock:
+            self._masks[filter_query] = mask
+            while len(self._masks) > self.MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return mask
+
+    def rows(self, sort_by=None, filter_query=None):
+        """Row positions matching `filter_query`, in the order given by `sort_by`."""
+        # sort_by comes from the client: skip malformed entries and unknown columns
+        sort_by = [s for s in (sort_by or []) if isinstance(s, dict) and isinstance(s.get('column_id'), str)
+                   and s['column_id'] in self.df.columns]
+        if not sort_by:
+            order = np.arange(len(self.df))
+        elif len(sort_by) == 1:
+            order = self.sorted_index(sort_by[0]['column_id'], sort_by[0].get('direction') == 'desc')
+        else:
+            # np.lexsort sorts by the last key first
+            order = np.lexsort([self._sort_key(s['column_id'], s.get('direction') == 'desc')
+                                for s in reversed(sort_by)])
+
+        mask = self.mask(filter_query)
+        if mask is not None:
+            order = order[mask[order]]
+        return order
+
+    def chunks(self, sort_by=None, filter_query=None, size=10000):
+        """The rows matching `filter_query` in the order given by `sort_by`, as DataFrames of `size` rows."""
+        order = self.rows(sort_by, filter_query)
+        for start in range(0, len(order), size):
+            yield self.df.iloc[order[start:start + size]]
+
+    def page(self, page_current, page_size, sort_by=None, filter_query=None):
+        """Return the records of the requested page and the number of pages."""
+        order = self.rows(sort_by, filter_query)
+        page_size = max(1, page_size or 1)
+        page_current = max(0, page_current or 0)
+        start = page_current * page_size
+        records = self.df.iloc[order[start:start + page_size]].to_dict('records')
+        return records, max(1, math.ceil(len(order) / page_size))
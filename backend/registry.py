@@ -0,0 +1,196 @@
+"""Load-once registry for every table served by the website.
+
+Each table is parsed a single time per process, on first request, and the
+shared transformations (column drops, renames, rounding) are applied here so
+that the page modules only ever receive the final frames, with the compact
+dtypes of `backend.schema`. Pages get shallow
+copy-on-write views: adding or overwriting a column in a page never leaks back
+into the registry or into another page.
+"""
+import hashlib
+import os
+import threading
+import time
+import types
+
+import pandas as pd
+
+from backend import binary_cache, schema
+
+if int(pd.__version__.split('.')[0]) < 3:
+    # pandas >= 3 always behaves like this
+    pd.set_option('mode.copy_on_write', True)
+
+DATA_DIR = os.environ.get('MLL_DATA_DIR', './data')
+# built by `python -m backend.binary_cache`, the CSV files are parsed when it is missing or stale
+CACHE_DIR = os.environ.get('MLL_CACHE_DIR', os.path.join(DATA_DIR, binary_cache.CACHE_DIR_NAME))
+
+MANUSCRIPT_WORDING_RENAME = {"Cohort": "Disease entity",
+                             "Cohort abbreviation": "Abbreviation",
+                             "Number of sampples per cohort": "Number of samples per disease entity", }
+
+
+def _drop(*columns):
+    return lambda df: df.drop(list(columns), axis=1)
+
+
+def _round_prediction(df):
+    df['Prediction'] = df['Prediction'].round(3)
+    return df
+
+
+def _sample_annotation(df):
+    df = df.drop(["Cohort during analysis", "Cohort German abbreviation", "Study group during analysis"], axis=1)
+    return df.rename(columns=MANUSCRIPT_WORDING_RENAME)
+
+
+def _abbreviation_table(df):
+    return _drop("Number of samples per study group", "Number of samples per cohort")(_sample_annotation(df))
+
+
+# name -> (csv path relative to DATA_DIR, transformation applied once after parsing)
+SOURCES = {
+    'manuscript_wording_raw': ('leukemie_driver_manuscript_wording-sample_annotation.tsv', None),
+
+    'sample_summary_tab': ('agg_table/sample_summary_tab.csv', None),
+    'or_dn_agg_tab': ('agg_table/or_dn_agg_tab.csv', None),
+    'or_up_agg_tab': ('agg_table/or_up_agg_tab.csv', None),
+    'outrider_agg_tab': ('agg_table/outrider_agg_tab.csv', None),
+    'fraser_agg_tab': ('agg_table/fraser_agg_tab.csv', None),
+    'activation_agg_tab': ('agg_table/activation_agg_tab.csv', None),
+    'fusion_agg_tab': ('agg_table/fusion_agg_tab.csv', None),
+    'absplice_agg_tab': ('agg_table/absplice_agg_tab.csv', None),
+    'absplice_ratio_tab': ('agg_table/absplice_ratio_tab.csv', None),
+
+    'n_var_samp': ('sup_table/n_var_samp_tab.csv', None),
+    'n_var_gene_tab': ('sup_table/n_var_gene_tab.csv', None),
+    'n_var_vep_tab': ('sup_table/n_var_vep_tab.csv', None),
+    'fpkm_agg_tab': ('sup_table/fpkm_tab.csv', None),
+
+    'activation_resource_tab': ('resource_table/activation_resource_tab.csv', _drop('Study group')),
+    'fraser_resource_tab': ('resource_table/fraser_resource_tab.csv', _drop('Study group')),
+    'or_up_resource_tab': ('resource_table/or_up_resource_tab.csv', _drop('Study group')),
+    'or_dn_resource_tab': ('resource_table/or_dn_resource_tab.csv', _drop('Study group')),
+    'absplice_resource_tab': ('resource_table/absplice_resource_tab.csv', _drop('Study group')),
+    'intogen_resource_tab': ('resource_table/intogen_resource_tab.csv', _drop('Entity')),
+
+    'prediction_complete': ('prediction/S1_prediction_complete_dataset_desc.csv', _round_prediction),
+    'prediction_study_group': ('prediction/S2_prediction_study_groups_desc.csv', _round_prediction),
+}
+
+def _outlier_genes(*dfs):
+    genes = pd.concat([df[['GeneID', 'GeneSymbol']].astype(str) for df in dfs], ignore_index=True)
+    return genes.drop_duplicates('GeneSymbol').sort_values('GeneSymbol', ignore_index=True)
+
+
+# name -> (source table or tuple of source tables, transformation) for tables derived from other tables
+DERIVED = {
+    # sample info page keeps the per cohort / per study group counts
+    'sample_annotation': ('manuscript_wording_raw', _sample_annotation),
+    # abbreviation table shown on top of the other pages
+    'manuscript_wording': ('manuscript_wording_raw', _abbreviation_table),
+    # gene axis of `backend.outliers`, every gene of the aggregated outlier tables
+    'outlier_genes': (('outrider_agg_tab', 'or_up_agg_tab', 'or_dn_agg_tab', 'activation_agg_tab',
+                       'fraser_agg_tab', 'absplice_agg_tab', 'absplice_ratio_tab'), _outlier_genes),
+}
+
+_tables = {}
+# table -> seconds spent loading it (including its source table for derived tables)
+load_seconds = {}
+# table -> bytes of memory it uses
+table_bytes = {}
+_study_group_mapping = None
+_data_version = None
+_lock = threading.RLock()
+
+
+def read_csv(path):
+    """Parse the source file at `path`, relative to DATA_DIR."""
+    sep = '\t' if path.endswith('.tsv') else ','
+    return pd.read_csv(os.path.join(DATA_DIR, path), sep=sep)
+
+
+def parse(name):
+    """Parse the source table `name` from its CSV file, transformed and with the compact dtypes."""
+    path, transform = SOURCES[name]
+    df = read_csv(path)
+    if transform is not None:
+        df = transform(df)
+    return schema.compact(df, name)
+
+
+def _load(name):
+    if name in DERIVED:
+        sources, transform = DERIVED[name]
+        if isinstance(sources, str):
+            sources = (sources,)
+        return transform(*[_get(source) for source in sources])
+    if name not in SOURCES:
+        raise KeyError(f"Unknown table '{name}'")
+    path, _ = SOURCES[name]
+    # the binary cache holds the parsed table, returned as it is to keep its columns memory-mapped
+    df = binary_cache.load(os.path.join(DATA_DIR, path), CACHE_DIR, path)
+    return parse(name) if df is None else df
+
+
+def _get(name):
+    df = _tables.get(name)
+    if df is None:
+        with _lock:
+            df = _tables.get(name)
+            if df is None:
+                start = time.perf_counter()
+                df = _tables[name] = _load(name)
+                load_seconds[name] = time.perf_counter() - start
+                table_bytes[name] = schema.memory_bytes(df)
+    return df
+
+
+def register(name, sources, transform):
+    """Register the table `name` computed by `transform` from the tables `sources` on first use."""
+    with _lock:
+        if name in SOURCES or DERIVED.get(name, (sources, transform)) != (sources, transform):
+            raise ValueError(f"Table '{name}' is already registered")
+        DERIVED[name] = (sources, transform)
+
+
+def get(name):
+    """Return a copy-on-write view of the table registered as `name`."""
+    return _get(name).copy(deep=False)
+
+
+def study_group_mapping():
+    """Read-only mapping of disease entity abbreviation -> study group, including 'Total'."""
+    global _study_group_mapping
+    if _study_group_mapping is None:
+        with _lock:
+            if _study_group_mapping is None:
+                mapping = _get('manuscript_wording').set_index('Abbreviation')['Study group'].to_dict()
+                mapping['Total'] = 'Total'
+                _study_group_mapping = types.MappingProxyType(mapping)
+    return _study_group_mapping
+
+
+def data_version():
+    """Short hash of the size and modification time of every source file, changing with the data."""
+    global _data_version
+    if _data_version is None:
+        with _lock:
+            if _data_version is None:
+                digest = hashlib.sha1()
+                for path in sorted(path for path, _ in SOURCES.values()):
+                    try:
+                        stat = os.stat(os.path.join(DATA_DIR, path))
+                    except OSError:
+                        continue
+                    digest.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+                _data_version = digest.hexdigest()[:12]
+    return _data_version
+
+
+def load_all():
+    """Eagerly load every registered table."""
+    for name in list(SOURCES) + list(DERIVED):
+        _get(name)
+    study_group_mapping()
+    data_version()
@@ -0,0 +1,87 @@
+"""Compact dtypes of the registry tables.
+
+pandas parses every text column into one string object per row and every number into 64 bits. `compact`
+is applied once to every table after loading (`backend.registry`):
+
+- repeated text columns, with at most CATEGORY_MAX_RATIO distinct values per row (the entities, methods,
+  metrics and gene symbols repeated for every entity of the resource tables, the study groups), become
+  categoricals with sorted categories: one small integer code per row instead of a string object,
+- integer columns (the counts, ranks and sample numbers) take the smallest integer dtype holding their
+  values, unsigned when none is negative, e.g. uint16 for the per-entity counts,
+- float columns become float32 only when every value is exactly representable: the published ratios,
+  FPKMs and predictions are decimal numbers, which float32 would show as e.g. 0.19799999892711639 in the
+  tables, exports and hover labels.
+
+SCHEMAS overrides the dtype of single columns. `python -m backend.schema` prints the memory of every table
+with the pandas defaults and compacted.
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORY_MAX_RATIO = 0.5
+
+# table -> {column: dtype}, taking precedence over the inferred dtypes
+SCHEMAS = {}
+
+
+def _integer_dtype(values):
+    if not len(values):
+        return values.dtype
+    low, high = values.min(), values.max()
+    for dtype in (np.uint8, np.uint16, np.uint32) if low >= 0 else (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return values.dtype
+
+
+def _compact_column(series):
+    kind = series.dtype.kind
+    if kind in 'iu':
+        return series.astype(_integer_dtype(series.to_numpy()))
+    if kind == 'f':
+        values = series.to_numpy()
+        if np.array_equal(values.astype(np.float32), values, equal_nan=True):
+            return series.astype(np.float32)
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if len(series.cat.categories) > CATEGORY_MAX_RATIO * len(series):
+            return series.astype(series.cat.categories.dtype)
+        return series
+    if pd.api.types.is_string_dtype(series.dtype) and series.nunique() <= CATEGORY_MAX_RATIO * len(series):
+        return series.astype(pd.CategoricalDtype(sorted(series.dropna().unique())))
+    return series
+
+
+def compact(df, name=None):
+    """`df` with the compact dtype of every column, applying the SCHEMAS entry of table `name`."""
+    overrides = SCHEMAS.get(name, {})
+    return pd.DataFrame({column: df[column].astype(overrides[column]) if column in overrides
+                         else _compact_column(df[column]) for column in df.columns}, copy=False)
+
+
+def memory_bytes(df):
+    """Memory used by `df`, counting the strings of text columns."""
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def report():
+    """Print the memory of every source table of the registry with the pandas defaults and compacted."""
+    from backend import registry
+
+    total_before = total_after = 0
+    print(f"{'table':<28}{'rows':>8}{'default MB':>12}{'compact MB':>12}{'ratio':>8}")
+    for name, (path, transform) in registry.SOURCES.items():
+        df = registry.read_csv(path)
+        if transform is not None:
+            df = transform(df)
+        before, after = memory_bytes(df), memory_bytes(compact(df, name))
+        total_before += before
+        total_after += after
+        print(f"{name:<28}{len(df):>8}{before / 1e6:>12.2f}{after / 1e6:>12.2f}{before / max(after, 1):>8.1f}")
+    print(f"{'total':<28}{'':>8}{total_before / 1e6:>12.2f}{total_after / 1e6:>12.2f}"
+          f"{total_before / max(total_after, 1):>8.1f}")
+
+
+if __name__ == '__main__':
+    report()
@@ -0,0 +1,59 @@
+"""Page sections sent to the browser only when they scroll into view.
+
+The layout functions of the pages return one lightweight placeholder card per section. When a
+placeholder comes within a screen of the viewport, `assets/sections.js` flags it in its store, and a
+single pattern-matching callback answers with the content of the section (dropdowns, figures,
+DataTables), whose own callbacks then fire as usual. The content of every section is built once, when
+its page module is imported.
+"""
+import threading
+
+import dash_bootstrap_components as dbc
+from dash import callback, ctx, dcc, html
+from dash.dependencies import MATCH, Input, Output
+from dash.exceptions import PreventUpdate
+
+SECTION_TYPE = 'mll-section'
+VISIBLE_TYPE = 'mll-section-visible'
+# reserved height of a placeholder, so that the page does not jump when sections load
+PLACEHOLDER_HEIGHT = '450px'
+
+_sections = {}
+_lock = threading.Lock()
+
+
+def lazy_card(section_id, children):
+    """Register the content `children` of the card `section_id`, returns `section_id`."""
+    with _lock:
+        if section_id in _sections:
+            raise ValueError(f"Section id '{section_id}' is already used")
+        _sections[section_id] = children
+    return section_id
+
+
+def content(section_id):
+    """The children of the section `section_id`."""
+    return _sections[section_id]
+
+
+def placeholder(section_id):
+    """Empty card replaced by the content of the section `section_id` once it scrolls into view."""
+    return dbc.Card([
+        dcc.Store(id={'type': VISIBLE_TYPE, 'index': section_id}, data=False),
+        html.Div(id={'type': SECTION_TYPE, 'index': section_id},
+                 className='mll-lazy-section',
+                 style={'minHeight': PLACEHOLDER_HEIGHT},
+                 **{'data-section': section_id}),
+    ])
+
+
+@callback(
+    Output({'type': SECTION_TYPE, 'index': MATCH}, 'children'),
+    Output({'type': SECTION_TYPE, 'index': MATCH}, 'style'),
+    [Input({'type': VISIBLE_TYPE, 'index': MATCH}, 'data')],
+    prevent_initial_call=True
+)
+def render_section(visible):
+    if not visible:
+        raise PreventUpdate
+    return _sections[ctx.triggered_id['index']], {}
@@ -0,0 +1,52 @@
+"""Coalescing of identical concurrent computations within a process.
+
+The first thread calling `Group.do` with a key runs the function; threads calling it with the same key
+while it runs wait for its result (or its exception) instead of computing it again.
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """Keyed in-flight computations, counting the calls run (`leaders`) and shared (`followers`)."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = self.followers = 0
+
+    def do(self, key, function):
+        """Return `(function(), shared)`, where `shared` tells whether another thread computed it."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
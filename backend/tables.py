@@ -0,0 +1,82 @@
+"""DataTable factory shared by the pages.
+
+Small tables are embedded in the layout and sorted/filtered in the browser. Every other table runs in
+server-side mode: the browser only receives the rows of the visible page, computed by the
+`backend.query.TableQuery` of that table; the first page is embedded in the layout. Their
+`export_format` is replaced by links downloading the whole table from the server (`backend.export`).
+"""
+import threading
+
+from dash import callback, dash_table, html
+from dash.dependencies import Input, Output
+
+from backend import export, query, registry
+
+# tables up to this number of rows are shipped to the browser as a whole
+NATIVE_MAX_ROWS = 100
+
+_queries = {}
+_registered = {}
+_lock = threading.Lock()
+
+
+def table_query(table_name):
+    """The shared TableQuery of the registry table `table_name`."""
+    with _lock:
+        if table_name not in _queries:
+            _queries[table_name] = query.TableQuery(registry.get(table_name))
+        return _queries[table_name]
+
+
+def _register(table_id, table_name):
+    with _lock:
+        if table_id in _registered:
+            if _registered[table_id] != table_name:
+                raise ValueError(f"DataTable id '{table_id}' is already used for table '{_registered[table_id]}'")
+            return
+        _registered[table_id] = table_name
+    export.register(table_id, table_name, table_query(table_name))
+
+    @callback(
+        Output(table_id, 'data'),
+        Output(table_id, 'page_count'),
+        [Input(table_id, 'page_current'),
+         Input(table_id, 'page_size'),
+         Input(table_id, 'sort_by'),
+         Input(table_id, 'filter_query')],
+        # the layout already holds the first page
+        prevent_initial_call=True
+    )
+    def update_table(page_current, page_size, sort_by, filter_query):
+        return table_query(table_name).page(page_current, page_size, sort_by, filter_query)
+
+
+def data_table(table_id, table_name, page_size=10, **kwargs):
+    """DataTable `table_id` showing the registry table `table_name` with sorting and filtering."""
+    df = registry.get(table_name)
+    columns = [{'name': col, 'id': col} for col in df.columns]
+    if len(df) <= NATIVE_MAX_ROWS:
+        return dash_table.DataTable(id=table_id,
+                                    columns=columns,
+                                    data=df.to_dict('records'),
+                                    page_size=page_size,
+                                    sort_action='native',
+                                    filter_action='native',
+                                    **kwargs)
+    _register(table_id, table_name)
+    data, page_count = table_query(table_name).page(0, page_size, [], '')
+    # the export of the DataTable would only hold the current page
+    exported = kwargs.pop('export_format', None) is not None
+    table = dash_table.DataTable(id=table_id,
+                                 columns=columns,
+                                 data=data,
+                                 page_count=page_count,
+                                 page_current=0,
+                                 page_size=page_size,
+                                 page_action='custom',
+                                 sort_action='custom',
+                                 sort_by=[],
+                                 filter_action='custom',
+                                 filter_query='',
+                                 **kwargs)
+    return html.Div([table, export.links(table_id, table_name)]) if exported else table
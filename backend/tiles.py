@@ -0,0 +1,156 @@
+"""Zoomable gene × disease entity heatmaps of whole tables, sent to the browser one tile at a time.
+
+A per-gene table holds tens of thousands of genes: too many rows to send to the browser as one heatmap,
+or to draw one row per gene. `TilePyramid` orders the genes of a table (by symbol, or highest total
+first) and precomputes coarser levels of its (genes × entities) matrix, each level merging BLOCK_FACTOR
+consecutive rows of the previous one into the mean and the max of their genes. A view of the genes
+[start, stop) is drawn from the finest level with at most MAX_ROWS rows in it, and only the tiles of
+TILE_BLOCKS rows covering the view are sent: the whole table in rows of 64 or 256 genes when zoomed out,
+one row per gene once at most MAX_ROWS genes are in view. The figures of the tiles are cached by
+`backend.figure_cache`, and the color scale of a table is the same at every level and in every tile.
+"""
+import math
+import threading
+
+import numpy as np
+
+from backend import figure_cache, figures, matrix
+
+# table -> (label, value name)
+TABLES = {
+    'fpkm_agg_tab': ('Mean FPKM', 'FPKM expression'),
+    'n_var_gene_tab': ('Filtered variants', 'Number of variants'),
+    'absplice_ratio_tab': ('AbSplice ratio', 'Ratio'),
+    'outrider_agg_tab': ('OUTRIDER outliers', 'Number of samples'),
+    'fraser_agg_tab': ('FRASER outliers', 'Number of samples'),
+}
+# order -> label
+ORDERS = {'symbol': 'Gene symbol', 'total': 'Highest total first'}
+# aggregate -> label
+AGGREGATES = {'max': 'Maximum', 'mean': 'Mean'}
+BLOCK_FACTOR = 4
+MAX_ROWS = 256
+TILE_BLOCKS = 64
+# quantile of the nonzero values of the genes at the top of the color scale
+COLOR_QUANTILE = 0.99
+HEIGHT = 800
+
+
+class TilePyramid:
+    """Values of the genes of an EntityMatrix aggregated over blocks of BLOCK_FACTOR ** level genes."""
+
+    def __init__(self, entity_matrix, order='symbol'):
+        if order not in ORDERS:
+            raise ValueError(f"Unknown gene order '{order}'")
+        # the entities of the bar charts, in their order
+        chart = figures.entity_bar_chart(entity_matrix.entities)
+        self.entities = list(chart.entities[chart.positions])
+        values = entity_matrix.values[:, chart.positions].astype(np.float64)
+        symbols = entity_matrix.ids['GeneSymbol'].astype(str).to_numpy()
+        if order == 'total':
+            rows = np.argsort(-np.nansum(values, axis=1), kind='stable')
+        else:
+            rows = np.argsort(symbols, kind='stable')
+        self.genes = symbols[rows]
+        values = values[rows]
+        finite = values[np.isfinite(values)]
+        self.zmin = float(finite.min()) if len(finite) else 0.0
+        # most genes are 0 in most entities
+        nonzero = finite[finite != 0]
+        self.zmax = float(np.quantile(nonzero, COLOR_QUANTILE)) if len(nonzero) else self.zmin
+        if self.zmax <= self.zmin:
+            self.zmax = self.zmin + 1.0
+
+        # level -> aggregate -> (blocks × entities), level 0 holding the genes themselves
+        genes = values.astype(np.float32)
+        genes.flags.writeable = False
+        self.levels = [{'mean': genes, 'max': genes}]
+        sums, counts, maxima = np.nan_to_num(values), np.isfinite(values).astype(np.int64), values
+        while len(sums) > MAX_ROWS:
+            starts = np.arange(0, len(sums), BLOCK_FACTOR)
+            sums = np.add.reduceat(sums, starts)
+            counts = np.add.reduceat(counts, starts)
+            maxima = np.fmax.reduceat(maxima, starts)
+            with np.errstate(invalid='ignore'):
+                level = {'mean': (sums / counts).astype(np.float32), 'max': maxima.astype(np.float32)}
+            for aggregated in level.values():
+                aggregated.flags.writeable = False
+            self.levels.append(level)
+
+    def view(self, start=None, stop=None):
+        """(level, first tile, stop tile) of the view of the genes [start, stop), all genes by default."""
+        n_genes = len(self.genes)
+        start = 0 if start is None else min(max(math.floor(start), 0), max(n_genes - 1, 0))
+        stop = n_genes if stop is None else max(min(math.ceil(stop), n_genes), start + 1)
+        level = next((level for level in range(len(self.levels))
+                      if math.ceil((stop - start) / BLOCK_FACTOR ** level) <= MAX_ROWS), len(self.levels) - 1)
+        tile_genes = BLOCK_FACTOR ** level * TILE_BLOCKS
+        return level, start // tile_genes, -(-stop // tile_genes)
+
+    def tile(self, aggregate, level, first_tile, stop_tile):
+        """Values and labels of the blocks of the tiles [first_tile, stop_tile) of `level`."""
+        values = self.levels[level][aggregate][first_tile * TILE_BLOCKS:stop_tile * TILE_BLOCKS]
+        size = BLOCK_FACTOR ** level
+        first = np.arange(first_tile * TILE_BLOCKS, first_tile * TILE_BLOCKS + len(values)) * size
+        last = np.minimum(first + size, len(self.genes)) - 1
+        if size == 1:
+            labels = list(self.genes[first])
+        else:
+            labels = [f'{self.genes[i]} … {self.genes[j]} ({j - i + 1} genes)' for i, j in zip(first, last)]
+        return values, labels
+
+
+_pyramids = {}
+_lock = threading.Lock()
+
+
+def pyramid(table_name, order='symbol'):
+    """The shared TilePyramid of the registry table `table_name` with its genes in `order`."""
+    entity_matrix = matrix.entity_matrix(table_name)
+    with _lock:
+        if (table_name, order) not in _pyramids:
+            _pyramids[table_name, order] = TilePyramid(entity_matrix, order)
+        return _pyramids[table_name, order]
+
+
+def view(table_name, order, y_range=None):
+    """View of `table_name` showing the rows in the y axis range `y_range` (genes at 0, 1, ...), all if None."""
+    if y_range is None:
+        return pyramid(table_name, order).view()
+    low, high = sorted(y_range)
+    # the row of gene i spans [i - 0.5, i + 0.5]
+    return pyramid(table_name, order).view(low + 0.5, high + 0.5)
+
+
+@figure_cache.cached('heatmap', 'tiles')
+def tile_figure(table_name, order, aggregate, level, first_tile, stop_tile):
+    """Heatmap of the tiles [first_tile, stop_tile) of `level`, in an y axis spanning every gene of the table."""
+    gene_pyramid = pyramid(table_name, order)
+    values, labels = gene_pyramid.tile(aggregate, level, first_tile, stop_tile)
+    _, value_name = TABLES[table_name]
+    size = BLOCK_FACTOR ** level
+    n_genes = len(gene_pyramid.genes)
+    if size > 1:
+        value_name = f'{AGGREGATES[aggregate]} {value_name[:1].lower()}{value_name[1:]}'
+    fig = figures.heatmap(values, labels, gene_pyramid.entities, value_name, cell_text=False)
+    trace = fig['data'][0]
+    # rows of `size` genes on a numeric axis, from the first gene of the first tile
+    del trace['y'], trace['ygap']
+    trace.update(
+        y0=first_tile * TILE_BLOCKS * size + (size - 1) / 2,
+        dy=size,
+        text=[[label] * len(gene_pyramid.entities) for label in labels],
+        zmin=gene_pyramid.zmin,
+        zmax=gene_pyramid.zmax,
+        hovertemplate=f'%{{text}}<br>Disease entity=%{{x}}<br>{value_name}=%{{z:.6~g}}<extra></extra>',
+    )
+    fig['layout'].update(
+        title={'text': 'One gene per row' if size == 1 else f'Rows of {size} genes'},
+        xaxis=dict(fig['layout']['xaxis'], fixedrange=True),
+        yaxis={'title': {'text': f'{n_genes} genes, {ORDERS[order].lower()}'}, 'range': [n_genes - 0.5, -0.5],
+               'showticklabels': False, 'showgrid': False, 'zeroline': False},
+        height=HEIGHT,
+        # keeps the zoom of the user while the tiles change
+        uirevision=f'{table_name}-{order}',
+    )
+    return fig
@@ -0,0 +1,98 @@
+"""Burst of identical figure requests with and without coalescing (`MLL_COALESCE`).
+
+Simulates the arrival of many visitors at once on cold caches: every client requests the default
+figure of every figure callback at the same moment, first as threads of one worker (gthread), then as
+forked worker processes sharing a figure cache directory (sync workers with MLL_FIGURE_CACHE_DIR).
+Reports the wall time of the burst and the number of figures built.
+
+Run from the repository root: `python -m benchmarks.coalescing [--clients 8]`
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from backend import figure_cache
+from benchmarks.suite import Scenarios
+from mll_app import app
+
+CALLBACK_PATH = '/_dash-update-component'
+
+
+def _requests():
+    client = app.server.test_client()
+    client.get('/_dash-dependencies')
+    scenarios = Scenarios(app, client, 0)
+    return [body for key, entry in app.callback_map.items() if 'callback' in entry and key.endswith('.figure')
+            for kind, _, body in scenarios.requests(key, entry) if kind in ('default', 'option')]
+
+
+def _client(requests, barrier):
+    client = app.server.test_client()
+    barrier.wait()
+    for body in requests:
+        assert client.post(CALLBACK_PATH, json=body).status_code == 200
+
+
+def _reset(disk=None):
+    figure_cache.cache = figure_cache.FigureCache(disk=disk)
+
+
+def burst_threads(requests, clients):
+    _reset()
+    barrier = threading.Barrier(clients + 1)
+    threads = [threading.Thread(target=_client, args=(requests, barrier)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, figure_cache.cache.stats()['builds']
+
+
+def _worker(requests, barrier, directory, builds):
+    _reset(figure_cache.DiskStore(directory, figure_cache.DISK_MAX_BYTES))
+    _client(requests, barrier)
+    builds.put(figure_cache.cache.stats()['builds'])
+
+
+def burst_workers(requests, clients):
+    directory = tempfile.mkdtemp(prefix='mll-coalescing-')
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(clients + 1)
+    builds = context.Queue()
+    processes = [context.Process(target=_worker, args=(requests, barrier, directory, builds))
+                 for _ in range(clients)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    total = sum(builds.get() for _ in processes)
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    shutil.rmtree(directory)
+    return elapsed, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clients', type=int, default=8, help='concurrent threads or worker processes')
+    args = parser.parse_args()
+
+    requests = _requests()
+    print(f"{len(requests)} default figures, {args.clients} clients, {os.cpu_count()} CPUs")
+    print(f"{'burst':<12}{'coalescing':>12}{'seconds':>10}{'builds':>8}")
+    for name, burst in (('threads', burst_threads), ('workers', burst_workers)):
+        for coalesce in (False, True):
+            figure_cache.COALESCE = coalesce
+            elapsed, builds = burst(requests, args.clients)
+            print(f"{name:<12}{'on' if coalesce else 'off':>12}{elapsed:>10.2f}{builds:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Build time of the per-entity bar chart of a gene: plotly express against `backend.figures`.
+
+Both paths start from the row of the gene in its EntityMatrix; "+json" includes the serialization of
+the figure as Dash sends it to the browser.
+
+Run from the repository root: `python -m benchmarks.figure_build`
+"""
+import random
+import statistics
+import time
+
+import plotly.express as px
+import plotly.io as pio
+
+from backend import figures, matrix, registry
+
+# table -> (key column, value name, barmode)
+TABLES = {
+    'n_var_gene_tab': ('GeneSymbol', 'Number of variants', 'relative'),
+    'absplice_ratio_tab': ('GeneSymbol', 'Ratio', 'group'),
+    'fpkm_agg_tab': ('GeneSymbol', 'FPKM expression', 'relative'),
+    'fusion_agg_tab': ('Gene_pair', 'Number of samples', 'group'),
+    'or_dn_agg_tab': ('GeneSymbol', 'Number of samples', 'group'),
+}
+N_GENES = 50
+
+
+def _median_ms(function, keys, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        for key in keys:
+            start = time.perf_counter()
+            function(key)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e3
+
+
+def main():
+    random.seed(0)
+    study_group_mapping = registry.study_group_mapping()
+    print(f"{'table':<20}{'px':>10}{'factory':>10}{'px+json':>10}{'factory+json':>14}{'speedup':>10}  (median ms)")
+    for table_name, (key_column, value_name, barmode) in TABLES.items():
+        entity_matrix = matrix.entity_matrix(table_name)
+        chart = figures.entity_bar_chart(entity_matrix.entities)
+        keys = random.sample(list(entity_matrix.ids[key_column].unique()), N_GENES)
+
+        def plotly_express(key):
+            melted_df = entity_matrix.melt(key, value_name=value_name, by=key_column)
+            melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping)
+            fig = px.bar(melted_df, x='Disease entity', y=value_name, color='Study group', barmode=barmode)
+            return fig.update_traces(width=1).update_layout(template="plotly_white")
+
+        def factory(key):
+            return chart.figure(entity_matrix.get(key, by=key_column), value_name, barmode=barmode)
+
+        timings = [_median_ms(plotly_express, keys),
+                   _median_ms(factory, keys),
+                   _median_ms(lambda key: pio.to_json(plotly_express(key), validate=False), keys),
+                   _median_ms(lambda key: pio.to_json(factory(key), validate=False), keys)]
+        print(f"{table_name:<20}{timings[0]:>10.2f}{timings[1]:>10.3f}{timings[2]:>10.2f}{timings[3]:>14.3f}"
+              f"{timings[2] / timings[3]:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
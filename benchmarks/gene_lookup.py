@@ -0,0 +1,58 @@
+"""Per-gene lookup latency of the figure callbacks: boolean-mask scan + melt against the gene index.
+
+Run from the repository root: `python -m benchmarks.gene_lookup`
+"""
+import random
+import statistics
+import time
+
+import pandas as pd
+
+from backend import matrix, registry
+
+# table -> (key column, default gene of the page)
+TABLES = {
+    'n_var_gene_tab': ('GeneSymbol', 'EYS'),
+    'absplice_ratio_tab': ('GeneSymbol', 'UROD'),
+    'fpkm_agg_tab': ('GeneSymbol', 'TSPAN6'),
+    'fusion_agg_tab': ('Gene_pair', 'ARHGAP26--NR3C1'),
+    'or_dn_agg_tab': ('GeneSymbol', 'PLP2'),
+}
+N_GENES = 200
+
+
+def _median_us(function, keys, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        for key in keys:
+            start = time.perf_counter()
+            function(key)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    random.seed(0)
+    print(f"{'table':<20}{'rows':>8}{'scan':>12}{'index':>12}{'scan+melt':>12}{'index+melt':>12}  (median µs)")
+    for table_name, (key_column, default) in TABLES.items():
+        df = registry.get(table_name)
+        entity_matrix = matrix.entity_matrix(table_name)
+        n_id_columns = len(entity_matrix.ids.columns)
+        id_columns = list(df.columns[:n_id_columns])
+        keys = [default] + random.sample(list(df[key_column]), min(N_GENES, len(df)))
+
+        def scan(key):
+            return df[df[key_column] == key]
+
+        def scan_melt(key):
+            return pd.melt(scan(key), id_vars=id_columns, var_name='Disease entity', value_name='value')
+
+        timings = [_median_us(scan, keys),
+                   _median_us(lambda key: entity_matrix.get(key, by=key_column), keys),
+                   _median_us(scan_melt, keys),
+                   _median_us(lambda key: entity_matrix.melt(key, 'value', by=key_column), keys)]
+        print(f"{table_name:<20}{len(df):>8}" + ''.join(f'{t:>12.1f}' for t in timings))
+
+
+if __name__ == '__main__':
+    main()
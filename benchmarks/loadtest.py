@@ -0,0 +1,429 @@
+"""Load test of the gunicorn deployment with concurrent simulated users, using the standard library only.
+
+Every virtual user replays sessions the way the Dash renderer does: it loads a page (the index HTML, the
+layout, the callback graph and the page callback), scrolls through its lazy sections, fires the initial
+callbacks of the components they contain, then, with a think time between actions, searches and selects
+genes in the gene dropdowns, switches the other dropdowns (e.g. the VEP consequences) and pages or sorts
+the DataTables, and now and then downloads the whole CSV export of a table. Callbacks chained on the
+outputs of others fire after them, e.g. the VEP chart after its consequence dropdown.
+
+For every configuration (number of workers × worker class) a gunicorn server is started with
+gunicorn.conf.py on a free local port, then loaded by each number of users for --duration seconds.
+The report gives the throughput, the p50/p95/p99/max latency and the error rate per endpoint (callbacks
+by output), and the number of worker timeouts logged by gunicorn. With --url, an already running server
+is loaded instead.
+
+Run from the repository root, e.g.
+`python -m benchmarks.loadtest --workers 3 --worker-class sync gthread --threads 4 --users 1 8 32`
+"""
+import argparse
+import gzip
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CALLBACK_PATH = '/_dash-update-component'
+SECTION_STORE = 'mll-section-visible'
+TIMEOUT = 180
+# relative frequency of the actions of a user once the page is loaded
+ACTIONS = {'gene': 6, 'option': 2, 'table': 2, 'export': 1}
+
+
+def _id_key(component_id):
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(',', ':'))
+    return component_id
+
+
+def _split_output(output):
+    # "id.prop" or "..id.prop...id.prop.." for several outputs
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    return [tuple(part.rsplit('.', 1)) for part in parts]
+
+
+def _matches(pattern, component_id):
+    # MATCH / ALL wildcards of pattern-matching ids, given as JSON strings
+    if not pattern.startswith('{') or not component_id.startswith('{'):
+        return pattern == component_id
+    pattern, component_id = json.loads(pattern), json.loads(component_id)
+    return pattern.keys() == component_id.keys() and all(
+        isinstance(value, list) or value == component_id[key] for key, value in pattern.items())
+
+
+def _concrete(pattern, component_id):
+    # the id of `pattern` with its wildcards replaced by the values of `component_id`
+    if not pattern.startswith('{'):
+        return pattern
+    component_id = json.loads(component_id)
+    return _id_key({key: component_id[key] if isinstance(value, list) else value
+                    for key, value in json.loads(pattern).items()})
+
+
+class Dependency:
+    """A server-side callback of the callback graph (`/_dash-dependencies`)."""
+
+    def __init__(self, spec):
+        self.output = spec['output']
+        self.outputs = _split_output(spec['output'])
+        self.inputs = [(i['id'], i['property']) for i in spec['inputs']]
+        self.state = [(s['id'], s['property']) for s in spec['state']]
+        self.prevent_initial_call = spec.get('prevent_initial_call', False)
+        self.pattern = any(component_id.startswith('{') for component_id, _ in self.inputs)
+
+
+class Stats:
+    """Latencies and errors per endpoint, shared by the users of a run."""
+
+    def __init__(self):
+        self.requests = {}
+        self.sessions = 0
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, seconds, ok):
+        with self._lock:
+            self.requests.setdefault(endpoint, []).append((seconds, ok))
+
+    def report(self, duration):
+        rows = {}
+        for endpoint, results in sorted(self.requests.items()):
+            latencies = sorted(seconds for seconds, _ in results)
+            errors = sum(not ok for _, ok in results)
+
+            def percentile(q):
+                return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3
+
+            rows[endpoint] = {'requests': len(results), 'throughput': len(results) / duration,
+                              'p50_ms': percentile(0.5), 'p95_ms': percentile(0.95),
+                              'p99_ms': percentile(0.99), 'max_ms': latencies[-1] * 1e3,
+                              'error_rate': errors / len(results)}
+        return rows
+
+
+class User(threading.Thread):
+    """A simulated browser session, looping over page loads and interactions until `deadline`."""
+
+    def __init__(self, base, page, dependencies, stats, deadline, think, interactions, seed):
+        super().__init__(daemon=True)
+        self.host = base.netloc
+        self.prefix = base.path.rstrip('/')
+        self.page = page
+        self.dependencies = dependencies
+        self.stats = stats
+        self.deadline = deadline
+        self.think = think
+        self.interactions = interactions
+        self.random = random.Random(seed)
+        self.props = {}
+
+    def request(self, method, path, endpoint, body=None):
+        headers = {'Accept-Encoding': 'gzip'}
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            # a new connection per request, the sync workers close them anyway
+            connection = http.client.HTTPConnection(self.host, timeout=TIMEOUT)
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+            connection.close()
+        except (OSError, http.client.HTTPException):
+            self.stats.add(endpoint, time.perf_counter() - start, False)
+            return None
+        ok = response.status < 400
+        self.stats.add(endpoint, time.perf_counter() - start, ok)
+        if not ok or response.status == 204:
+            return None
+        if response.getheader('Content-Encoding') == 'gzip':
+            data = gzip.decompress(data)
+        return data
+
+    def add_components(self, tree, new_ids):
+        if isinstance(tree, list):
+            for child in tree:
+                self.add_components(child, new_ids)
+        elif isinstance(tree, dict) and 'props' in tree and 'type' in tree:
+            props = tree['props']
+            if 'id' in props:
+                key = _id_key(props['id'])
+                self.props[key] = props
+                new_ids.add(key)
+            self.add_components(props.get('children'), new_ids)
+
+    def fire(self, dependency, match=None):
+        """Send the callback request of `dependency`, returns the changed (id, property) pairs."""
+        def concrete(component_id):
+            return _concrete(component_id, match) if match else component_id
+
+        def value(component_id, prop):
+            return self.props.get(concrete(component_id), {}).get(prop)
+
+        def wire_id(component_id):
+            component_id = concrete(component_id)
+            return json.loads(component_id) if component_id.startswith('{') else component_id
+
+        outputs = [{'id': wire_id(i), 'property': p} for i, p in dependency.outputs]
+        body = {'output': dependency.output,
+                'outputs': outputs if len(outputs) > 1 else outputs[0],
+                'inputs': [{'id': wire_id(i), 'property': p, 'value': value(i, p)} for i, p in dependency.inputs],
+                'state': [{'id': wire_id(i), 'property': p, 'value': value(i, p)} for i, p in dependency.state],
+                'changedPropIds': [f'{concrete(i)}.{p}' for i, p in dependency.inputs]}
+        data = self.request('POST', CALLBACK_PATH, f'callback {dependency.output}', body)
+        if data is None:
+            return set()
+        changed, new_ids = set(), set()
+        for component_id, props in json.loads(data).get('response', {}).items():
+            self.props.setdefault(component_id, {}).update(props)
+            for prop, prop_value in props.items():
+                changed.add((component_id, prop))
+                if prop == 'children':
+                    self.add_components(prop_value, new_ids)
+        return changed | self.initial(new_ids)
+
+    def initial(self, new_ids):
+        # inputs of the initial callbacks of the components just added to the page
+        return {(component_id, prop) for dependency in self.dependencies if not dependency.prevent_initial_call
+                for component_id, prop in dependency.inputs if component_id in new_ids}
+
+    def propagate(self, changed):
+        """Fire the callbacks of the changed (id, property) pairs, then those of their outputs."""
+        fired = set()
+        changed = set(changed)
+        while changed:
+            triggered = []
+            for dependency in self.dependencies:
+                for component_id, prop in changed:
+                    if any(p == prop and _matches(i, component_id) for i, p in dependency.inputs):
+                        match = component_id if dependency.pattern else None
+                        if (dependency.output, match) not in fired:
+                            triggered.append((dependency, match))
+                        break
+
+            def waits(dependency):
+                # for another triggered callback computing one of its inputs, like in the renderer
+                return any(other is not dependency and set(other.outputs) & set(dependency.inputs)
+                           for other, _ in triggered)
+
+            changed = set()
+            for dependency, match in [item for item in triggered if not waits(item[0])] or triggered:
+                fired.add((dependency.output, match))
+                changed |= self.fire(dependency, match)
+
+    def load_page(self):
+        self.props = {}
+        self.request('GET', self.page, f'GET {self.page}')
+        for path in ('/_dash-layout', '/_dash-dependencies'):
+            data = self.request('GET', path, f'GET {path}')
+            if data is None:
+                return False
+            if path == '/_dash-layout':
+                new_ids = set()
+                self.add_components(json.loads(data), new_ids)
+        self.props['_pages_location'] = {'pathname': self.page, 'search': ''}
+        self.propagate(self.initial(new_ids) | {('_pages_location', 'pathname')})
+        # scroll through the lazy sections
+        for component_id in [key for key in self.props if f'"type":"{SECTION_STORE}"' in key]:
+            self.props[component_id]['data'] = True
+            self.propagate({(component_id, 'data')})
+        return True
+
+    def _inputs(self, prop):
+        return {component_id for dependency in self.dependencies for component_id, p in dependency.inputs
+                if p == prop and component_id in self.props}
+
+    def act(self, action):
+        if action == 'gene':
+            # type two letters of a gene in a search-as-you-type dropdown, then pick a match
+            dropdowns = sorted(self._inputs('search_value'))
+            if not dropdowns:
+                return
+            component_id = self.random.choice(dropdowns)
+            options = self.props[component_id].get('options') or []
+            if options:
+                label = str(self.random.choice(options)['label'])
+                self.props[component_id]['search_value'] = label[:2]
+                self.propagate({(component_id, 'search_value')})
+                options = self.props[component_id].get('options') or options
+                self.props[component_id]['value'] = self.random.choice(options)['value']
+                # selecting an option clears the search
+                self.props[component_id]['search_value'] = ''
+                self.propagate({(component_id, 'value'), (component_id, 'search_value')})
+        elif action == 'option':
+            # the other dropdowns, e.g. the VEP consequence of the selected gene
+            dropdowns = sorted(self._inputs('value') - self._inputs('search_value'))
+            dropdowns = [component_id for component_id in dropdowns if self.props[component_id].get('options')]
+            if dropdowns:
+                component_id = self.random.choice(dropdowns)
+                option = self.random.choice(self.props[component_id]['options'])
+                self.props[component_id]['value'] = option['value'] if isinstance(option, dict) else option
+                self.propagate({(component_id, 'value')})
+        elif action == 'table':
+            tables = sorted(self._inputs('page_current'))
+            if tables:
+                component_id = self.random.choice(tables)
+                props = self.props[component_id]
+                if self.random.random() < 0.5 and props.get('columns'):
+                    column = self.random.choice(props['columns'])['id']
+                    props['sort_by'] = [{'column_id': column, 'direction': self.random.choice(['asc', 'desc'])}]
+                    self.propagate({(component_id, 'sort_by')})
+                else:
+                    props['page_current'] = self.random.randrange(max(1, props.get('page_count') or 1))
+                    self.propagate({(component_id, 'page_current')})
+        elif action == 'export':
+            links = sorted(props['href'] for props in self.props.values()
+                           if str(props.get('href', '')).startswith('/_mll/export/') and props['href'].endswith('.csv'))
+            if links:
+                self.request('GET', self.random.choice(links), 'export')
+
+    def pause(self):
+        if self.think:
+            time.sleep(min(self.random.expovariate(1 / self.think), max(0, self.deadline - time.monotonic())))
+
+    def run(self):
+        actions, weights = zip(*ACTIONS.items())
+        while time.monotonic() < self.deadline:
+            if not self.load_page():
+                self.pause()
+                continue
+            for _ in range(self.interactions):
+                if time.monotonic() >= self.deadline:
+                    return
+                self.pause()
+                self.act(self.random.choices(actions, weights)[0])
+            with self.stats._lock:
+                self.stats.sessions += 1
+
+
+def load(url, page, users, duration, think, interactions, seed=0):
+    """Load the server at `url` with `users` concurrent users for `duration` seconds."""
+    base = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(base.netloc, timeout=TIMEOUT)
+    connection.request('GET', base.path.rstrip('/') + '/_dash-dependencies')
+    dependencies = [Dependency(spec) for spec in json.loads(connection.getresponse().read())
+                    if not spec.get('clientside_function')]
+    connection.close()
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    threads = [User(base, page, dependencies, stats, deadline, think, interactions, seed + i) for i in range(users)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.monotonic() - start
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """gunicorn serving the app with gunicorn.conf.py and the given number of workers and worker class."""
+
+    def __init__(self, workers, worker_class, threads):
+        self.port = _free_port()
+        self.log = tempfile.NamedTemporaryFile('w+', prefix='mll-loadtest-', suffix='.log', delete=False)
+        env = {**os.environ, 'MLL_BIND': f'127.0.0.1:{self.port}', 'MLL_WORKERS': str(workers)}
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-k', worker_class]
+        if worker_class == 'gthread':
+            command += ['--threads', str(threads)]
+        self.process = subprocess.Popen(command + ['wsgi'], cwd=ROOT, env=env, stdout=self.log,
+                                        stderr=subprocess.STDOUT)
+        self.url = f'http://127.0.0.1:{self.port}'
+
+    def wait(self, timeout=300):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited, see {self.log.name}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+                connection.request('GET', '/_dash-layout')
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                time.sleep(0.5)
+        raise RuntimeError(f'gunicorn did not answer within {timeout} s, see {self.log.name}')
+
+    def timeouts(self):
+        with open(self.log.name) as f:
+            return len(re.findall(r'WORKER TIMEOUT', f.read()))
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def _print(title, stats, duration, timeouts):
+    rows = stats.report(duration)
+    total = sum(row['requests'] for row in rows.values())
+    errors = sum(row['error_rate'] * row['requests'] for row in rows.values())
+    print(f'\n{title}: {stats.sessions} sessions, {total / duration:.1f} requests/s, '
+          f'{errors / max(total, 1):.2%} errors, {timeouts} worker timeouts')
+    print(f"{'endpoint':<62}{'n':>6}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'errors':>8}")
+    for endpoint, row in sorted(rows.items(), key=lambda item: -item[1]['p95_ms']):
+        print(f"{endpoint[:61]:<62}{row['requests']:>6}{row['throughput']:>8.2f}{row['p50_ms']:>9.0f}"
+              f"{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}{row['max_ms']:>9.0f}{row['error_rate']:>8.1%}")
+    return {'sessions': stats.sessions, 'duration_seconds': duration, 'throughput': total / duration,
+            'error_rate': errors / max(total, 1), 'worker_timeouts': timeouts, 'endpoints': rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help='load this running server instead of starting gunicorn')
+    parser.add_argument('--page', default='/genomics', help='page of the sessions')
+    parser.add_argument('--workers', type=int, nargs='+', default=[3])
+    parser.add_argument('--worker-class', nargs='+', default=['sync'])
+    parser.add_argument('--threads', type=int, default=4, help='threads per gthread worker')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 4, 16], help='concurrent users of each run')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of each run')
+    parser.add_argument('--think', type=float, default=1.0, help='mean think time between actions, in seconds')
+    parser.add_argument('--interactions', type=int, default=10, help='actions of a session after the page load')
+    parser.add_argument('--output', help='JSON file of the results')
+    args = parser.parse_args()
+
+    results = []
+    configurations = [(None, None)] if args.url else itertools.product(args.workers, args.worker_class)
+    for workers, worker_class in configurations:
+        server = None
+        if not args.url:
+            print(f'starting gunicorn: {workers} {worker_class} workers...', file=sys.stderr)
+            server = Server(workers, worker_class, args.threads)
+        try:
+            if server:
+                server.wait()
+            url = args.url or server.url
+            for users in args.users:
+                timeouts = server.timeouts() if server else 0
+                stats, duration = load(url, args.page, users, args.duration, args.think, args.interactions)
+                timeouts = (server.timeouts() - timeouts) if server else 0
+                title = f'{users} users' if args.url else f'{workers} × {worker_class} workers, {users} users'
+                results.append({'workers': workers, 'worker_class': worker_class, 'users': users,
+                                **_print(title, stats, duration, timeouts)})
+        finally:
+            if server:
+                server.stop()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'arguments': vars(args), 'runs': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Overhead of the callback metrics (`backend.metrics`) on the callback requests.
+
+Replays the same callback requests through the Flask test client with the instrumentation turned on
+and off, alternating batches to even out noise, then times the instrumentation hooks alone and a
+scrape of /metrics. The figure callback is
+answered from the figure cache after the first request, so its latency is mostly Dash and Flask.
+
+Run from the repository root: `python -m benchmarks.metrics_overhead`
+"""
+import statistics
+import time
+
+from flask import Response
+
+from backend import metrics
+from mll_app import server
+
+REQUESTS = {
+    'figure (cached)': {
+        'output': 'n_var_gene_histogram.figure',
+        'outputs': {'id': 'n_var_gene_histogram', 'property': 'figure'},
+        'inputs': [{'id': 'drop_down_n_var_gene', 'property': 'value', 'value': 'EYS'}],
+        'changedPropIds': ['drop_down_n_var_gene.value'],
+    },
+    'gene search': {
+        'output': 'or_dn_dropdown.options',
+        'outputs': {'id': 'or_dn_dropdown', 'property': 'options'},
+        'inputs': [{'id': 'or_dn_dropdown', 'property': 'search_value', 'value': 'PL'}],
+        'state': [{'id': 'or_dn_dropdown', 'property': 'value', 'value': 'PLP2'}],
+        'changedPropIds': ['or_dn_dropdown.search_value'],
+    },
+}
+BATCHES = 20
+BATCH_SIZE = 50
+
+
+def _batch_us(client, body):
+    start = time.perf_counter()
+    for _ in range(BATCH_SIZE):
+        client.post('/_dash-update-component', json=body)
+    return (time.perf_counter() - start) / BATCH_SIZE * 1e6
+
+
+def main():
+    client = server.test_client()
+    print(f"{'callback':<18}{'off':>10}{'on':>10}{'overhead':>10}  (median µs per request)")
+    for name, body in REQUESTS.items():
+        body = {'state': [], **body}
+        client.post('/_dash-update-component', json=body)
+        timings = {False: [], True: []}
+        for _ in range(BATCHES):
+            for enabled in (False, True):
+                metrics.ENABLED = enabled
+                timings[enabled].append(_batch_us(client, body))
+        off, on = statistics.median(timings[False]), statistics.median(timings[True])
+        print(f"{name:<18}{off:>10.1f}{on:>10.1f}{on - off:>10.1f}")
+    metrics.ENABLED = True
+
+    # the hooks alone, without the rest of the request
+    body = {'state': [], **REQUESTS['figure (cached)']}
+    response = Response(b'{}', mimetype='application/json')
+    with server.test_request_context('/_dash-update-component', method='POST', json=body):
+        start = time.perf_counter()
+        for _ in range(10000):
+            metrics._before_request()
+            metrics._after_request(response)
+            metrics._teardown_request(None)
+        print(f"instrumentation hooks: {(time.perf_counter() - start) / 10000 * 1e6:.1f} µs per request")
+
+    start = time.perf_counter()
+    response = client.get('/metrics')
+    print(f"/metrics scrape: {(time.perf_counter() - start) * 1e3:.2f} ms, {len(response.data)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Latency of the "genes with similar profiles" queries: pandas `corrwith` against the SimilarityIndex.
+
+Run from the repository root: `python -m benchmarks.similarity`
+"""
+import random
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend import matrix, similarity
+
+# table -> default gene of the page
+TABLES = {
+    'fpkm_agg_tab': 'TSPAN6',
+    'or_dn_agg_tab': 'PLP2',
+    'fraser_agg_tab': 'UBC',
+    'absplice_ratio_tab': 'UROD',
+}
+N_GENES = 10
+
+
+def _median_ms(function, keys):
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        function(key)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e3
+
+
+def main():
+    random.seed(0)
+    print(f"{'table':<20}{'genes':>8}{'corrwith':>12}{'build':>12}{'index':>12}{'same top':>10}  (median ms)")
+    for table_name, default in TABLES.items():
+        entity_matrix = matrix.entity_matrix(table_name)
+        columns = [e for e in entity_matrix.entities if e not in similarity.EXCLUDED_ENTITIES]
+        profiles = pd.DataFrame(entity_matrix.values, columns=entity_matrix.entities)[columns]
+        profiles.index = entity_matrix.ids['GeneSymbol']
+        profiles = profiles[~profiles.index.duplicated()]
+        # constant profiles have no correlation
+        keys = [default] + random.sample(list(profiles.index[profiles.std(axis=1) > 0]), N_GENES)
+
+        def corrwith(key):
+            return profiles.T.corrwith(profiles.loc[key]).drop(key).nlargest(similarity.DEFAULT_K)
+
+        start = time.perf_counter()
+        index = similarity.SimilarityIndex(entity_matrix)
+        build = (time.perf_counter() - start) * 1e3
+
+        # the similarities of the ten nearest genes agree with pandas
+        same = all(np.allclose(corrwith(key).to_numpy(), [r['Similarity'] for r in index.records(key)], atol=1e-3)
+                   for key in keys[:3])
+        timings = [_median_ms(corrwith, keys), build, _median_ms(index.records, keys)]
+        print(f"{table_name:<20}{len(profiles):>8}" + ''.join(f'{t:>12.2f}' for t in timings) + f'{str(same):>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+"""Benchmark suite of the website: startup, layouts and every server-side callback, saved as JSON.
+
+- startup: import time, wall time and peak memory of `import mll_app` in fresh interpreters, after a
+  first run that fills the binary data cache.
+- layouts: serialization time and size of the app shell, of the layout of every registered page and of
+  every lazy section.
+- callbacks: latency and Python peak memory (tracemalloc) of every callback registered on the server,
+  replayed through the Flask test client. The inputs are derived from the layouts: the default gene of
+  every gene dropdown, a random sample of genes and the worst-case genes (most non-zero entity values, or
+  most rows), every option of the other dropdowns, a few searches for the search-as-you-type dropdowns, the
+  first and last page, a sort and a filter for the DataTables, zooms of the heatmap explorer down to every
+  level of its tiles and a pan, every lazy section and every page. Inputs and states filled in by another
+  callback, like the consequence of the VEP chart, are resolved by calling that callback, the others are
+  taken from the layouts. The figure cache is cleared before every request, so figures are built every time.
+
+The results are written to benchmarks/results/ (or --output). With --compare, the metrics are compared
+with an earlier result and the command fails when a timing, size or memory metric grew by more than
+--tolerance. It also fails when every request of a callback failed. Timings are noisy: compare runs made
+on the same machine.
+
+Run from the repository root: `python -m benchmarks.suite [--compare benchmarks/results/<earlier>.json]`
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+# figures are served from the in-memory figure cache only, which is cleared before every request
+os.environ.pop('MLL_FIGURE_CACHE_DIR', None)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+STARTUP_SCRIPT = '''
+import json, resource, time
+start = time.perf_counter()
+import mll_app
+print(json.dumps({'import_seconds': time.perf_counter() - start,
+                  'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}))
+'''
+SEARCHES = ('', 'A', 'TP', 'KMT2')
+N_WORST = 3
+# differences below these floors are never reported as regressions
+FLOORS = {'_ms': 1.0, '_seconds': 0.05, '_bytes': 4096}
+
+
+def _median(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_startup(runs):
+    def run():
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout
+        return {'wall_seconds': time.perf_counter() - start, **json.loads(output.splitlines()[-1])}
+
+    first = run()
+    results = [run() for _ in range(runs)]
+    return {'first_run': first,
+            **{key: statistics.median(result[key] for result in results) for key in first}}
+
+
+def _components(tree):
+    from dash.development.base_component import Component
+
+    if isinstance(tree, (list, tuple)):
+        for child in tree:
+            yield from _components(child)
+    elif isinstance(tree, Component):
+        yield tree
+        yield from _components(getattr(tree, 'children', None))
+
+
+def bench_layouts(app, client, repeat):
+    import dash
+    from dash._utils import to_json
+
+    from backend import sections
+
+    results = {}
+    elapsed, response = _median(lambda: client.get('/_dash-layout'), repeat)
+    results['app'] = {'time_ms': elapsed * 1e3, 'size_bytes': len(response.data)}
+    for page in dash.page_registry.values():
+        layout = page['layout']
+        elapsed, data = _median(lambda: to_json(layout() if callable(layout) else layout), repeat)
+        results[f'page {page["path"]}'] = {'time_ms': elapsed * 1e3, 'size_bytes': len(data)}
+    for section_id, children in sections._sections.items():
+        elapsed, data = _median(lambda: to_json(children), repeat)
+        results[f'section {section_id}'] = {'time_ms': elapsed * 1e3, 'size_bytes': len(data)}
+    return results
+
+
+class Scenarios:
+    """Inputs of the callbacks, derived from the layouts of the pages and the registered components."""
+
+    def __init__(self, app, client, n_genes):
+        import dash
+
+        from backend import dropdowns, sections, tables
+
+        self.app = app
+        self.client = client
+        self.n_genes = n_genes
+        self.dropdowns = dict(dropdowns._registered)
+        self.tables = dict(tables._registered)
+        self.sections = list(sections._sections)
+        self.paths = [page['path'] for page in dash.page_registry.values()]
+        trees = [app.layout] + [page['layout']() if callable(page['layout']) else page['layout']
+                                for page in dash.page_registry.values()] + list(sections._sections.values())
+        self.components = {component.id: component for component in _components(trees)
+                           if isinstance(getattr(component, 'id', None), str)}
+        self._genes = {}
+
+    def genes(self, dropdown_id):
+        """(kind, gene) pairs of a gene dropdown: its default, a random sample and the worst cases."""
+        if dropdown_id not in self._genes:
+            from backend import matrix, registry
+
+            table_name, column = self.dropdowns[dropdown_id]
+            df = registry.get(table_name)
+            default = getattr(self.components.get(dropdown_id), 'value', None)
+            keys = df[column].dropna()
+            if table_name in matrix.TABLES:
+                # cells with a value in the chart of each gene
+                values = matrix.entity_matrix(table_name).values
+                worst = pd.Series((values != 0).sum(axis=1), index=df[column]).groupby(level=0).sum()
+            else:
+                worst = keys.value_counts()
+            worst = list(worst.sort_values(ascending=False, kind='stable').index[:N_WORST])
+            unique = sorted(keys.unique())
+            sample = random.Random(0).sample(unique, min(self.n_genes, len(unique)))
+            self._genes[dropdown_id] = ([('default', default)] if default is not None else []) + \
+                [('random', gene) for gene in sample] + [('worst', gene) for gene in worst]
+        return self._genes[dropdown_id]
+
+    def _body(self, key, entry, values, match=None, changed=None):
+        def ids(component_id):
+            # pattern-matching ids are strings in the callback map and wildcard dicts in the outputs
+            if isinstance(component_id, str) and component_id.startswith('{'):
+                component_id = json.loads(component_id)
+            if isinstance(component_id, dict):
+                component_id = {**component_id, 'index': match}
+            return component_id
+
+        def prop_id(component_id):
+            if isinstance(component_id, dict):
+                component_id = json.dumps(component_id, sort_keys=True, separators=(',', ':'))
+            return component_id
+
+        outputs = [{'id': ids(o.component_id), 'property': o.component_property}
+                   for o in (entry['output'] if isinstance(entry['output'], list) else [entry['output']])]
+        inputs = [{'id': ids(i['id']), 'property': i['property'], 'value': value}
+                  for i, value in zip(entry['inputs'], values)]
+        state = [{'id': ids(s['id']), 'property': s['property'], 'value': value}
+                 for s, value in zip(entry['state'], values[len(inputs):])]
+        # every input by default, or only the (id, property) pairs in `changed`, which decide ctx.triggered_id
+        return {'output': key, 'outputs': outputs if isinstance(entry['output'], list) else outputs[0],
+                'inputs': inputs, 'state': state,
+                'changedPropIds': [f'{prop_id(i["id"])}.{i["property"]}' for i, e in zip(inputs, entry['inputs'])
+                                   if changed is None or (e['id'], e['property']) in changed]}
+
+    def _resolve(self, component_id, prop, known):
+        # value set by another callback from the inputs already known, as in the browser
+        for key, entry in self.app.callback_map.items():
+            outputs = entry['output'] if isinstance(entry['output'], list) else [entry['output']]
+            if 'callback' not in entry or (component_id, prop) not in [
+                    (o.component_id, o.component_property) for o in outputs]:
+                continue
+            if all((i['id'], i['property']) in known for i in entry['inputs']) and not entry['state']:
+                body = self._body(key, entry, [known[(i['id'], i['property'])] for i in entry['inputs']])
+                response = self.client.post('/_dash-update-component', json=body).get_json()
+                return response['response'][component_id][prop]
+        return getattr(self.components.get(component_id), prop, None)
+
+    def _values(self, entry, known):
+        # the inputs then the state of a callback, from `known` or as set by the layouts and the other callbacks
+        props = [(i['id'], i['property']) for i in entry['inputs'] + entry['state']]
+        return [known[p] if p in known else self._resolve(*p, known) for p in props]
+
+    def requests(self, key, entry):
+        """(kind, label, body) of the requests replayed for the callback `key`."""
+        inputs = [(i['id'], i['property']) for i in entry['inputs']]
+        ids = {component_id for component_id, _ in inputs}
+        if inputs and all('"type":"mll-section-visible"' in component_id for component_id in ids):
+            return [('section', section_id, self._body(key, entry, [True], match=section_id))
+                    for section_id in self.sections]
+        if inputs == [('_pages_location', 'pathname'), ('_pages_location', 'search')]:
+            return [('page', path, self._body(key, entry, [path, ''])) for path in self.paths]
+        if len(ids) == 1 and next(iter(ids)) in self.tables:
+            return self._table_requests(key, entry, next(iter(ids)))
+        if ('heatmap_graph', 'relayoutData') in inputs:
+            return self._heatmap_requests(key, entry)
+        if inputs[0][1] == 'search_value' and inputs[0][0] in self.dropdowns:
+            default = getattr(self.components.get(inputs[0][0]), 'value', None)
+            return [('search', repr(search), self._body(key, entry, self._values(
+                entry, {inputs[0]: search, (inputs[0][0], 'value'): default}))) for search in SEARCHES]
+
+        gene_inputs = [component_id for component_id, prop in inputs
+                       if prop == 'value' and component_id in self.dropdowns]
+        if gene_inputs:
+            requests = []
+            for kind, gene in self.genes(gene_inputs[0]):
+                known = {(component_id, 'value'): gene for component_id in gene_inputs}
+                requests.append((kind, str(gene), self._body(key, entry, self._values(entry, known))))
+            return requests
+        if len(inputs) == 1 and inputs[0][1] == 'value':
+            component = self.components.get(inputs[0][0])
+            options = getattr(component, 'options', None) or []
+            values = [option['value'] if isinstance(option, dict) else option for option in options]
+            if values:
+                return [('option', str(value), self._body(key, entry, self._values(entry, {inputs[0]: value})))
+                        for value in values]
+        return [('default', 'layout', self._body(key, entry, self._values(entry, {})))]
+
+    def _table_requests(self, key, entry, table_id):
+        from backend import registry
+
+        df = registry.get(self.tables[table_id])
+        page_size = getattr(self.components.get(table_id), 'page_size', None) or 10
+        # the text columns are categoricals or strings, and the counts unsigned, with the compact dtypes
+        text = next((column for column in df.columns if pd.api.types.is_string_dtype(df[column].dtype)
+                     or isinstance(df[column].dtype, pd.CategoricalDtype)), df.columns[0])
+        number = next((column for column in reversed(df.columns) if df[column].dtype.kind in 'iuf'),
+                      df.columns[-1])
+        sort = [{'column_id': number, 'direction': 'desc'}]
+        query = f'{{{text}}} contains "A"'
+        return [('table', 'first page', self._body(key, entry, [0, page_size, [], ''])),
+                ('table', 'last page', self._body(key, entry, [(len(df) - 1) // page_size, page_size, [], ''])),
+                ('table', 'sort', self._body(key, entry, [0, page_size, sort, ''])),
+                ('table', 'filter+sort', self._body(key, entry, [0, page_size, sort, query]))]
+
+    def _heatmap_requests(self, key, entry):
+        from backend import tiles
+
+        order = getattr(self.components.get('heatmap_order'), 'value', None)
+        graph = ('heatmap_graph', 'relayoutData')
+        requests = []
+        for table_name in tiles.TABLES:
+            pyramid = tiles.pyramid(table_name, order)
+            n_genes = len(pyramid.genes)
+
+            def zoom(size, shift=0):
+                # relayoutData of a zoom on `size` genes around the middle, on the reversed y axis
+                start = max(0, min(n_genes - size, (n_genes - size) // 2 + shift))
+                return {'yaxis.range[0]': start + size - 0.5, 'yaxis.range[1]': start - 0.5}
+
+            def view(relayout=None):
+                return list(tiles.view(table_name, order, relayout and
+                                       [relayout['yaxis.range[0]'], relayout['yaxis.range[1]']]))
+
+            def body(relayout, current_view, changed=graph, aggregate='max'):
+                known = {('heatmap_table', 'value'): table_name, ('heatmap_order', 'value'): order,
+                         ('heatmap_aggregate', 'value'): aggregate, graph: relayout,
+                         ('heatmap_view', 'data'): current_view}
+                return self._body(key, entry, self._values(entry, known), changed={changed})
+
+            zoomed = view(zoom(tiles.MAX_ROWS))
+            requests.append(('option', f'{table_name} table', body(None, view(), ('heatmap_table', 'value'))))
+            requests.append(('zoom', f'{table_name} reset', body({'yaxis.autorange': True}, zoomed)))
+            # the widest zoom drawn from every level below the whole table
+            for level in range(len(pyramid.levels) - 1):
+                size = min(n_genes, tiles.MAX_ROWS * tiles.BLOCK_FACTOR ** level)
+                requests.append(('zoom', f'{table_name} level {level}', body(zoom(size), view())))
+            # to tiles that are not in the graph yet
+            pan = zoom(tiles.MAX_ROWS, shift=4 * tiles.MAX_ROWS)
+            requests.append(('zoom', f'{table_name} pan', body(pan, zoomed)))
+            requests.append(('option', f'{table_name} mean',
+                             body(pan, view(pan), ('heatmap_aggregate', 'value'), aggregate='mean')))
+        return requests
+
+
+def bench_callbacks(app, client, n_genes, repeat, only=None):
+    from backend import figure_cache
+
+    scenarios = Scenarios(app, client, n_genes)
+    results, skipped = {}, []
+    for key, entry in list(app.callback_map.items()):
+        if 'callback' not in entry:
+            continue
+        if only and only not in key:
+            continue
+        requests = scenarios.requests(key, entry)
+        timings, sizes, errors, by_kind = [], [], 0, {}
+        for kind, label, body in requests:
+            def post():
+                figure_cache.cache.clear()
+                return client.post('/_dash-update-component', json=body)
+
+            elapsed, response = _median(post, repeat)
+            if response.status_code not in (200, 204):
+                errors += 1
+                continue
+            timings.append(elapsed)
+            sizes.append(len(response.data))
+            by_kind.setdefault(kind, []).append((elapsed, label))
+        if not timings:
+            skipped.append(key)
+            continue
+        result = {'requests': len(requests), 'errors': errors,
+                  'median_ms': statistics.median(timings) * 1e3,
+                  'p95_ms': sorted(timings)[max(0, round(0.95 * len(timings)) - 1)] * 1e3,
+                  'max_ms': max(timings) * 1e3, 'max_response_bytes': max(sizes)}
+        if 'worst' in by_kind:
+            result['worst_median_ms'] = statistics.median(t for t, _ in by_kind['worst']) * 1e3
+        slowest = max((item for items in by_kind.values() for item in items), key=lambda item: item[0])
+        result['slowest_input'] = slowest[1]
+        results[key] = (result, requests)
+
+    # peak memory in a second pass, tracemalloc slows everything down
+    tracemalloc.start()
+    for key, (result, requests) in results.items():
+        peaks = []
+        for _, _, body in requests:
+            figure_cache.cache.clear()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            client.post('/_dash-update-component', json=body)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        result['peak_memory_bytes'] = max(peaks)
+    tracemalloc.stop()
+    return {key: result for key, (result, _) in results.items()}, skipped
+
+
+def _leaves(results, prefix=()):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from _leaves(value, prefix + (key,))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield prefix + (key,), value
+
+
+def compare(old, new, tolerance):
+    """Metrics of `new` that grew by more than `tolerance` (and their floor) since `old`."""
+    previous = dict(_leaves({section: old.get(section, {}) for section in ('startup', 'layouts', 'callbacks')}))
+    regressions = []
+    for path, value in _leaves({section: new.get(section, {}) for section in ('startup', 'layouts', 'callbacks')}):
+        if 'first_run' in path or path not in previous:
+            continue
+        floor = next((floor for suffix, floor in FLOORS.items() if path[-1].endswith(suffix)), None)
+        if floor is None:
+            continue
+        before = previous[path]
+        if value > before * (1 + tolerance) and value - before > floor:
+            regressions.append((' / '.join(path), before, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', help='JSON file of the results (default: benchmarks/results/<time>-<revision>.json)')
+    parser.add_argument('--compare', help='earlier JSON result to flag regressions against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative growth flagged as regression')
+    parser.add_argument('--genes', type=int, default=10, help='random genes per gene dropdown')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions of every measurement (median)')
+    parser.add_argument('--startup-runs', type=int, default=3)
+    parser.add_argument('--only', help='only the callbacks whose output contains this text')
+    args = parser.parse_args()
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    results = {'meta': {'started': started.isoformat(timespec='seconds'), 'revision': _git_revision(),
+                        'python': platform.python_version(), 'platform': platform.platform(),
+                        'environment': {k: v for k, v in sorted(os.environ.items()) if k.startswith('MLL_')},
+                        'arguments': vars(args)}}
+    if args.startup_runs:
+        print('startup...', file=sys.stderr)
+        results['startup'] = bench_startup(args.startup_runs)
+
+    # imported after the startup runs, which must not share anything with this process
+    import dash
+    import numpy
+    import plotly
+
+    from backend import registry
+    from mll_app import app
+
+    results['meta']['versions'] = {module.__name__: module.__version__ for module in (dash, numpy, pd, plotly)}
+    results['meta']['data_version'] = registry.data_version()
+    client = app.server.test_client()
+    client.get('/_dash-dependencies')
+
+    print('layouts...', file=sys.stderr)
+    results['layouts'] = bench_layouts(app, client, args.repeat)
+    print('callbacks...', file=sys.stderr)
+    results['callbacks'], results['skipped_callbacks'] = bench_callbacks(app, client, args.genes, args.repeat,
+                                                                         args.only)
+
+    if 'startup' in results:
+        startup = results['startup']
+        print(f"startup: import {startup['import_seconds']:.2f} s, wall {startup['wall_seconds']:.2f} s, "
+              f"max rss {startup['max_rss_bytes'] >> 20} MB")
+    print(f"\n{'layout':<44}{'ms':>10}{'kB':>10}")
+    for name, result in results['layouts'].items():
+        print(f"{name:<44}{result['time_ms']:>10.2f}{result['size_bytes'] / 1024:>10.1f}")
+    print(f"\n{'callback':<60}{'n':>5}{'median':>9}{'p95':>9}{'max':>9}{'peak MB':>9}  slowest input")
+    for name, result in sorted(results['callbacks'].items(), key=lambda item: -item[1]['max_ms']):
+        print(f"{name[:59]:<60}{result['requests']:>5}{result['median_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+              f"{result['max_ms']:>9.1f}{result['peak_memory_bytes'] / 2 ** 20:>9.2f}  {result['slowest_input']}")
+    for name, result in results['callbacks'].items():
+        if result['errors']:
+            print(f"{result['errors']} of {result['requests']} requests failed: {name}")
+    for name in results['skipped_callbacks']:
+        print(f"FAILED (every request failed): {name}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{started.strftime('%Y%m%dT%H%M%S')}-{results['meta']['revision'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=1, default=str)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for path, before, after in regressions:
+            print(f"REGRESSION {path}: {before:.4g} -> {after:.4g}")
+        print(f"{len(regressions)} regression(s) against {args.compare}")
+        if regressions:
+            sys.exit(1)
+    # a callback answering nothing but errors has no timings to compare
+    if results['skipped_callbacks']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Concurrency check of the callbacks, as run by the threads of gthread workers.
+
+Replays the callback requests of `benchmarks.suite` once sequentially to record the expected responses,
+then replays them shuffled from many threads of one process at once, with a very short GIL switch
+interval to interleave the threads as much as possible, and the figure cache cleared at random so that
+the same figures are built and cached by several threads at once. Every response must equal the
+sequential one, and every sequential response must be a 200: a request failing every time would
+otherwise pass as consistent. Also reports the throughput of the sequential and threaded replays.
+
+Run from the repository root: `python -m benchmarks.thread_safety [--threads 8] [--rounds 1]`
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from backend import figure_cache
+from benchmarks.suite import Scenarios
+from mll_app import app
+
+CALLBACK_PATH = '/_dash-update-component'
+
+
+def _replay(requests, expected, mismatches, clear):
+    client = app.server.test_client()
+    for key, label, body in requests:
+        if clear and random.random() < clear:
+            figure_cache.cache.clear()
+        response = client.post(CALLBACK_PATH, json=body)
+        if (response.status_code, response.data) != expected[key, label]:
+            mismatches.append((key, label, response.status_code))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=1, help='replays of every request per thread')
+    parser.add_argument('--genes', type=int, default=5, help='random genes per gene dropdown')
+    parser.add_argument('--clear', type=float, default=0.2, help='chance to clear the figure cache per request')
+    args = parser.parse_args()
+
+    client = app.server.test_client()
+    client.get('/_dash-dependencies')
+    scenarios = Scenarios(app, client, args.genes)
+    requests = [(key, label, body) for key, entry in app.callback_map.items() if 'callback' in entry
+                for _, label, body in scenarios.requests(key, entry)]
+
+    expected = {}
+    start = time.perf_counter()
+    for key, label, body in requests:
+        figure_cache.cache.clear()
+        response = client.post(CALLBACK_PATH, json=body)
+        expected[key, label] = (response.status_code, response.data)
+    sequential = len(requests) / (time.perf_counter() - start)
+    failed = [(key, label, status) for (key, label), (status, _) in expected.items() if status != 200]
+    for key, label, status in failed[:20]:
+        print(f"FAILED {key} [{label}]: status {status}")
+    if failed:
+        print(f"{len(failed)} of {len(requests)} requests failed sequentially, not replayed")
+        sys.exit(1)
+
+    sys.setswitchinterval(1e-5)
+    mismatches = []
+    threads = []
+    for i in range(args.threads):
+        shuffled = requests * args.rounds
+        random.Random(i).shuffle(shuffled)
+        threads.append(threading.Thread(target=_replay, args=(shuffled, expected, mismatches, args.clear)))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    sys.setswitchinterval(0.005)
+
+    total = len(requests) * args.rounds * args.threads
+    print(f"{len(requests)} requests of {len({key for key, _, _ in requests})} callbacks, "
+          f"sequential: {sequential:.0f} requests/s")
+    print(f"{args.threads} threads: {total} requests, {total / elapsed:.0f} requests/s, {len(mismatches)} mismatches")
+    for key, label, status in sorted(set(mismatches))[:20]:
+        print(f"MISMATCH {key} [{label}]: status {status}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Gunicorn configuration of the website, used by the docker image (`gunicorn -c gunicorn.conf.py wsgi`).
+
+With preloading (the default, disable with MLL_PRELOAD=0) the master imports the app and loads every
+table before forking, so workers share the data pages copy-on-write with the master and a worker
+recycled by max_requests starts without parsing anything.
+
+MLL_WORKER_CLASS=gthread runs MLL_THREADS request threads in every worker, which then keeps the
+connections of the browsers alive for MLL_KEEPALIVE seconds. Everything a callback reads (tables,
+matrices, indexes, the caches) is shared between the threads, either immutable or behind a lock; see
+benchmarks/thread_safety.py. The callbacks hold the GIL most of the time, so threads mostly help when
+responses are slow to send or requests wait on I/O, not with CPU-bound traffic.
+"""
+import gc
+import os
+import time
+
+from backend import procstats
+
+bind = os.environ.get('MLL_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('MLL_WORKERS', 3))
+max_requests = int(os.environ.get('MLL_MAX_REQUESTS', 20))
+timeout = int(os.environ.get('MLL_TIMEOUT', 120))
+worker_class = os.environ.get('MLL_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('MLL_THREADS', 4 if worker_class == 'gthread' else 1))
+keepalive = int(os.environ.get('MLL_KEEPALIVE', 5))
+preload_app = os.environ.get('MLL_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything loaded so far into the permanent generation: the cyclic garbage collector of
+        # the workers then never writes to the gc headers of the shared objects, which would otherwise
+        # turn the shared pages into private copies one by one.
+        gc.freeze()
+    server.log.info("Master ready: rss=%(rss)d MB", {'rss': procstats.memory_usage().get('rss', 0) >> 20})
+
+
+def pre_fork(server, worker):
+    # inherited by the child, read back once the worker finished loading the app
+    worker.spawn_started = time.monotonic()
+
+
+def post_worker_init(worker):
+    usage = procstats.memory_usage()
+    worker.log.info("Worker %s spawned in %.3f s: rss=%d MB pss=%d MB private=%d MB",
+                    worker.pid, time.monotonic() - worker.spawn_started, usage.get('rss', 0) >> 20,
+                    usage.get('pss', 0) >> 20, (usage.get('private_clean', 0) + usage.get('private_dirty', 0)) >> 20)
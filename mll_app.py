@@ -1,23 +1,15 @@
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output, State
-from dash import dash_table
+from dash import html
+from dash.dependencies import Input, Output
 import plotly.express as px
-import pandas as pd
 import dash_bootstrap_components as dbc
 import numpy as np
 import plotly.io as pio
 import dash_loading_spinners as dls
 
-sample_summary_tab = pd.read_csv("./data/agg_table/sample_summary_tab.csv", sep=',')
+from backend import clientside, export, figure_cache, http_cache, initial, metrics, outliers, profiling, registry
 
-manuscript_wording = pd.read_csv("./data/leukemie_driver_manuscript_wording-sample_annotation.tsv", sep="\t")
-manuscript_wording = manuscript_wording.drop(
-    ["Cohort during analysis", "Cohort German abbreviation", "Study group during analysis"], axis=1)
-
-manuscript_wording = manuscript_wording.rename(columns={"Cohort": "Disease entity",
-                                                        "Cohort abbreviation": "Abbreviation",
-                                                        "Number of sampples per cohort": "Number of samples per disease entity", })
+sample_summary_tab = registry.get('sample_summary_tab')
 
 external_stylesheets = [dbc.themes.BOOTSTRAP]
 
@@ -27,6 +19,12 @@ app = dash.Dash(__name__, external_stylesheets=external_stylesheets, suppress_ca
 app.title = "MLL5kdata"
 
 app.scripts.config.serve_locally = True
+clientside.init_app(app.server)
+export.init_app(app.server)
+outliers.init_app(app.server)
+http_cache.init_app(app.server)
+metrics.init_app(app.server)
+profiling.init_app(app.server)
 # Define the layout of the app
 app.layout = dbc.Container([
 
@@ -35,6 +33,9 @@ app.layout = dbc.Container([
                          dbc.NavItem(dbc.NavLink("Driver predictor", href="/prediction")),
                          dbc.NavItem(dbc.NavLink("Transcriptomics", href="/transcriptomics", )),
                          dbc.NavItem(dbc.NavLink("Genomics", href="/genomics")),
+                         dbc.NavItem(dbc.NavLink("Gene profile", href="/profile")),
+                         dbc.NavItem(dbc.NavLink("Entity enrichment", href="/enrichment")),
+                         dbc.NavItem(dbc.NavLink("Heatmap explorer", href="/heatmap")),
                          dbc.NavItem(dbc.NavLink("Sample info", href="/", )),
                      ],
                      sticky="top",
@@ -73,10 +74,12 @@ app.layout = dbc.Container([
 ], )
 
 
-@app.callback(
+@initial.callback(
     Output('sample_summary_histogram', 'figure'),
-    [Input('drop_down_age', 'value')]
+    [Input('drop_down_age', 'value')],
+    layout=dash.page_registry['pages.sample_info']['layout']
 )
+@figure_cache.cached('sample_info', 'sample_summary_tab')
 def update_sample_summary_histogram(selected_entity):
     gene_data_subset = sample_summary_tab[sample_summary_tab['DiseaseEntity'] == selected_entity]
     melted_df = gene_data_subset.melt(id_vars=['DiseaseEntity'], value_vars=gene_data_subset.columns[4:],
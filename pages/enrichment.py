@@ -0,0 +1,28 @@
+import dash
+from dash import html
+import dash_bootstrap_components as dbc
+
+from backend import enrichment, tables
+
+dash.register_page(__name__, name='Entity enrichment')
+
+layout = html.Div([
+
+    dbc.Card([
+        dbc.Row([
+            html.H2(["Disease entity specific outlier genes"], ),
+            html.P([
+                "For every method, gene and disease entity, the outlier samples of the gene in the entity are "
+                "compared to the rest of the cohort with a one-sided Fisher exact test. The FDR is adjusted with "
+                "the Benjamini-Hochberg procedure over all the tests of a method. Only the entities with at least "
+                "one outlier sample of the gene are listed, the most significant first."
+            ]),
+            tables.data_table('enrichment_table', enrichment.TABLE,
+                              page_size=20,
+                              style_table={'overflowX': 'auto'},
+                              style_cell={'textAlign': 'left'},
+                              export_format='csv',
+                              ),
+        ], ),
+    ], ),
+])
@@ -1,318 +1,278 @@
 import dash
-from dash import dcc, html, dash_table, callback
-from dash.dependencies import Input, Output, State
+from dash import dcc, html
+from dash.dependencies import Input, Output
 import plotly.express as px
-import pandas as pd
 import dash_bootstrap_components as dbc
 import numpy as np
 import plotly.io as pio
 
-# Sample data
-n_var_samp = pd.read_csv("./data/sup_table/n_var_samp_tab.csv", sep=',')
-
-n_var_gene_tab = pd.read_csv("./data/sup_table/n_var_gene_tab.csv", sep=',')
-
-n_var_vep_tab = pd.read_csv("./data/sup_table/n_var_vep_tab.csv", sep=',')
+from backend import dropdowns, figure_cache, figures, initial, matrix, registry, sections, similarity, tables
 
-intogen_resource_tab = pd.read_csv("./data/resource_table/intogen_resource_tab.csv", sep=',').drop(['Entity'], axis=1)
+# Sample data
+n_var_samp = registry.get('n_var_samp')
 
-fusion_agg_tab = pd.read_csv("./data/agg_table/fusion_agg_tab.csv", sep=',')
+n_var_gene_matrix = matrix.entity_matrix('n_var_gene_tab')
+n_var_vep_matrix = matrix.entity_matrix('n_var_vep_tab')
+fusion_matrix = matrix.entity_matrix('fusion_agg_tab')
+absplice_matrix = matrix.entity_matrix('absplice_agg_tab')
+absplice_ratio_matrix = matrix.entity_matrix('absplice_ratio_tab')
 
-absplice_agg_tab = pd.read_csv("./data/agg_table/absplice_agg_tab.csv", sep=",")
+n_var_gene_chart = figures.entity_bar_chart(n_var_gene_matrix.entities)
+n_var_vep_chart = figures.entity_bar_chart(n_var_vep_matrix.entities)
+fusion_chart = figures.entity_bar_chart(fusion_matrix.entities)
+absplice_chart = figures.entity_bar_chart(absplice_matrix.entities)
+absplice_ratio_chart = figures.entity_bar_chart(absplice_ratio_matrix.entities)
 
-absplice_ratio_tab = pd.read_csv("./data/agg_table/absplice_ratio_tab.csv", sep=",")
+dash.register_page(__name__)
 
-absplice_resource_tab = pd.read_csv("./data/resource_table/absplice_resource_tab.csv", sep=',').drop(['Study group'],
-                                                                                                     axis=1)
+abbreviation_section = sections.lazy_card('genomics_abbreviation', [
+    html.H2(["Abbreviation table"], style={'textAlign': 'center'}),
+    tables.data_table('manuscript_wording_table', 'manuscript_wording',
+                      style_table={'height': '300px', 'overflowY': 'auto'},
+                      export_format='csv',
+                      )
+])
 
-manuscript_wording = pd.read_csv("./data/leukemie_driver_manuscript_wording-sample_annotation.tsv", sep="\t")
-manuscript_wording = manuscript_wording.drop(
-    ["Cohort during analysis", "Cohort German abbreviation", "Study group during analysis",
-     "Number of samples per study group", "Number of samples per cohort"], axis=1)
 
-manuscript_wording = manuscript_wording.rename(columns={"Cohort": "Disease entity",
-                                                        "Cohort abbreviation": "Abbreviation",
-                                                        "Number of sampples per cohort": "Number of samples per disease entity", })
-study_group_mapping_dict = manuscript_wording.set_index('Abbreviation')['Study group'].to_dict()
-study_group_mapping_dict['Total'] = 'Total'
+# Number of filtered variants per sample
+n_var_samp_section = sections.lazy_card('genomics_n_var_samp', [
+    dbc.Row([
+        html.H2(["Number of filtered variants per sample"], style={'textAlign': 'center'}),
 
-dash.register_page(__name__)
+        # Sidebar layout
+        dbc.Col([
+            dcc.Dropdown(
+                id='drop_down_n_var_samp',
+                options=[{'label': group, 'value': group} for group in np.unique(n_var_samp['DiseaseEntity'])],
+                value='AML',
+                multi=False
+            ),
+        ], width=4),
 
-layout = html.Div([
-
-    dbc.Card([
-        html.H2(["Abbreviation table"], style={'textAlign': 'center'}),
-        dash_table.DataTable(id='manuscript_wording_table',
-                             columns=[{'name': col, 'id': col} for col in manuscript_wording.columns],
-                             data=manuscript_wording.to_dict('records'),
-                             page_size=10,  # Show 10 rows per page
-                             sort_action='native',  # Enable column sorting
-                             filter_action='native',  # Enable built-in filtering
-                             style_table={'height': '300px', 'overflowY': 'auto'},
-                             export_format='csv',
-                             )
-    ]),
-
-    # Number of filtered variants per sample
-    dbc.Card([
+        # Main panel layout
         dbc.Row([
-            html.H2(["Number of filtered variants per sample"], style={'textAlign': 'center'}),
-
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='drop_down_n_var_samp',
-                    options=[{'label': group, 'value': group} for group in np.unique(n_var_samp['DiseaseEntity'])],
-                    value='AML',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-            dbc.Row([
-                dcc.Graph(id='n_var_samp_histogram'),
-                dash_table.DataTable(id='n_var_samp_table',
-                                     columns=[{'name': col, 'id': col} for col in n_var_samp.columns],
-                                     data=n_var_samp.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
-
+            dcc.Graph(id='n_var_samp_histogram'),
+            tables.data_table('n_var_samp_table', 'n_var_samp',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
         ], ),
+
     ], ),
+])
 
-    # Number of filtered variants per gene
-    dbc.Card([
-        dbc.Row([
-            html.H2(["Number of filtered variants aggregated by disease entities and genes"],
-                    style={'textAlign': 'center'}),
-
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='drop_down_n_var_gene',
-                    options=[{'label': group, 'value': group} for group in n_var_gene_tab['GeneSymbol']],
-                    value='EYS',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-            dbc.Row([
-                dcc.Graph(id='n_var_gene_histogram'),
-                dash_table.DataTable(id='n_var_gene_table',
-                                     columns=[{'name': col, 'id': col} for col in n_var_gene_tab.columns],
-                                     data=n_var_gene_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
 
-        ], ),
-    ], ),
+# Number of filtered variants per gene
+n_var_gene_section = sections.lazy_card('genomics_n_var_gene', [
+    dbc.Row([
+        html.H2(["Number of filtered variants aggregated by disease entities and genes"],
+                style={'textAlign': 'center'}),
 
-    # Number of filtered variants vep
-    dbc.Card([
-        dbc.Row([
-            html.H2(["Number of filtered variants aggregated by disease entities and genes and VEP consequences"],
-                    style={'textAlign': 'center'}),
-
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='drop_down_n_var_vep_gene',
-                    options=[{'label': group, 'value': group} for group in n_var_vep_tab['GeneSymbol']],
-                    value='MMRN1',
-                    multi=False
-                ),
-            ], width=4),
-            dbc.Col([
-                dcc.Dropdown(
-                    id='drop_down_n_var_vep_consequence',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-            dbc.Row([
-                dcc.Graph(id='n_var_vep_histogram'),
-                dash_table.DataTable(id='n_var_vep_table',
-                                     columns=[{'name': col, 'id': col} for col in n_var_vep_tab.columns],
-                                     data=n_var_vep_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
+        # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'drop_down_n_var_gene', 'n_var_gene_tab',
+                value='EYS',
+                multi=True
+            ),
+        ], width=4),
 
+        # Main panel layout
+        dbc.Row([
+            dcc.Graph(id='n_var_gene_histogram'),
+            tables.data_table('n_var_gene_table', 'n_var_gene_tab',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
         ], ),
+
     ], ),
+])
 
-    # abSplice
-    dbc.Card([
-        dbc.Row([
-            html.H2(["AbSplice-DNA"], ),
-            html.H4(["Number of splice-affecting variants aggregated by disease entities and genes"], ),
-
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='absplice_dropdown',
-                    options=[{'label': gene, 'value': gene} for gene in absplice_agg_tab['GeneSymbol']],
-                    value='MGMT',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-            dbc.Row([
-                dcc.Graph(id='absplice_agg_tab_histogram'),
-                dash_table.DataTable(id='absplice_agg_tab',
-                                     columns=[{'name': col, 'id': col} for col in absplice_agg_tab.columns],
-                                     data=absplice_agg_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
-            dbc.Row([
-                html.H4(["Number of splice-affecting variants per gene per entity when applying different filters"], ),
-                dash_table.DataTable(id='activation resource table',
-                                     columns=[{'name': col, 'id': col} for col in absplice_resource_tab.columns],
-                                     data=absplice_resource_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '80%', 'overflowY': 'auto'},
-                                     export_format='csv',
-
-                                     )
-            ], ),
 
-        ], ),
-    ], ),
+# Number of filtered variants vep
+n_var_vep_section = sections.lazy_card('genomics_n_var_vep', [
+    dbc.Row([
+        html.H2(["Number of filtered variants aggregated by disease entities and genes and VEP consequences"],
+                style={'textAlign': 'center'}),
 
-    # abSplice ratio
-    dbc.Card([
-        html.H2([
-            "AbSplice-DNA"], ),
-        html.H4([
-            "Fraction of splice-affecting variants within filtered variants aggregated by disease entities and genes"], ),
         # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'drop_down_n_var_vep_gene', 'n_var_vep_tab',
+                value='MMRN1',
+                multi=False
+            ),
+        ], width=4),
         dbc.Col([
             dcc.Dropdown(
-                id='absplice_ratio_dropdown',
-                options=[{'label': gene, 'value': gene} for gene in absplice_ratio_tab['GeneSymbol']],
-                value='UROD',
+                id='drop_down_n_var_vep_consequence',
                 multi=False
             ),
         ], width=4),
 
+        # Main panel layout
         dbc.Row([
-            dcc.Graph(id='absplice_ratio_tab_histogram'),
-            dbc.Col(
-                dash_table.DataTable(id='absplice_ratio_tab',
-                                     columns=[{'name': col, 'id': col} for col in absplice_ratio_tab.columns],
-                                     data=absplice_ratio_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            )
+            dcc.Graph(id='n_var_vep_histogram'),
+            tables.data_table('n_var_vep_table', 'n_var_vep_tab',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
         ], ),
+
     ], ),
+])
+
+
+# abSplice
+absplice_section = sections.lazy_card('genomics_absplice', [
+    dbc.Row([
+        html.H2(["AbSplice-DNA"], ),
+        html.H4(["Number of splice-affecting variants aggregated by disease entities and genes"], ),
 
-    # Intogen 7 tools
-    dbc.Card([
+        # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'absplice_dropdown', 'absplice_agg_tab',
+                value='MGMT',
+                multi=True
+            ),
+            similarity.panel('absplice_similar'),
+        ], width=4),
+
+        # Main panel layout
         dbc.Row([
-            html.H2(["Driver prediction results from intOGen 7 tools"], ),
-            # Main panel layout
-            dbc.Row([
-                dash_table.DataTable(id='intogen_resource_tab',
-                                     columns=[{'name': col, 'id': col} for col in intogen_resource_tab.columns],
-                                     data=intogen_resource_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '400px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
+            dcc.Graph(id='absplice_agg_tab_histogram'),
+            tables.data_table('absplice_agg_tab', 'absplice_agg_tab',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
+        ], ),
+        dbc.Row([
+            html.H4(["Number of splice-affecting variants per gene per entity when applying different filters"], ),
+            tables.data_table('absplice resource table', 'absplice_resource_tab',
+                              style_table={'height': '80%', 'overflowY': 'auto'},
+                              export_format='csv',
 
+                              )
         ], ),
+
     ], ),
-    # Fusion
-    dbc.Card([
-        dbc.Row([
-            html.H2(["Fusion events aggregated by disease entities and genes"], ),
-
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='gene_dropdown_fusion',
-                    options=[{'label': gene, 'value': gene} for gene in fusion_agg_tab['Gene_pair']],
-                    value='ARHGAP26--NR3C1',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-            dbc.Row([
-                dcc.Graph(id='fusion_agg_tab_histogram'),
-                dash_table.DataTable(id='fusion_agg_table',
-                                     columns=[{'name': col, 'id': col} for col in fusion_agg_tab.columns],
-                                     data=fusion_agg_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
+])
+
+
+# abSplice ratio
+absplice_ratio_section = sections.lazy_card('genomics_absplice_ratio', [
+    html.H2([
+        "AbSplice-DNA"], ),
+    html.H4([
+        "Fraction of splice-affecting variants within filtered variants aggregated by disease entities and genes"], ),
+    # Sidebar layout
+    dbc.Col([
+        dropdowns.gene_dropdown(
+            'absplice_ratio_dropdown', 'absplice_ratio_tab',
+            value='UROD',
+            multi=True
+        ),
+        similarity.panel('absplice_ratio_similar'),
+    ], width=4),
+
+    dbc.Row([
+        dcc.Graph(id='absplice_ratio_tab_histogram'),
+        dbc.Col(
+            tables.data_table('absplice_ratio_tab', 'absplice_ratio_tab',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
+        )
+    ], ),
+])
+
 
+# Intogen 7 tools
+intogen_section = sections.lazy_card('genomics_intogen', [
+    dbc.Row([
+        html.H2(["Driver prediction results from intOGen 7 tools"], ),
+        # Main panel layout
+        dbc.Row([
+            tables.data_table('intogen_resource_tab', 'intogen_resource_tab',
+                              style_table={'height': '400px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
         ], ),
+
     ], ),
-    dbc.Card([
-        html.H2(["Mean copy ratio track aggregated by disease entities"], ),
-        html.H4(["Mean copy ratio tracks can be downloaded from ",
-                 html.A("https://zenodo.org/records/10656715", href='https://zenodo.org/records/10656715',
-                        target='_blank'), html.Em(" under supplemantary_file/F1_copy_ratio_entity")],
-                style={"text-align": "left"}),
+])
+
+
+# Fusion
+fusion_section = sections.lazy_card('genomics_fusion', [
+    dbc.Row([
+        html.H2(["Fusion events aggregated by disease entities and genes"], ),
+
+        # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'gene_dropdown_fusion', 'fusion_agg_tab', value_column='Gene_pair',
+                value='ARHGAP26--NR3C1',
+                multi=True
+            ),
+        ], width=4),
+
+        # Main panel layout
+        dbc.Row([
+            dcc.Graph(id='fusion_agg_tab_histogram'),
+            tables.data_table('fusion_agg_table', 'fusion_agg_tab',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
+        ], ),
+
     ], ),
-]),
+])
+
+
+def layout(**kwargs):
+    return html.Div([
+        sections.placeholder(abbreviation_section),
+        sections.placeholder(n_var_samp_section),
+        sections.placeholder(n_var_gene_section),
+        sections.placeholder(n_var_vep_section),
+        sections.placeholder(absplice_section),
+        sections.placeholder(absplice_ratio_section),
+        sections.placeholder(intogen_section),
+        sections.placeholder(fusion_section),
+        dbc.Card([
+            html.H2(["Mean copy ratio track aggregated by disease entities"], ),
+            html.H4(["Mean copy ratio tracks can be downloaded from ",
+                     html.A("https://zenodo.org/records/10656715", href='https://zenodo.org/records/10656715',
+                            target='_blank'), html.Em(" under supplemantary_file/F1_copy_ratio_entity")],
+                    style={"text-align": "left"}),
+        ], ),
+    ])
 
 
-@callback(
+@initial.callback(
     Output('drop_down_n_var_vep_consequence', 'options'),
     Output('drop_down_n_var_vep_consequence', 'value'),
-    Input('drop_down_n_var_vep_gene', 'value')
+    Input('drop_down_n_var_vep_gene', 'value'),
+    layout=sections.content(n_var_vep_section)
 )
 def update_dropdown_category2(selected_gene):
     # Get available options based on the selected value of the first dropdown
     options = [{'label': group, 'value': group} for group in
-               np.unique(n_var_vep_tab[n_var_vep_tab['GeneSymbol'] == selected_gene]['Consequence'])],
+               np.unique(n_var_vep_matrix.ids['Consequence'].to_numpy()[n_var_vep_matrix.rows(selected_gene)])],
     # Set the default value to the first option
     default_value = options[0][0]['value']
     return options[0], default_value
 
 
-@callback(
+@initial.callback(
     Output('n_var_samp_histogram', 'figure'),
-    [Input('drop_down_n_var_samp', 'value')]
+    [Input('drop_down_n_var_samp', 'value')],
+    layout=sections.content(n_var_samp_section)
 )
+@figure_cache.cached('genomics', 'n_var_samp')
 def update_n_var_sample_histogram(selected_cohort):
     cohort_data_subset = n_var_samp[n_var_samp['DiseaseEntity'] == selected_cohort]
     fig = px.scatter(cohort_data_subset, y='Number_of_variant', x="AnonamizedID",
@@ -321,83 +281,62 @@ def update_n_var_sample_histogram(selected_cohort):
     return fig
 
 
-@callback(
+@initial.callback(
     Output('n_var_gene_histogram', 'figure'),
-    [Input('drop_down_n_var_gene', 'value')]
+    [Input('drop_down_n_var_gene', 'value')],
+    layout=sections.content(n_var_gene_section)
 )
+@figure_cache.cached('genomics', 'n_var_gene_tab')
 def update__n_var_gene_histogram(selected_gene):
-    gene_data_subset = n_var_gene_tab[n_var_gene_tab['GeneSymbol'] == selected_gene]
-    melted_df = gene_data_subset.melt(id_vars=['GeneSymbol'], value_vars=gene_data_subset.columns[2:],
-                                      var_name='Disease entity',
-                                      value_name='Number of variants')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Number of variants', color='Study group',
-                 )
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
+    return n_var_gene_chart.selection_figure(n_var_gene_matrix, selected_gene, 'Number of variants')
 
 
-@callback(
+@initial.callback(
     Output('n_var_vep_histogram', 'figure'),
     [Input('drop_down_n_var_vep_gene', 'value'),
-     Input('drop_down_n_var_vep_consequence', 'value')]
+     Input('drop_down_n_var_vep_consequence', 'value')],
+    layout=sections.content(n_var_vep_section)
 )
+@figure_cache.cached('genomics', 'n_var_vep_tab')
 def update_n_var_vep_histogram(selected_gene, consequence):
-    gene_data_subset = n_var_vep_tab[
-        (n_var_vep_tab['GeneSymbol'] == selected_gene) & (n_var_vep_tab['Consequence'] == consequence)]
-    melted_df = gene_data_subset.melt(id_vars=['GeneSymbol'], value_vars=gene_data_subset.columns[4:],
-                                      var_name='Disease entity',
-                                      value_name='Number of variants')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Number of variants', color='Study group',
-                 )
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
+    values = n_var_vep_matrix.get((selected_gene, consequence), by=('GeneSymbol', 'Consequence'))
+    return n_var_vep_chart.figure(values, 'Number of variants')
 
 
-@callback(
+@initial.callback(
     Output('fusion_agg_tab_histogram', 'figure'),
-    [Input('gene_dropdown_fusion', 'value')]
+    [Input('gene_dropdown_fusion', 'value')],
+    layout=sections.content(fusion_section)
 )
+@figure_cache.cached('genomics', 'fusion_agg_tab')
 def update_fusion_histogram(selected_gene):
-    gene_data_subset = fusion_agg_tab[fusion_agg_tab['Gene_pair'] == selected_gene]
-    melted_df = pd.melt(gene_data_subset,
-                        id_vars=['Gene_pair', 'GeneID_1', 'GeneSymbol_1', 'GeneID_2', 'GeneSymbol_2'],
-                        var_name='Disease entity',
-                        value_name='Gene Expression')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Gene Expression', color='Study group',
-                 labels={'Gene Expression': 'Number of samples'},
-                 barmode='group')
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
+    return fusion_chart.selection_figure(fusion_matrix, selected_gene, 'Number of samples', barmode='group',
+                                         by='Gene_pair')
 
 
-@callback(
+@initial.callback(
     Output('absplice_agg_tab_histogram', 'figure'),
-    [Input('absplice_dropdown', 'value')]
+    [Input('absplice_dropdown', 'value')],
+    layout=sections.content(absplice_section)
 )
+@figure_cache.cached('genomics', 'absplice_agg_tab')
 def update_absplice_histogram(selected_gene):
-    gene_data_subset = absplice_agg_tab[absplice_agg_tab['GeneSymbol'] == selected_gene]
-    melted_df = pd.melt(gene_data_subset, id_vars=['GeneID', 'GeneSymbol'], var_name='Disease entity',
-                        value_name='Number of samples')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Number of samples', color='Study group',
-                 barmode='group')
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
+    return absplice_chart.selection_figure(absplice_matrix, selected_gene, 'Number of samples', barmode='group')
 
 
-@callback(
+@initial.callback(
     Output('absplice_ratio_tab_histogram', 'figure'),
-    [Input('absplice_ratio_dropdown', 'value')]
+    [Input('absplice_ratio_dropdown', 'value')],
+    layout=sections.content(absplice_ratio_section)
 )
+@figure_cache.cached('genomics', 'absplice_ratio_tab')
 def update_absplice_histogram(selected_gene):
-    gene_data_subset = absplice_ratio_tab[absplice_ratio_tab['GeneSymbol'] == selected_gene]
-    melted_df = pd.melt(gene_data_subset, id_vars=['GeneID', 'GeneSymbol'], var_name='Disease entity',
-                        value_name='Ratio')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Ratio', color='Study group',
-                 barmode='group')
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
+    return absplice_ratio_chart.selection_figure(absplice_ratio_matrix, selected_gene, 'Ratio', barmode='group')
+
+
+update_absplice_similar = similarity.similar_genes_callback(
+    'absplice_similar', 'absplice_dropdown', 'absplice_agg_tab', layout=sections.content(absplice_section))
+
+update_absplice_ratio_similar = similarity.similar_genes_callback(
+    'absplice_ratio_similar', 'absplice_ratio_dropdown', 'absplice_ratio_tab',
+    layout=sections.content(absplice_ratio_section))
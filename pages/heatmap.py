@@ -0,0 +1,108 @@
+import dash
+from dash import callback, ctx, dcc, html
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import dash_bootstrap_components as dbc
+
+from backend import initial, tiles
+
+default_table = 'fpkm_agg_tab'
+default_order = 'symbol'
+default_aggregate = 'max'
+
+dash.register_page(__name__, name='Heatmap explorer')
+
+layout = html.Div([
+
+    dbc.Card([
+        dbc.Row([
+            html.H2(["Genes × disease entities heatmap of a whole table"], ),
+            html.P(["Zoom on the genes to see them in more detail: the table is shown in rows of several genes, "
+                    "summarized by the maximum or the mean of their values, down to one row per gene. "
+                    "Double-click the heatmap to see the whole table again."], ),
+
+            # Sidebar layout
+            dbc.Col([
+                dcc.Dropdown(
+                    id='heatmap_table',
+                    options=[{'label': label, 'value': table_name}
+                             for table_name, (label, _) in tiles.TABLES.items()],
+                    value=default_table,
+                    clearable=False,
+                    multi=False
+                ),
+                dcc.RadioItems(
+                    id='heatmap_order',
+                    options=[{'label': label, 'value': order} for order, label in tiles.ORDERS.items()],
+                    value=default_order,
+                    inline=True,
+                    inputStyle={'margin-right': '0.3em', 'margin-left': '1em'},
+                ),
+                dcc.RadioItems(
+                    id='heatmap_aggregate',
+                    options=[{'label': label, 'value': aggregate} for aggregate, label in tiles.AGGREGATES.items()],
+                    value=default_aggregate,
+                    inline=True,
+                    inputStyle={'margin-right': '0.3em', 'margin-left': '1em'},
+                ),
+            ], width=4),
+
+            # Main panel layout
+            dbc.Row([
+                dcc.Graph(id='heatmap_graph'),
+                # the view of the tiles shown in the graph
+                dcc.Store(id='heatmap_view', data=list(tiles.view(default_table, default_order))),
+            ], ),
+        ], ),
+    ], ),
+])
+
+
+def _y_range(relayout_data):
+    # the y axis range set by a zoom or a pan, None when reset to the whole table, False when unchanged
+    relayout_data = relayout_data or {}
+    if 'yaxis.range[0]' in relayout_data and 'yaxis.range[1]' in relayout_data:
+        return [relayout_data['yaxis.range[0]'], relayout_data['yaxis.range[1]']]
+    if 'yaxis.range' in relayout_data:
+        return list(relayout_data['yaxis.range'])
+    if relayout_data.get('yaxis.autorange'):
+        return None
+    return False
+
+
+def _figure(table_name, order, aggregate):
+    return tiles.tile_figure(table_name, order, aggregate, *tiles.view(table_name, order))
+
+
+@callback(
+    Output('heatmap_graph', 'figure'),
+    Output('heatmap_view', 'data'),
+    [Input('heatmap_table', 'value'),
+     Input('heatmap_order', 'value'),
+     Input('heatmap_aggregate', 'value'),
+     Input('heatmap_graph', 'relayoutData')],
+    [State('heatmap_view', 'data')],
+    # the layout already holds the figure of the whole default table
+    prevent_initial_call=True
+)
+def update_heatmap(table_name, order, aggregate, relayout_data, current_view):
+    if table_name not in tiles.TABLES or order not in tiles.ORDERS or aggregate not in tiles.AGGREGATES:
+        raise PreventUpdate
+    if ctx.triggered_id == 'heatmap_graph':
+        y_range = _y_range(relayout_data)
+        if y_range is False:
+            raise PreventUpdate
+        view = list(tiles.view(table_name, order, y_range))
+        # the tiles in the graph already cover the new range
+        if view == current_view:
+            raise PreventUpdate
+    elif ctx.triggered_id == 'heatmap_aggregate' and current_view is not None:
+        view = current_view
+    else:
+        # another table or order starts from the whole table
+        view = list(tiles.view(table_name, order))
+    return tiles.tile_figure(table_name, order, aggregate, *view), view
+
+
+initial.prefill(layout, _figure, [Output('heatmap_graph', 'figure')],
+                [Input('heatmap_table', 'value'), Input('heatmap_order', 'value'), Input('heatmap_aggregate', 'value')])
@@ -7,20 +7,13 @@ import dash_bootstrap_components as dbc
 import numpy as np
 import plotly.io as pio
 
-prediction_complete = pd.read_csv("./data/prediction/S1_prediction_complete_dataset_desc.csv", sep=",")
-prediction_complete['Prediction'] = prediction_complete['Prediction'].apply(lambda x: round(x, 3))
+from backend import figure_cache, initial, registry, tables
 
-prediction_study_group = pd.read_csv("./data/prediction/S2_prediction_study_groups_desc.csv", sep=",")
-prediction_study_group['Prediction'] = prediction_study_group['Prediction'].apply(lambda x: round(x, 3))
+prediction_complete = registry.get('prediction_complete')
 
-manuscript_wording = pd.read_csv("./data/leukemie_driver_manuscript_wording-sample_annotation.tsv", sep="\t")
-manuscript_wording = manuscript_wording.drop(
-    ["Cohort during analysis", "Cohort German abbreviation", "Study group during analysis",
-     "Number of samples per study group", "Number of samples per cohort"], axis=1)
+prediction_study_group = registry.get('prediction_study_group')
 
-manuscript_wording = manuscript_wording.rename(columns={"Cohort": "Disease entity",
-                                                        "Cohort abbreviation": "Abbreviation",
-                                                        "Number of sampples per cohort": "Number of samples per disease entity", })
+manuscript_wording = registry.get('manuscript_wording')
 
 
 def plot_all_predictions():
@@ -37,16 +30,11 @@ layout = html.Div([
 
     dbc.Card([
         html.H2(["Abbreviation table"], style={'textAlign': 'center'}),
-        dash_table.DataTable(id='manuscript_wording_table',
-                             columns=[{'name': col, 'id': col} for col in manuscript_wording.columns],
-                             data=manuscript_wording.to_dict('records'),
-                             page_size=10,  # Show 10 rows per page
-                             sort_action='native',  # Enable column sorting
-                             filter_action='native',  # Enable built-in filtering
-                             style_table={'height': '300px', 'overflowY': 'auto'},
-                             style_cell={'textAlign': 'left'},
-                             export_format='csv',
-                             )
+        tables.data_table('manuscript_wording_table', 'manuscript_wording',
+                          style_table={'height': '300px', 'overflowY': 'auto'},
+                          style_cell={'textAlign': 'left'},
+                          export_format='csv',
+                          )
     ]),
 
     # Prediction all
@@ -61,16 +49,11 @@ layout = html.Div([
                     id='all_predictions_plot',
                     figure=plot_all_predictions()
                 ),
-                dash_table.DataTable(id='prediction_all',
-                                     columns=[{'name': col, 'id': col} for col in prediction_complete.columns],
-                                     data=prediction_complete.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '400px', 'overflowY': 'auto'},
-                                     style_cell={'textAlign': 'left'},
-                                     export_format='csv',
-                                     )
+                tables.data_table('prediction_all', 'prediction_complete',
+                                  style_table={'height': '400px', 'overflowY': 'auto'},
+                                  style_cell={'textAlign': 'left'},
+                                  export_format='csv',
+                                  )
             ], ),
 
         ], ),
@@ -101,16 +84,11 @@ layout = html.Div([
 
                 dcc.Graph(id='cohort_wise_predictions_plot'),
 
-                dash_table.DataTable(id='prediction_cohort_wise',
-                                     columns=[{'name': col, 'id': col} for col in prediction_study_group.columns],
-                                     data=prediction_study_group.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '400px', 'overflowY': 'auto'},
-                                     style_cell={'textAlign': 'left'},
-                                     export_format='csv',
-                                     )
+                tables.data_table('prediction_cohort_wise', 'prediction_study_group',
+                                  style_table={'height': '400px', 'overflowY': 'auto'},
+                                  style_cell={'textAlign': 'left'},
+                                  export_format='csv',
+                                  )
             ], ),
 
         ], ),
@@ -119,10 +97,12 @@ layout = html.Div([
 ])
 
 
-@callback(
+@initial.callback(
     Output('cohort_wise_predictions_plot', 'figure'),
-    [Input('prediction_dropdown', 'value')]
+    [Input('prediction_dropdown', 'value')],
+    layout=layout
 )
+@figure_cache.cached('prediction', 'prediction_study_group')
 def update_fpkm_histogram(selected_gene):
     gene_data_subset = prediction_study_group[prediction_study_group['StudyGroup'] == selected_gene]
     number_of_genes_to_plot = 50
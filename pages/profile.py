@@ -0,0 +1,76 @@
+import dash
+from dash import dcc, html
+from dash.dependencies import Input, Output
+import dash_bootstrap_components as dbc
+import numpy as np
+
+from backend import dropdowns, figure_cache, figures, initial, outliers
+
+outlier_tensor = outliers.tensor()
+
+# the count methods in the heatmap, the AbSplice ratio as bars below it
+count_methods = [i for i, (_, _, value_name) in enumerate(outliers.METHODS) if value_name == 'Number of samples']
+ratio_method = outlier_tensor.methods.index('AbSplice ratio')
+heatmap_entities = [i for i, entity in enumerate(outlier_tensor.entities) if entity != 'Total']
+total_entity = outlier_tensor.entities.index('Total')
+
+ratio_chart = figures.entity_bar_chart(outlier_tensor.entities)
+
+dash.register_page(__name__, name='Gene profile')
+
+layout = html.Div([
+
+    dbc.Card([
+        dbc.Row([
+            html.H2(["Outliers of a gene across methods and disease entities"], ),
+
+            # Sidebar layout
+            dbc.Col([
+                dropdowns.gene_dropdown(
+                    'profile_gene_dropdown', outliers.GENES_TABLE,
+                    value=outlier_tensor.top_gene(),
+                    multi=False
+                ),
+            ], width=4),
+
+            # Main panel layout
+            dbc.Row([
+                dcc.Graph(id='profile_graph', style={'height': '800px'}),
+            ], ),
+        ], ),
+    ], ),
+])
+
+
+def _method_label(method, total):
+    return method if total != total else f'{method} ({total:g} samples)'
+
+
+@initial.callback(
+    Output('profile_graph', 'figure'),
+    [Input('profile_gene_dropdown', 'value')],
+    layout=layout
+)
+@figure_cache.cached('profile', outliers.GENES_TABLE)
+def update_profile(selected_gene):
+    # every method of the gene from one row of the tensor
+    profile = outlier_tensor.profile(selected_gene)
+    if profile is None:
+        profile = np.full(outlier_tensor.values.shape[1:], np.nan)
+    rows = [_method_label(outlier_tensor.methods[i], profile[i, total_entity]) for i in count_methods]
+    fig = figures.heatmap(profile[count_methods][:, heatmap_entities], rows,
+                          [outlier_tensor.entities[i] for i in heatmap_entities], 'Number of samples')
+    ratio = ratio_chart.figure(profile[ratio_method], 'Ratio of samples', barmode='group')
+    # the AbSplice ratios as bars below the heatmap
+    for trace in ratio['data']:
+        trace.update(xaxis='x2', yaxis='y2')
+    fig['data'][0]['colorbar'].update(y=0.775, len=0.45)
+    fig['data'] += ratio['data']
+    fig['layout'].update(
+        yaxis=dict(fig['layout']['yaxis'], domain=[0.55, 1.0]),
+        xaxis2=dict(ratio['layout']['xaxis'], anchor='y2'),
+        yaxis2=dict(ratio['layout']['yaxis'], anchor='x2', domain=[0.0, 0.4]),
+        legend=dict(ratio['layout']['legend'], y=0.4, yanchor='top'),
+        barmode='group',
+    )
+    return fig
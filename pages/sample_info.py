@@ -7,15 +7,11 @@ import dash_bootstrap_components as dbc
 import numpy as np
 import plotly.io as pio
 
-sample_summary_tab = pd.read_csv("./data/agg_table/sample_summary_tab.csv", sep=',')
+from backend import registry, tables
 
-manuscript_wording = pd.read_csv("./data/leukemie_driver_manuscript_wording-sample_annotation.tsv", sep="\t")
-manuscript_wording = manuscript_wording.drop(
-    ["Cohort during analysis", "Cohort German abbreviation", "Study group during analysis"], axis=1)
+sample_summary_tab = registry.get('sample_summary_tab')
 
-manuscript_wording = manuscript_wording.rename(columns={"Cohort": "Disease entity",
-                                                        "Cohort abbreviation": "Abbreviation",
-                                                        "Number of sampples per cohort": "Number of samples per disease entity", })
+manuscript_wording = registry.get('sample_annotation')
 
 
 def age_distribution():
@@ -41,15 +37,10 @@ layout = html.Div([
     # manuscript wording
     dbc.Card([
         html.H2(["Disease entity and study group table"], ),
-        dash_table.DataTable(id='manuscript_wording_table',
-                             columns=[{'name': col, 'id': col} for col in manuscript_wording.columns],
-                             data=manuscript_wording.to_dict('records'),
-                             page_size=10,  # Show 10 rows per page
-                             sort_action='native',  # Enable column sorting
-                             filter_action='native',  # Enable built-in filtering
-                             style_table={'height': '300px', 'overflowY': 'auto'},
-                             export_format='csv',
-                             )
+        tables.data_table('manuscript_wording_table', 'sample_annotation',
+                          style_table={'height': '300px', 'overflowY': 'auto'},
+                          export_format='csv',
+                          )
     ]),
 
     # Number of individuals, genders, and age
@@ -71,15 +62,10 @@ layout = html.Div([
                     ),
                 ], width=4),
                 dcc.Graph(id='sample_summary_histogram'),
-                dash_table.DataTable(id='sample_summary_table',
-                                     columns=[{'name': col, 'id': col} for col in sample_summary_tab.columns],
-                                     data=sample_summary_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
+                tables.data_table('sample_summary_table', 'sample_summary_tab',
+                                  style_table={'height': '300px', 'overflowY': 'auto'},
+                                  export_format='csv',
+                                  )
             ], ),
         ], ),
     ], ),
@@ -1,345 +1,249 @@
 import dash
-from dash import dcc, html, dash_table, callback
-from dash.dependencies import Input, Output, State
-import plotly.express as px
-import pandas as pd
+from dash import dcc, html
+from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
-import numpy as np
 import plotly.io as pio
 
-or_dn_agg_tab = pd.read_csv("./data/agg_table/or_dn_agg_tab.csv", sep=",")
+from backend import clientside, dropdowns, figure_cache, figures, initial, matrix, sections, similarity, tables
 
-or_up_agg_tab = pd.read_csv("./data/agg_table/or_up_agg_tab.csv", sep=",")
+fpkm_matrix = matrix.entity_matrix('fpkm_agg_tab')
 
-fraser_agg_tab = pd.read_csv("./data/agg_table/fraser_agg_tab.csv", sep=",")
+fpkm_chart = figures.entity_bar_chart(fpkm_matrix.entities)
 
-activation_agg_tab = pd.read_csv("./data/agg_table/activation_agg_tab.csv", sep=",")
-
-fkpm_agg_tab = pd.read_csv("./data/sup_table/fpkm_tab.csv", sep=',')
+dash.register_page(__name__)
 
-activation_resource_tab = pd.read_csv("./data/resource_table/activation_resource_tab.csv", sep=',').drop(['Study group'], axis=1)
-fraser_resource_tab = pd.read_csv("./data/resource_table/fraser_resource_tab.csv", sep=',').drop(['Study group'], axis=1)
-or_up_resource_tab = pd.read_csv("./data/resource_table/or_up_resource_tab.csv", sep=',').drop(['Study group'], axis=1)
-or_dn_resource_tab = pd.read_csv("./data/resource_table/or_dn_resource_tab.csv", sep=',').drop(['Study group'], axis=1)
+abbreviation_section = sections.lazy_card('transcriptomics_abbreviation', [
+    html.H2(["Abbreviation table"], ),
+    tables.data_table('manuscript_wording_table', 'manuscript_wording',
+                      style_table={'height': '300px', 'overflowY': 'auto'},
+                      export_format='csv',
+                      )
+])
 
-manuscript_wording = pd.read_csv("./data/leukemie_driver_manuscript_wording-sample_annotation.tsv", sep="\t")
-manuscript_wording = manuscript_wording.drop(
-    ["Cohort during analysis", "Cohort German abbreviation", "Study group during analysis",
-     "Number of samples per study group", "Number of samples per cohort"], axis=1)
 
-manuscript_wording = manuscript_wording.rename(columns={"Cohort": "Disease entity",
-                                                        "Cohort abbreviation": "Abbreviation",
-                                                        "Number of sampples per cohort": "Number of samples per disease entity", })
-study_group_mapping_dict = manuscript_wording.set_index('Abbreviation')['Study group'].to_dict()
-study_group_mapping_dict['Total'] = 'Total'
+# Mean FPKM
+fpkm_section = sections.lazy_card('transcriptomics_fpkm', [
+    dbc.Row([
+        html.H2(["Mean FPKM matrix aggregated by disease entities and genes"], ),
 
-dash.register_page(__name__)
+        # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'drop_down_fpkm', 'fpkm_agg_tab',
+                value='TSPAN6',
+                multi=True
+            ),
+            similarity.panel('fpkm_similar'),
+        ], width=4),
 
-layout = html.Div([
-
-    dbc.Card([
-        html.H2(["Abbreviation table"], ),
-        dash_table.DataTable(id='manuscript_wording_table',
-                             columns=[{'name': col, 'id': col} for col in manuscript_wording.columns],
-                             data=manuscript_wording.to_dict('records'),
-                             page_size=10,  # Show 10 rows per page
-                             sort_action='native',  # Enable column sorting
-                             filter_action='native',  # Enable built-in filtering
-                             style_table={'height': '300px', 'overflowY': 'auto'},
-                             export_format='csv',
-                             )
-    ]),
-
-    # Mean FPKM
-    dbc.Card([
+        # Main panel layout
         dbc.Row([
-            html.H2(["Mean FPKM matrix aggregated by disease entities and genes"], ),
-
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='drop_down_fpkm',
-                    options=[{'label': group, 'value': group} for group in fkpm_agg_tab['GeneSymbol']],
-                    value='TSPAN6',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-            dbc.Row([
-                dcc.Graph(id='fpkm_histogram'),
-                dash_table.DataTable(id='fpkm_table',
-                                     columns=[{'name': col, 'id': col} for col in fkpm_agg_tab.columns],
-                                     data=fkpm_agg_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     ),
-            ], ),
-
+            dcc.Graph(id='fpkm_histogram'),
+            tables.data_table('fpkm_table', 'fpkm_agg_tab',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              ),
         ], ),
-    ], ),
 
-    # or_dn aggregated table
-    dbc.Card([
-        dbc.Row([
-            html.H2(["OUTRIDER"]),
-            html.H4(["Number of  underexpression outliers aggregated by disease entities and genes"], ),
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='or_dn_dropdown',
-                    options=[{'label': gene, 'value': gene} for gene in or_dn_agg_tab['GeneSymbol']],
-                    value='PLP2',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-
-            dcc.Graph(id='or_dn_histogram'),
-            dbc.Col([
-                dash_table.DataTable(id='or_dn aggregated table',
-                                     columns=[{'name': col, 'id': col} for col in or_dn_agg_tab.columns],
-                                     data=or_dn_agg_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '80%', 'overflowY': 'auto'},
-                                     export_format='csv',
-
-                                     )
-            ], ),
-            dbc.Col([
-                html.H4(["Number of underexpression outliers per gene per entity when applying different filters"], ),
-                dash_table.DataTable(id='or_dn resource table',
-                                     columns=[{'name': col, 'id': col} for col in or_dn_resource_tab.columns],
-                                     data=or_dn_resource_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '80%', 'overflowY': 'auto'},
-                                     export_format='csv',
-
-                                     )
-            ], ),
-        ], style={'justify': 'center', }),
     ], ),
+])
 
-    # or_up aggregated table
-    dbc.Card([
-        dbc.Row([
-            html.H2(["OUTRIDER"], ),
-            html.H4(["Number of  overexpression outliers aggregated by disease entities and genes"], ),
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='or_up_dropdown',
-                    options=[{'label': gene, 'value': gene} for gene in or_up_agg_tab['GeneSymbol']],
-                    value='KIF27',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-
-            dcc.Graph(id='or_up_histogram'),
-            dbc.Col([
-                dash_table.DataTable(id='or_up aggregated table',
-                                     columns=[{'name': col, 'id': col} for col in or_up_agg_tab.columns],
-                                     data=or_up_agg_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '80%', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
-            dbc.Col([
-                html.H4(["Number of overexpression outliers per gene per entity when applying different filters"], ),
-                dash_table.DataTable(id='or_up resource table',
-                                     columns=[{'name': col, 'id': col} for col in or_up_resource_tab.columns],
-                                     data=or_up_resource_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '80%', 'overflowY': 'auto'},
-                                     export_format='csv',
-
-                                     )
-            ], ),
-
-        ], style={'justify': 'center', }),
-    ], ),
 
-    # activation
-    dbc.Card([
+# or_dn aggregated table
+or_dn_section = sections.lazy_card('transcriptomics_or_dn', [
+    dbc.Row([
+        html.H2(["OUTRIDER"]),
+        html.H4(["Number of  underexpression outliers aggregated by disease entities and genes"], ),
+        # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'or_dn_dropdown', 'or_dn_agg_tab',
+                value='PLP2',
+                multi=True
+            ),
+            similarity.panel('or_dn_similar'),
+        ], width=4),
+
+        # Main panel layout
+
+        dcc.Graph(id='or_dn_histogram'),
+        dbc.Col([
+            tables.data_table('or_dn aggregated table', 'or_dn_agg_tab',
+                              style_table={'height': '80%', 'overflowY': 'auto'},
+                              export_format='csv',
+
+                              )
+        ], ),
+        dbc.Col([
+            html.H4(["Number of underexpression outliers per gene per entity when applying different filters"], ),
+            tables.data_table('or_dn resource table', 'or_dn_resource_tab',
+                              style_table={'height': '80%', 'overflowY': 'auto'},
+                              export_format='csv',
+
+                              )
+        ], ),
+    ], style={'justify': 'center', }),
+])
+
+
+# or_up aggregated table
+or_up_section = sections.lazy_card('transcriptomics_or_up', [
+    dbc.Row([
+        html.H2(["OUTRIDER"], ),
+        html.H4(["Number of  overexpression outliers aggregated by disease entities and genes"], ),
+        # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'or_up_dropdown', 'or_up_agg_tab',
+                value='KIF27',
+                multi=True
+            ),
+            similarity.panel('or_up_similar'),
+        ], width=4),
+
+        # Main panel layout
+
+        dcc.Graph(id='or_up_histogram'),
+        dbc.Col([
+            tables.data_table('or_up aggregated table', 'or_up_agg_tab',
+                              style_table={'height': '80%', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
+        ], ),
+        dbc.Col([
+            html.H4(["Number of overexpression outliers per gene per entity when applying different filters"], ),
+            tables.data_table('or_up resource table', 'or_up_resource_tab',
+                              style_table={'height': '80%', 'overflowY': 'auto'},
+                              export_format='csv',
+
+                              )
+        ], ),
+
+    ], style={'justify': 'center', }),
+])
+
+
+# activation
+activation_section = sections.lazy_card('transcriptomics_activation', [
+    dbc.Row([
+        html.H2(["NB-act"], ),
+        html.H4(["Number of activation outliers aggregated by disease entities and genes"], ),
+        # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'gene_dropdown_activation', 'activation_agg_tab',
+                value='KCNS3',
+                multi=True
+            ),
+            similarity.panel('activation_similar'),
+        ], width=4),
+
+        # Main panel layout
         dbc.Row([
-            html.H2(["NB-act"], ),
-            html.H4(["Number of activation outliers aggregated by disease entities and genes"], ),
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='gene_dropdown_activation',
-                    options=[{'label': gene, 'value': gene} for gene in activation_agg_tab['GeneSymbol']],
-                    value='KCNS3',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-            dbc.Row([
-                dcc.Graph(id='activation_agg_tab_histogram'),
-                dash_table.DataTable(id='ctivation_agg_table',
-                                     columns=[{'name': col, 'id': col} for col in activation_agg_tab.columns],
-                                     data=activation_agg_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
-            dbc.Row([
-                html.H4(["Number of activation outliers per gene per entity when applying different filters"], ),
-                dash_table.DataTable(id='activation resource table',
-                                     columns=[{'name': col, 'id': col} for col in activation_resource_tab.columns],
-                                     data=activation_resource_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '80%', 'overflowY': 'auto'},
-                                     export_format='csv',
-
-                                     )
-            ], ),
+            dcc.Graph(id='activation_agg_tab_histogram'),
+            tables.data_table('ctivation_agg_table', 'activation_agg_tab',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
+        ], ),
+        dbc.Row([
+            html.H4(["Number of activation outliers per gene per entity when applying different filters"], ),
+            tables.data_table('activation resource table', 'activation_resource_tab',
+                              style_table={'height': '80%', 'overflowY': 'auto'},
+                              export_format='csv',
+
+                              )
         ], ),
     ], ),
+])
+
+
+# Fraser
+fraser_section = sections.lazy_card('transcriptomics_fraser', [
+    dbc.Row([
+        html.H2(["FRASER"], ),
+        html.H4(["Number of splicing outliers aggregated by disease entities and genes"], ),
+
+        # Sidebar layout
+        dbc.Col([
+            dropdowns.gene_dropdown(
+                'gene_dropdown_fraser', 'fraser_agg_tab',
+                value='UBC',
+                multi=True
+            ),
+            similarity.panel('fraser_similar'),
+        ], width=4),
 
-    # Fraser
-    dbc.Card([
+        # Main panel layout
         dbc.Row([
-            html.H2(["FRASER"], ),
-            html.H4(["Number of splicing outliers aggregated by disease entities and genes"], ),
-
-            # Sidebar layout
-            dbc.Col([
-                dcc.Dropdown(
-                    id='gene_dropdown_fraser',
-                    options=[{'label': gene, 'value': gene} for gene in fraser_agg_tab['GeneSymbol']],
-                    value='UBC',
-                    multi=False
-                ),
-            ], width=4),
-
-            # Main panel layout
-            dbc.Row([
-
-                dcc.Graph(id='fraser_agg_tab_histogram'),
-                dash_table.DataTable(id='fraser_table',
-                                     columns=[{'name': col, 'id': col} for col in fraser_agg_tab.columns],
-                                     data=fraser_agg_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '300px', 'overflowY': 'auto'},
-                                     export_format='csv',
-                                     )
-            ], ),
-            dbc.Row([
-                html.H4(["Number of splicing outliers per gene per entity when applying different filters"], ),
-                dash_table.DataTable(id='activation resource table',
-                                     columns=[{'name': col, 'id': col} for col in fraser_resource_tab.columns],
-                                     data=fraser_resource_tab.to_dict('records'),
-                                     page_size=10,  # Show 10 rows per page
-                                     sort_action='native',  # Enable column sorting
-                                     filter_action='native',  # Enable built-in filtering
-                                     style_table={'height': '80%', 'overflowY': 'auto'},
-                                     export_format='csv',
-
-                                     )
-            ], ),
+
+            dcc.Graph(id='fraser_agg_tab_histogram'),
+            tables.data_table('fraser_table', 'fraser_agg_tab',
+                              style_table={'height': '300px', 'overflowY': 'auto'},
+                              export_format='csv',
+                              )
         ], ),
-    ], ),
+        dbc.Row([
+            html.H4(["Number of splicing outliers per gene per entity when applying different filters"], ),
+            tables.data_table('fraser resource table', 'fraser_resource_tab',
+                              style_table={'height': '80%', 'overflowY': 'auto'},
+                              export_format='csv',
 
+                              )
+        ], ),
+    ], ),
 ])
 
 
-@callback(
+def layout(**kwargs):
+    return html.Div([
+        sections.placeholder(abbreviation_section),
+        sections.placeholder(fpkm_section),
+        sections.placeholder(or_dn_section),
+        sections.placeholder(or_up_section),
+        sections.placeholder(activation_section),
+        sections.placeholder(fraser_section),
+    ])
+
+
+@initial.callback(
     Output('fpkm_histogram', 'figure'),
-    [Input('drop_down_fpkm', 'value')]
+    [Input('drop_down_fpkm', 'value')],
+    layout=sections.content(fpkm_section)
 )
+@figure_cache.cached('transcriptomics', 'fpkm_agg_tab')
 def update_fpkm_histogram(selected_gene):
-    gene_data_subset = fkpm_agg_tab[fkpm_agg_tab['GeneSymbol'] == selected_gene]
-    melted_df = gene_data_subset.melt(id_vars=['GeneSymbol'], value_vars=gene_data_subset.columns[2:],
-                                      var_name='Disease entity',
-                                      value_name='FPKM expression')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='FPKM expression', color='Study group',
-                 )
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
-
-
-@callback(
-    Output('or_dn_histogram', 'figure'),
-    [Input('or_dn_dropdown', 'value')]
-)
-def update_or_dn_histogram(selected_gene):
-    gene_data_subset = or_dn_agg_tab[or_dn_agg_tab['GeneSymbol'] == selected_gene]
-    melted_df = pd.melt(gene_data_subset, id_vars=['GeneID', 'GeneSymbol'], var_name='Disease entity',
-                          value_name='Number of samples')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Number of samples', color='Study group',
-                 barmode='group',
-                 )
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
-
-
-@callback(
-    Output('or_up_histogram', 'figure'),
-    [Input('or_up_dropdown', 'value')]
-)
-def update_or_up_histogram(selected_gene):
-    gene_data_subset = or_up_agg_tab[or_up_agg_tab['GeneSymbol'] == selected_gene]
-    melted_df = pd.melt(gene_data_subset, id_vars=['GeneID', 'GeneSymbol'], var_name='Disease entity',
-                          value_name='Number of samples')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Number of samples', color='Study group',
-                 barmode='group',
-                 )
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
-
-
-@callback(
-    Output('activation_agg_tab_histogram', 'figure'),
-    [Input('gene_dropdown_activation', 'value')]
-)
-def update_activation_histogram(selected_gene):
-    gene_data_subset = activation_agg_tab[activation_agg_tab['GeneSymbol'] == selected_gene]
-    melted_df = pd.melt(gene_data_subset, id_vars=['GeneID', 'GeneSymbol'], var_name='Disease entity',
-                          value_name='Number of samples')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Number of samples', color='Study group',
-                 barmode='group')
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
-
-
-@callback(
-    Output('fraser_agg_tab_histogram', 'figure'),
-    [Input('gene_dropdown_fraser', 'value')]
-)
-def update_fraser_histogram(selected_gene):
-    gene_data_subset = fraser_agg_tab[fraser_agg_tab['GeneSymbol'] == selected_gene]
-    melted_df = pd.melt(gene_data_subset, id_vars=['GeneID', 'GeneSymbol'], var_name='Disease entity',
-                          value_name='Number of samples')
-    melted_df['Study group'] = melted_df['Disease entity'].map(study_group_mapping_dict)
-    fig = px.bar(melted_df, x='Disease entity', y='Number of samples', color='Study group',
-                 barmode='group')
-    fig.update_traces(width=1).update_layout(template="plotly_white")
-    return fig
+    return fpkm_chart.selection_figure(fpkm_matrix, selected_gene, 'FPKM expression')
+
+
+update_or_dn_histogram = clientside.entity_bar_callback(
+    'or_dn_histogram', 'or_dn_dropdown', 'transcriptomics', 'or_dn_agg_tab', 'Number of samples', barmode='group',
+    layout=sections.content(or_dn_section))
+
+update_or_up_histogram = clientside.entity_bar_callback(
+    'or_up_histogram', 'or_up_dropdown', 'transcriptomics', 'or_up_agg_tab', 'Number of samples', barmode='group',
+    layout=sections.content(or_up_section))
+
+update_activation_histogram = clientside.entity_bar_callback(
+    'activation_agg_tab_histogram', 'gene_dropdown_activation', 'transcriptomics', 'activation_agg_tab',
+    'Number of samples', barmode='group', layout=sections.content(activation_section))
+
+update_fraser_histogram = clientside.entity_bar_callback(
+    'fraser_agg_tab_histogram', 'gene_dropdown_fraser', 'transcriptomics', 'fraser_agg_tab', 'Number of samples',
+    barmode='group', layout=sections.content(fraser_section))
+
+
+update_fpkm_similar = similarity.similar_genes_callback(
+    'fpkm_similar', 'drop_down_fpkm', 'fpkm_agg_tab', layout=sections.content(fpkm_section))
+
+update_or_dn_similar = similarity.similar_genes_callback(
+    'or_dn_similar', 'or_dn_dropdown', 'or_dn_agg_tab', layout=sections.content(or_dn_section))
+
+update_or_up_similar = similarity.similar_genes_callback(
+    'or_up_similar', 'or_up_dropdown', 'or_up_agg_tab', layout=sections.content(or_up_section))
+
+update_activation_similar = similarity.similar_genes_callback(
+    'activation_similar', 'gene_dropdown_activation', 'activation_agg_tab', layout=sections.content(activation_section))
+
+update_fraser_similar = similarity.similar_genes_callback(
+    'fraser_similar', 'gene_dropdown_fraser', 'fraser_agg_tab', layout=sections.content(fraser_section))
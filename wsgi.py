@@ -1 +1,8 @@
+from backend import clientside, http_cache, matrix, registry
 from mll_app import server as application
+
+# make sure every table and index is loaded once, in the gunicorn master when preloading
+registry.load_all()
+matrix.load_all()
+clientside.load_all()
+http_cache.warm(application)